@@ -1,11 +1,37 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import pickle
-import time
 import os
+import time
+import uuid
 import plotly.graph_objects as go
 
+from attributions import EXPLAINABLE_DISEASES, explainer_for
+from batch_predict import read_cohort, score_cohort
+from disease_models import DECISION_THRESHOLDS, FEATURE_ORDER
+from early_exit import early_exit_enabled, early_exit_for, score_interval
+from feature_schema import FEATURE_INDEX, SCHEMAS, to_row
+from history_store import HistoryStore
+from metrics import (current_trace, histogram_quantile, inc, register_collector, snapshot, start_exporters_from_env,
+                     start_trace, timer)
+from micro_batcher import MicroBatchScheduler, micro_batching_enabled
+from model_registry import ModelRegistry
+from page_content import (APP_CSS, about_box_html, cure_box_html, disease_info, disease_summary_html,
+                          prevention_box_html, risk_factors_html, symptoms_markdown, treatment_box_html)
+from prediction_cache import PredictionCache
+from screening import SHARED_INPUTS, build_feature_rows, screen, shared_feature_names
+from shadow import ShadowEvaluator
+from uncertainty import interval_scorer_for, intervals_enabled
+from what_if import DEFAULT_POINTS, MAX_POINTS, sweep
+
+STAGE_LATENCY = 'prediction_stage_seconds'
+LATENCY_STAGES = ('input', 'predict_proba', 'render', 'explain')
+TOP_CONTRIBUTIONS = 10
+
+# st.fragment (Streamlit >= 1.37, experimental_fragment from 1.33) reruns only the decorated
+# function when its own widgets change; on older releases the function just runs inline.
+fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None) or (lambda func: func)
+
 # 🔥 MUST be the first Streamlit command
 st.set_page_config(
     page_title="Health Disease Prediction System",
@@ -14,398 +40,272 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS for styling
-st.markdown("""
-<style>
-/* Main styling */
-.main-header {
-    color: #2c3e50;
-    text-align: center;
-    font-size: 3rem;
-    font-weight: 700;
-    margin-bottom: 1rem;
-    padding-bottom: 1rem;
-    border-bottom: 2px solid #f1f1f1;
-    font-family: 'Arial', sans-serif;
-}
-.sub-header {
-    color: #2c3e50;
-    font-size: 2rem;
-    font-weight: 600;
-    margin-top: 1rem;
-    margin-bottom: 1.5rem;
-    font-family: 'Arial', sans-serif;
-}
-.tab-subheader {
-    color: #3498db;
-    font-size: 1.5rem;
-    font-weight: 600;
-    margin-top: 1.5rem;
-    margin-bottom: 1rem;
-}
-.result-box {
-    padding: 20px;
-    border-radius: 10px;
-    margin-bottom: 20px;
-    box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-}
-.positive-result {
-    background-color: #ffe8e8;
-    border: 2px solid #ff9999;
-}
-.negative-result {
-    background-color: #e8ffe8;
-    border: 2px solid #99ff99;
-}
-.info-box {
-    background-color: #f0f7ff;
-    border: 1px solid #bbd6ff;
-    border-radius: 5px;
-    padding: 15px;
-    margin: 20px 0;
-    box-shadow: 0 2px 4px rgba(0, 0, 0, 0.05);
-}
-.treatment-box, .prevention-box {
-    background-color: #f9f9f9;
-    border-radius: 5px;
-    padding: 15px;
-    height: 100%;
-    border-left: 4px solid #3498db;
-    box-shadow: 0 2px 4px rgba(0, 0, 0, 0.05);
-}
-.prevention-box {
-    border-left-color: #2ecc71;
-}
-.cure-box {
-    background-color: #f9f9f9;
-    border-radius: 5px;
-    padding: 15px;
-    height: 100%;
-    border-left: 4px solid #9b59b6;
-    box-shadow: 0 2px 4px rgba(0, 0, 0, 0.05);
-}
-.sidebar .sidebar-content {
-    background-color: #f8f9fa;
-}
-div.stButton > button {
-    background-color: #3498db;
-    color: white;
-    border: none;
-    border-radius: 5px;
-    padding: 10px 20px;
-    font-weight: 600;
-    width: 100%;
-    transition: all 0.3s ease;
-}
-div.stButton > button:hover {
-    background-color: #2980b9;
-    transform: translateY(-2px);
-    box-shadow: 0 4px 8px rgba(0, 0, 0, 0.2);
-}
-.stTabs [data-baseweb="tab-list"] {
-    gap: 24px;
-}
-.stTabs [data-baseweb="tab"] {
-    height: 50px;
-    white-space: pre-wrap;
-    background-color: #f1f1f1;
-    border-radius: 4px 4px 0px 0px;
-    gap: 1px;
-    padding-top: 10px;
-    padding-bottom: 10px;
-}
-.stTabs [aria-selected="true"] {
-    background-color: #3498db;
-    color: white;
-}
-table {
-    font-size: 0.9rem;
-}
-thead tr th {
-    background-color: #f1f1f1;
-    font-weight: 600;
-}
-.footer {
-    text-align: center;
-    margin-top: 50px;
-    padding-top: 20px;
-    border-top: 1px solid #f1f1f1;
-    font-size: 0.8rem;
-    color: #7f8c8d;
-}
-.disease-card {
-    background-color: white;
-    border-radius: 10px;
-    padding: 20px;
-    box-shadow: 0 4px 8px rgba(0, 0, 0, 0.1);
-    height: 100%;
-    transition: all 0.3s ease;
-    border-left: 5px solid #3498db;
-}
-.disease-card:hover {
-    transform: translateY(-5px);
-    box-shadow: 0 8px 16px rgba(0, 0, 0, 0.2);
-}
-.disease-card-title {
-    font-size: 1.5rem;
-    font-weight: 600;
-    color: #2c3e50;
-    margin-bottom: 10px;
-}
-.disease-card-desc {
-    font-size: 0.9rem;
-    color: #7f8c8d;
-    margin-bottom: 20px;
-}
-.disease-card-stat {
-    font-size: 1.2rem;
-    font-weight: 600;
-    color: #e74c3c;
-}
-.stNumberInput input {
-    border-radius: 5px;
-    border: 1px solid #e0e0e0;
-}
-.stNumberInput input:focus {
-    border-color: #3498db;
-    box-shadow: 0 0 0 2px rgba(52, 152, 219, 0.2);
-}
-.nav-card {
-    background-color: white;
-    border-radius: 10px;
-    padding: 15px;
-    box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-    margin-bottom: 15px;
-    cursor: pointer;
-    transition: all 0.3s ease;
-}
-.nav-card:hover {
-    transform: translateY(-3px);
-    box-shadow: 0 6px 12px rgba(0, 0, 0, 0.15);
-}
-.nav-card-title {
-    font-size: 1.2rem;
-    font-weight: 600;
-    color: #2c3e50;
-}
-.nav-card-icon {
-    font-size: 1.5rem;
-    margin-right: 10px;
-    color: #3498db;
-}
-.stNumberInput > div > div > input {
-    height: 40px;
-}
-.profile-card {
-    background-color: white;
-    border-radius: 10px;
-    padding: 20px;
-    box-shadow: 0 4px 8px rgba(0, 0, 0, 0.1);
-    margin-bottom: 20px;
-    border-top: 4px solid #3498db;
-}
-.stCheckbox label span {
-    font-size: 1rem;
-    color: #2c3e50;
-}
-</style>
-""", unsafe_allow_html=True)
+# Custom CSS for styling (built once in page_content)
+st.markdown(APP_CSS, unsafe_allow_html=True)
 
 # --- Function to load trained models ---
 @st.cache_resource
 def load_models():
-    """Load trained machine learning models for each disease."""
-    models = {}
-    
-    # Check if models exist, and load them
-    model_paths = {
-        'diabetes': 'models/diabetes_model.pkl',
-        'heart': 'models/heart_disease_model.pkl',
-        'liver': 'models/liver_disease_model.pkl',
-        'kidney': 'models/kidney_disease_model.pkl',
-        'parkinsons': 'models/parkinsons_model.pkl',
-    }
+    """Create the shared model registry; each model is loaded when its page first needs it."""
+    models = ModelRegistry()
     
-    for disease, path in model_paths.items():
-        try:
-            with open(path, 'rb') as f:
-                models[disease] = pickle.load(f)
-            st.sidebar.success(f"✅ {disease.capitalize()} model loaded successfully")
-        except FileNotFoundError:
-            st.sidebar.error(f"❌ {disease.capitalize()} model not found at {path}")
-        except Exception as e:
-            st.sidebar.error(f"❌ Error loading {disease} model: {str(e)}")
+    # Optionally load everything in the background so first page views are warm
+    if os.environ.get('MODEL_WARMUP') == '1':
+        models.warm_up()
     
     return models
 
-# --- Disease information ---
-disease_info = {
-    'diabetes': {
-        'name': 'Diabetes',
-        'description': 'Diabetes is a chronic disease that occurs when the pancreas is no longer able to make insulin, or when the body cannot make good use of the insulin it produces.',
-        'symptoms': ['Frequent urination', 'Increased thirst', 'Unexplained weight loss', 'Extreme hunger', 'Blurry vision', 'Fatigue', 'Slow-healing sores'],
-        'risk_factors': ['Overweight', 'Family history', 'Physical inactivity', 'Age', 'High blood pressure', 'Abnormal cholesterol levels', 'History of gestational diabetes'],
-        'treatments': ['Insulin therapy', 'Diet management', 'Regular exercise', 'Blood sugar monitoring', 'Oral medications', 'Regular foot care', 'Eye examinations', 'Kidney function tests'],
-        'prevention': ['Maintain a healthy weight', 'Regular physical activity (150 minutes per week)', 'Healthy diet with plenty of fiber and whole grains', 'Limit refined carbohydrates and sugary foods', 'Stay hydrated with water instead of sugary beverages', 'Avoid smoking', 'Limit alcohol consumption', 'Regular check-ups', 'Stress management', 'Adequate sleep'],
-        'cure': 'There is currently no cure for diabetes, but it can be managed effectively through lifestyle changes, medication, and regular monitoring. Type 2 diabetes can sometimes go into remission with significant weight loss and lifestyle changes, but ongoing management is still necessary. Research into artificial pancreas technology and islet cell transplantation shows promise for future treatment options.'
-    },
-    'heart': {
-        'name': 'Heart Disease',
-        'description': 'Heart disease describes a range of conditions that affect your heart, including coronary artery disease, heart rhythm problems (arrhythmias) and heart defects.',
-        'symptoms': ['Chest pain or discomfort', 'Shortness of breath', 'Pain in the neck, jaw, throat, upper abdomen or back', 'Numbness in arms or legs', 'Fatigue', 'Irregular heartbeat', 'Dizziness or lightheadedness', 'Swelling in legs, ankles, or feet'],
-        'risk_factors': ['Age', 'Sex', 'Family history', 'Smoking', 'High blood pressure', 'High cholesterol', 'Diabetes', 'Obesity', 'Physical inactivity', 'Stress', 'Poor diet', 'Excessive alcohol use'],
-        'treatments': ['Medications (statins, beta-blockers, ACE inhibitors)', 'Surgery or medical procedures (angioplasty, stent placement, bypass surgery)', 'Lifestyle changes', 'Cardiac rehabilitation', 'Implantable devices (pacemakers, ICDs)', 'Heart valve repair or replacement', 'Heart transplant (in severe cases)'],
-        'prevention': ['Regular exercise (at least 150 minutes of moderate activity weekly)', 'Heart-healthy diet rich in fruits, vegetables, and whole grains', 'Maintain healthy weight', 'Quit smoking and avoid secondhand smoke', 'Limit alcohol to 1-2 drinks per day', 'Manage stress through meditation, yoga, or other relaxation techniques', 'Regular check-ups and blood pressure monitoring', 'Manage existing health conditions like diabetes or high blood pressure', 'Get adequate sleep (7-8 hours)', 'Know your numbers (cholesterol, blood pressure, blood sugar)'],
-        'cure': 'Heart disease generally cannot be cured completely, but it can be effectively managed and its progression can be slowed or halted with proper treatment. Some forms of heart disease may be improved through interventions like valve replacements or repair of congenital defects. The focus of treatment is typically on controlling symptoms, reducing risk factors, and preventing complications. Emerging research in stem cell therapy and genetic treatments offers hope for more effective treatments in the future.'
-    },
-    'liver': {
-        'name': 'Liver Disease',
-        'description': 'Liver disease is any disturbance of liver function that causes illness. It can be inherited or caused by various factors such as viruses and alcohol use.',
-        'symptoms': ['Yellowish skin and eyes (jaundice)', 'Abdominal pain and swelling', 'Swelling in the legs and ankles', 'Itchy skin', 'Dark urine color', 'Pale stool color', 'Chronic fatigue', 'Nausea or vomiting', 'Loss of appetite', 'Tendency to bruise easily'],
-        'risk_factors': ['Heavy alcohol use', 'Obesity', 'Type 2 diabetes', 'Tattoos or body piercings', 'Injecting drugs using shared needles', 'Blood transfusion before 1992', 'Exposure to certain chemicals or toxins', 'Family history of liver disease', 'Unprotected sex', 'High levels of triglycerides in blood'],
-        'treatments': ['Lifestyle changes (reduced alcohol, healthy diet)', 'Medications to treat the underlying cause', 'Medications for symptom management', 'Liver transplant for advanced liver failure', 'Treatment for complications (varices, ascites)', 'Antiviral medications for viral hepatitis', 'Immunosuppressants for autoimmune hepatitis'],
-        'prevention': ['Limit alcohol consumption (no more than 1-2 drinks per day)', 'Maintain a healthy weight through diet and exercise', 'Get vaccinated against hepatitis A and B', 'Use medications wisely and follow recommended dosages', 'Avoid contact with other peoples blood and body fluids', 'Practice safe sex', 'Dont share needles', 'Use protective gear when handling toxins', 'Regular screening if at high risk', 'Avoid mixing medications and alcohol'],
-        'cure': 'The liver has remarkable regenerative capabilities, allowing it to heal from minor damage. Some liver conditions, like hepatitis A, can resolve completely with proper treatment and rest. For chronic conditions like hepatitis B, C, or cirrhosis, there are effective treatments but often not complete cures. Advanced liver disease may require a liver transplant. Early detection and intervention provide the best outcomes for liver disease management.'
-    },
-    'kidney': {
-        'name': 'Kidney Disease',
-        'description': 'Kidney disease is a condition in which the kidneys are damaged and cannot filter blood as well as they should. This can lead to waste buildup in the body.',
-        'symptoms': ['Nausea', 'Vomiting', 'Loss of appetite', 'Fatigue and weakness', 'Sleep problems', 'Changes in urine output', 'Decreased mental sharpness', 'Muscle twitches and cramps', 'Swelling of feet and ankles', 'Persistent itching', 'Chest pain', 'Shortness of breath'],
-        'risk_factors': ['Diabetes', 'High blood pressure', 'Heart disease', 'Family history of kidney disease', 'Age', 'Smoking', 'Obesity', 'Ethnicity (African Americans, Native Americans, and Asian Americans are at higher risk)', 'Chronic infections', 'Kidney stones'],
-        'treatments': ['Medications to control blood pressure', 'Medications to lower cholesterol', 'Medications for anemia', 'Dialysis (hemodialysis or peritoneal dialysis)', 'Kidney transplant', 'Dietary changes (low-sodium, low-protein diets)', 'Erythropoietin supplements for anemia', 'Phosphate binders'],
-        'prevention': ['Manage diabetes and high blood pressure through medication and lifestyle changes', 'Maintain a healthy weight through regular exercise and a balanced diet', 'Dont smoke or use tobacco products', 'Limit alcohol consumption', 'Stay hydrated but avoid excessive fluid intake', 'Follow a kidney-friendly diet low in sodium and protein if at risk', 'Monitor kidney function with regular tests if you have risk factors', 'Use caution with over-the-counter pain medications', 'Control blood cholesterol levels', 'Regular check-ups if you have kidney disease risk factors'],
-        'cure': 'Chronic kidney disease typically has no cure, but treatments can help control symptoms and slow progression. Acute kidney injuries may heal completely with proper treatment. For end-stage kidney disease, dialysis or kidney transplantation are the main treatment options. Kidney transplantation offers the closest thing to a cure, though anti-rejection medications will be needed for life. Ongoing research in regenerative medicine and artificial kidneys offers hope for future treatment breakthroughs.'
-    },
-
-'parkinsons': {
-    'name': "Parkinson's Disease",
-    'description': "Parkinson's disease is a progressive nervous system disorder that affects movement.",
-    'symptoms': ['Tremors', 'Slow movement', 'Stiffness', 'Balance problems', 'Speech changes'],
-    'risk_factors': ['Age', 'Genetics', 'Environmental toxins', 'Gender (men are more likely)', 'Head trauma'],
-    'treatments': ['Levodopa and carbidopa', 'Dopamine agonists', 'Physical therapy', 'Speech therapy', 'Surgical therapy like Deep Brain Stimulation'],
-    'prevention': ['Regular exercise', 'Healthy diet', 'Avoiding exposure to pesticides or herbicides', 'Wearing helmets during activities', 'Monitoring for early symptoms'],
-    'cure': 'There is currently no cure, but symptoms can be managed with medications, lifestyle changes, and therapy. Research in gene therapy and stem cells shows promise.'
-},
-
-}
+@st.cache_resource
+def get_prediction_cache():
+    """Prediction cache shared by all sessions, backed by the micro-batcher when MICRO_BATCH=1."""
+    if micro_batching_enabled():
+        return PredictionCache.from_env(scorer=MicroBatchScheduler.from_env().score)
+    return PredictionCache.from_env()
+
+@st.cache_resource
+def get_history_store():
+    """Profile and prediction history store shared by all sessions (HISTORY_DB)."""
+    return HistoryStore.from_env()
+
+@st.cache_resource
+def get_shadow_evaluator():
+    """Background scorer for shadow candidates, shared by all sessions (SHADOW_LOG, SHADOW_QUEUE_SIZE)."""
+    return ShadowEvaluator.from_env(load_models())
+
+@st.cache_resource
+def get_explainer(disease, version, _model):
+    """Attribution backend per model version; node statistics are precomputed once."""
+    return explainer_for(_model)
+
+@st.cache_resource
+def get_early_exit(disease, version, _model):
+    """Early-exit forest per model version (EARLY_EXIT_MODELS); tree order and bounds are precomputed once."""
+    return early_exit_for(_model)
+
+@st.cache_resource
+def get_interval_scorer(disease, version, _model):
+    """Per-tree spread scorer per model version (INTERVAL_MODELS), or None where the trees don't run here."""
+    return interval_scorer_for(_model)
+
+def current_user_id():
+    """Profile ID of this session: the saved profile's email, or a per-session guest ID until then."""
+    if 'user_id' not in st.session_state:
+        st.session_state.user_id = f"guest-{uuid.uuid4().hex[:12]}"
+    return st.session_state.user_id
+
+def current_session_id():
+    """Stable ID of this browser session, used to assign A/B arms; unlike the user ID it never changes."""
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    return st.session_state.session_id
+
+@st.cache_resource
+def start_metrics_exporters(_models):
+    """Publish app metrics once per process (METRICS_FILE textfile and/or METRICS_PORT listener)."""
+    register_collector(_models.collect_metrics)
+    register_collector(get_prediction_cache().collect_metrics)
+    register_collector(get_history_store().collect_metrics)
+    return start_exporters_from_env()
+
+def model_status_sidebar(models):
+    """Show which model versions are loaded, with load time and approximate resident size."""
+    with st.sidebar.expander("Model Status"):
+        for disease, stats in models.stats().items():
+            name = disease_info[disease]['name']
+            if stats['loaded']:
+                load_ms = (stats['import_seconds'] + stats['load_seconds']) * 1000
+                where = 'worker pool' if stats['backend'] == 'pool' else f"{stats['rss_bytes'] / 2**20:.1f} MB"
+                tiers = ' · surrogate cascade' if stats.get('cascade') else ''
+                st.markdown(f"✅ **{name}** · v{stats['version']} · {load_ms:.0f} ms · {where}{tiers}")
+                if 'reload_error' in stats:
+                    st.markdown(f"⚠️ Update failed, still serving v{stats['version']}: {stats['reload_error']}")
+                candidate = stats.get('candidate')
+                if candidate is not None:
+                    share = f" · {candidate['fraction']:.0%} of sessions" if candidate['mode'] == 'split' else ''
+                    st.markdown(f"🧪 Candidate v{candidate['version']} · {candidate['mode']}{share}"
+                                + (f" · ❌ {candidate['error']}" if 'error' in candidate else ''))
+            elif 'error' in stats:
+                st.markdown(f"❌ **{name}** · {stats['error']}")
+            else:
+                st.markdown(f"⏳ **{name}** · not loaded yet")
 
 # --- Main app functions ---
-def predict_parkinsons_disease(fo, fhi, flo, jitter_percent, shimmer, rap, ppq, ddp, shimmer_db,
-                                apq3, apq5, apq, dda, nhr, hnr, rpde, dfa, spread1, spread2, d2, ppe, model):
-    """Predict Parkinson's disease using the loaded model."""
-    input_data = np.array([[
-        fo, fhi, flo, jitter_percent, shimmer, rap, ppq, ddp, shimmer_db,
-        apq3, apq5, apq, dda, nhr, hnr, rpde, dfa, spread1, spread2, d2, ppe
-    ]])
-    
-    prediction = model.predict(input_data)
-    probability = model.predict_proba(input_data)[0][1]
-    
-    return prediction[0], probability
-
-def predict_diabetes(pregnancies, glucose, blood_pressure, skin_thickness, insulin, bmi, dpf, age, model):
-    """Predict diabetes using the loaded model."""
-    input_data = np.array([[pregnancies, glucose, blood_pressure, skin_thickness, insulin, bmi, dpf, age]])
-    prediction = model.predict(input_data)
-    probability = model.predict_proba(input_data)[0][1]
-    
-    return prediction[0], probability
-
-def predict_heart_disease(age, sex, cp, trestbps, chol, fbs, restecg, thalach, exang, oldpeak, slope, ca, thal, model):
-    """Predict heart disease using the loaded model."""
-    input_data = np.array([[age, sex, cp, trestbps, chol, fbs, restecg, thalach, exang, oldpeak, slope, ca, thal]])
-    prediction = model.predict(input_data)
-    probability = model.predict_proba(input_data)[0][1]
-    
-    return prediction[0], probability
-
-def predict_liver_disease(age, gender, total_bilirubin, direct_bilirubin, alkaline_phosphatase, 
-                         sgpt, sgot, total_proteins, albumin, ag_ratio, model):
-    """Predict liver disease using the loaded model."""
-    input_data = np.array([[age, gender, total_bilirubin, direct_bilirubin, alkaline_phosphatase, 
-                         sgpt, sgot, total_proteins, albumin, ag_ratio]])
-    prediction = model.predict(input_data)
-    probability = model.predict_proba(input_data)[0][1]
-    
-    return prediction[0], probability
-
-def predict_kidney_disease(age, bp, sg, albumin, sugar, rbc, pc, pcc, bu, sc, sod, model):
-    """Predict kidney disease using the loaded model."""
-    input_data = np.array([[age, bp, sg, albumin, sugar, rbc, pc, pcc, bu, sc, sod]])
-    prediction = model.predict(input_data)
-    probability = model.predict_proba(input_data)[0][1]
-    
-    return prediction[0], probability
-def display_results(prediction, probability, disease_type):
-    """Display prediction results with appropriate styling."""
+def run_model(model, input_data, disease, version, exact=True):
+    """Score an assembled input row with a single predict_proba pass, reusing cached results.
+    
+    Returns (prediction, probability, interval, spread). With exact=False
+    and early exit enabled for the disease, only as many trees run as the
+    decision needs and interval is the (lower, upper) bound on the probability
+    (None once exact). With INTERVAL_MODELS enabled for a tree ensemble, spread
+    is the (lower, upper) range of the per-tree outputs from the same pass,
+    which skips the prediction cache; otherwise None.
+    """
+    if not exact and early_exit_enabled(disease):
+        with timer(STAGE_LATENCY, disease=disease, stage='predict_proba'):
+            predictions, lower, upper, _ = score_interval(get_early_exit(disease, version, model), input_data, disease)
+        inc('predictions_total', disease=disease)
+        # Not sent to the shadow evaluator: its probability deltas need exact values
+        probability = (lower[0] + upper[0]) / 2
+        get_history_store().record_prediction(current_user_id(), disease, version, predictions[0], probability,
+                                              input_data)
+        return predictions[0], probability, (lower[0], upper[0]) if upper[0] > lower[0] else None, None
+    
+    scorer = get_interval_scorer(disease, version, model) if intervals_enabled(disease) else None
+    spread = None
+    with timer(STAGE_LATENCY, disease=disease, stage='predict_proba') as scoring:
+        if scorer is not None:
+            # One tree pass yields both the probability and its spread; the cache only holds probabilities
+            predictions, probabilities, lower, upper = scorer.score(input_data, DECISION_THRESHOLDS[disease])
+            spread = (lower[0], upper[0])
+        else:
+            predictions, probabilities = get_prediction_cache().score(model, input_data, disease, version)
+    inc('predictions_total', disease=disease)
+    get_shadow_evaluator().submit(disease, input_data, predictions, probabilities, version, scoring.elapsed)
+    get_history_store().record_prediction(current_user_id(), disease, version, predictions[0], probabilities[0],
+                                          input_data)
+    
+    return predictions[0], probabilities[0], None, spread
+
+def predict_disease(disease, values, model, version, exact=True):
+    """Predict a disease from a {feature: value} mapping, assembled in the model's schema order.
+    
+    Returns (prediction, probability, interval, spread, input row); see run_model.
+    """
+    with timer(STAGE_LATENCY, disease=disease, stage='input'):
+        input_data = to_row(values, disease)
+    
+    prediction, probability, interval, spread = run_model(model, input_data, disease, version, exact)
+    return prediction, probability, interval, spread, input_data
+
+def contribution_chart(disease, model, version, input_data):
+    """Bar chart of the inputs that pushed this prediction's risk up or down the most."""
+    if disease not in EXPLAINABLE_DISEASES:
+        return
+    
+    with timer(STAGE_LATENCY, disease=disease, stage='explain'):
+        explainer = get_explainer(disease, version, model)
+        contributions = explainer.explain(input_data)[0]
+    
+    order = np.argsort(np.abs(contributions))[::-1][:TOP_CONTRIBUTIONS][::-1]
+    labels = [SCHEMAS[disease][i].label for i in order]
+    values = contributions[order]
+    text = [f"{v:+.1%}" if explainer.output == 'probability' else f"{v:+.2f}" for v in values]
+    
+    st.markdown('<h3 class="tab-subheader">What Drove This Prediction</h3>', unsafe_allow_html=True)
+    fig = go.Figure(go.Bar(x=values, y=labels, orientation='h', text=text, textposition='auto',
+                           marker_color=['#e74c3c' if v > 0 else '#2ecc71' for v in values]))
+    fig.update_layout(xaxis=dict(title=f"Contribution to risk ({explainer.output})", zeroline=True),
+                      height=60 + 32 * len(labels), margin=dict(l=10, r=10, t=10, b=10))
+    st.plotly_chart(fig, use_container_width=True)
+    base = f"{explainer.expected_value:.1%}" if explainer.output == 'probability' else f"{explainer.expected_value:.2f} log-odds"
+    st.caption(f"Red bars raised the predicted risk and green bars lowered it, relative to the model's "
+               f"average output of {base}.")
+
+def show_results(prediction, probability, disease_type, interval=None, spread=None):
+    """Render results and, if enabled, the latency breakdown for this prediction."""
+    with timer(STAGE_LATENCY, disease=disease_type, stage='render'):
+        if spread is not None:
+            risk_gauge(probability, spread, disease_type)
+        display_results(prediction, probability, disease_type, interval, spread)
+    
+    if st.session_state.get('show_latency_debug'):
+        latency_debug_panel(disease_type)
+
+def latency_debug_panel(disease_type):
+    """Show per-stage latency of the last prediction plus running histogram stats."""
+    trace = current_trace()
+    _, histograms = snapshot()
+    
+    rows = []
+    for stage in LATENCY_STAGES:
+        hist = histograms.get((STAGE_LATENCY, (('disease', disease_type), ('stage', stage))))
+        if hist is None:
+            continue
+        rows.append({
+            'Stage': stage,
+            'This request (ms)': round(trace.get(stage, 0.0) * 1000, 3),
+            'Count': hist['count'],
+            'Mean (ms)': round(hist['sum'] / hist['count'] * 1000, 3),
+            'p50 ≤ (ms)': histogram_quantile(0.5, hist) * 1000,
+            'p95 ≤ (ms)': histogram_quantile(0.95, hist) * 1000,
+        })
+    
+    cache_stats = get_prediction_cache().stats()
+    
+    with st.expander("⏱️ Latency Debug", expanded=True):
+        st.dataframe(pd.DataFrame(rows), hide_index=True)
+        st.caption(f"Prediction cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+                   f"({cache_stats['hit_rate']:.0%} hit rate), {cache_stats['size']}/{cache_stats['maxsize']} entries")
+
+def risk_gauge(probability, spread, disease_type):
+    """Gauge of the predicted probability, with the per-tree spread as a dark band and the threshold as a line."""
+    lower, upper = spread
+    color = '#e74c3c' if probability > DECISION_THRESHOLDS[disease_type] else '#2ecc71'
+    fig = go.Figure(go.Indicator(
+        mode='gauge+number', value=probability * 100, number={'suffix': '%', 'valueformat': '.1f'},
+        gauge={
+            'axis': {'range': [0, 100], 'ticksuffix': '%'},
+            'bar': {'color': color, 'thickness': 0.3},
+            # The spread of the ensemble's trees (or final boosting stages) around the probability
+            'steps': [{'range': [lower * 100, max(upper * 100, lower * 100 + 0.5)], 'color': 'rgba(44, 62, 80, 0.45)',
+                       'thickness': 0.75}],
+            'threshold': {'line': {'color': '#2c3e50', 'width': 3}, 'thickness': 0.9,
+                          'value': DECISION_THRESHOLDS[disease_type] * 100},
+        }))
+    fig.update_layout(height=240, margin=dict(l=30, r=30, t=20, b=10))
+    st.plotly_chart(fig, use_container_width=True)
+    parts = 'final boosting stages' if disease_type == 'heart' else 'individual trees'
+    st.caption(f"Dark band: {lower:.1%}–{upper:.1%}, how far the model's {parts} spread around its "
+               f"estimate. This is model-internal spread, not a confidence interval for your risk; "
+               f"the line marks the {DECISION_THRESHOLDS[disease_type]:.0%} decision threshold.")
+
+def display_results(prediction, probability, disease_type, interval=None, spread=None):
+    """Display prediction results with appropriate styling.
+    
+    `interval` is an early-exit (lower, upper) bound, shown instead of the point probability;
+    `spread` is the per-tree spread, shown next to it.
+    """
+    name = disease_info[disease_type]["name"]
+    if interval is None:
+        stated = f'a <strong>{probability:.1%}</strong> probability'
+        if spread is not None:
+            stated += f' (model-internal spread {spread[0]:.1%}–{spread[1]:.1%}, not a confidence interval)'
+    else:
+        stated = f'a probability between <strong>{interval[0]:.1%}</strong> and <strong>{interval[1]:.1%}</strong>'
     if prediction == 1:
         st.markdown(f'<div class="result-box positive-result">'
-                    f'<h3>⚠️ High Risk of {disease_info[disease_type]["name"]} Detected</h3>'
-                    f'<p>The model predicts a <strong>{probability:.1%}</strong> probability of {disease_info[disease_type]["name"]}.</p>'
+                    f'<h3>⚠️ High Risk of {name} Detected</h3>'
+                    f'<p>The model predicts {stated} of {name}.</p>'
                     f'<p>Please consult with a healthcare professional for a proper diagnosis.</p>'
                     f'</div>', unsafe_allow_html=True)
         
         # Display disease information
-        st.markdown(f'<div class="info-box">'
-                    f'<h3>About {disease_info[disease_type]["name"]}</h3>'
-                    f'<p>{disease_info[disease_type]["description"]}</p>'
-                    f'</div>', unsafe_allow_html=True)
-        
-        # Display symptoms
-        st.markdown("### Common Symptoms")
-        symptoms_list = ", ".join(disease_info[disease_type]["symptoms"])
-        st.markdown(f"- {symptoms_list}")
+        st.markdown(about_box_html(disease_type), unsafe_allow_html=True)
+        st.markdown(symptoms_markdown(disease_type))
         
         # Treatment, Prevention, and Cure side by side
         col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            st.markdown('<div class="treatment-box">'
-                        '<h4>Treatment Options</h4>'
-                        '<ul>', unsafe_allow_html=True)
-            for treatment in disease_info[disease_type]["treatments"]:
-                st.markdown(f'<li>{treatment}</li>', unsafe_allow_html=True)
-            st.markdown('</ul></div>', unsafe_allow_html=True)
-            
-        with col2:
-            st.markdown('<div class="prevention-box">'
-                        '<h4>Prevention Measures</h4>'
-                        '<ul>', unsafe_allow_html=True)
-            for prevention in disease_info[disease_type]["prevention"]:
-                st.markdown(f'<li>{prevention}</li>', unsafe_allow_html=True)
-            st.markdown('</ul></div>', unsafe_allow_html=True)
-        
-        with col3:
-            st.markdown('<div class="cure-box">'
-                        '<h4>Cure Status</h4>', unsafe_allow_html=True)
-            st.markdown(f'<p>{disease_info[disease_type]["cure"]}</p>', unsafe_allow_html=True)
-            st.markdown('</div>', unsafe_allow_html=True)
+        col1.markdown(treatment_box_html(disease_type), unsafe_allow_html=True)
+        col2.markdown(prevention_box_html(disease_type), unsafe_allow_html=True)
+        col3.markdown(cure_box_html(disease_type), unsafe_allow_html=True)
             
     else:
         st.markdown(f'<div class="result-box negative-result">'
-                    f'<h3>✅ Low Risk of {disease_info[disease_type]["name"]} Detected</h3>'
-                    f'<p>The model predicts a <strong>{probability:.1%}</strong> probability of {disease_info[disease_type]["name"]}.</p>'
+                    f'<h3>✅ Low Risk of {name} Detected</h3>'
+                    f'<p>The model predicts {stated} of {name}.</p>'
                     f'<p>Always maintain a healthy lifestyle for continued wellbeing.</p>'
                     f'</div>', unsafe_allow_html=True)
         
         # Display prevention tips and cure information
         col1, col2 = st.columns(2)
-        
-        with col1:
-            st.markdown('<div class="prevention-box">'
-                        '<h4>Prevention Tips</h4>'
-                        '<ul>', unsafe_allow_html=True)
-            for prevention in disease_info[disease_type]["prevention"]:
-                st.markdown(f'<li>{prevention}</li>', unsafe_allow_html=True)
-            st.markdown('</ul></div>', unsafe_allow_html=True)
-        
-        with col2:
-            st.markdown('<div class="cure-box">'
-                        '<h4>Cure Status</h4>', unsafe_allow_html=True)
-            st.markdown(f'<p>{disease_info[disease_type]["cure"]}</p>', unsafe_allow_html=True)
-            st.markdown('</div>', unsafe_allow_html=True)
+        col1.markdown(prevention_box_html(disease_type, 'Prevention Tips'), unsafe_allow_html=True)
+        col2.markdown(cure_box_html(disease_type), unsafe_allow_html=True)
 
 # --- Navigation Functions ---
+def go_to(page):
+    """Button callback: switch pages without a second st.rerun()."""
+    st.session_state.page = page
+
 # In the home_page function, modify the Quick Navigation buttons to include unique keys:
 def home_page():
     """Display the home page with app overview and navigation."""
@@ -469,28 +369,18 @@ def home_page():
     col1, col2, col3, col4,col5 = st.columns(5)
     
     with col1:
-        if st.button("Diabetes Prediction", key="home_diabetes_btn"):
-            st.session_state.page = "diabetes"
-            st.rerun()
+        st.button("Diabetes Prediction", key="home_diabetes_btn", on_click=go_to, args=("diabetes",))
     
     with col2:
-        if st.button("Heart Disease Prediction", key="home_heart_btn"):
-            st.session_state.page = "heart"
-            st.rerun()
+        st.button("Heart Disease Prediction", key="home_heart_btn", on_click=go_to, args=("heart",))
     
     with col3:
-        if st.button("Liver Disease Prediction", key="home_liver_btn"):
-            st.session_state.page = "liver"
-            st.rerun()
+        st.button("Liver Disease Prediction", key="home_liver_btn", on_click=go_to, args=("liver",))
     
     with col4:
-        if st.button("Kidney Disease Prediction", key="home_kidney_btn"):
-            st.session_state.page = "kidney"
-            st.rerun()
+        st.button("Kidney Disease Prediction", key="home_kidney_btn", on_click=go_to, args=("kidney",))
     with col5:
-        if st.button("Parkinson's Disease Prediction", key="home_parkinsons_btn"):
-            st.session_state.page = "parkinsons"
-            st.rerun()
+        st.button("Parkinson's Disease Prediction", key="home_parkinsons_btn", on_click=go_to, args=("parkinsons",))
 # In the main function, modify the sidebar navigation buttons to include unique keys:
 def main():
     # Load trained models
@@ -525,15 +415,15 @@ def main():
     if st.session_state.page == 'home':
         home_page()
     elif st.session_state.page == 'diabetes':
-        diabetes_prediction_page(models)
+        prediction_page(models, 'diabetes')
     elif st.session_state.page == 'heart':
-        heart_disease_prediction_page(models)
+        prediction_page(models, 'heart')
     elif st.session_state.page == 'liver':
-        liver_disease_prediction_page(models)
+        prediction_page(models, 'liver')
     elif st.session_state.page == 'kidney':
-        kidney_disease_prediction_page(models)
+        prediction_page(models, 'kidney')
     elif st.session_state.page == 'parkinsons':
-        parkinsons_disease_prediction_page(models)
+        prediction_page(models, 'parkinsons')
     elif st.session_state.page == 'profile':
         user_profile_page()
     elif st.session_state.page == 'about':
@@ -541,316 +431,322 @@ def main():
     
     # Footer
     st.markdown('<div class="footer">© 2025 Health Disease Prediction System | Disclaimer: This application is for educational purposes only.</div>', unsafe_allow_html=True)
-def diabetes_prediction_page(models):
-    """Display diabetes prediction form and results."""
-    st.markdown('<h1 class="main-header">Diabetes Risk Assessment</h1>', unsafe_allow_html=True)
-    
-    # Information about diabetes
-    with st.expander("About Diabetes"):
-        st.markdown(f"""
-        <div class="info-box">
-            <p>{disease_info['diabetes']['description']}</p>
-            <h4>Risk Factors:</h4>
-            <ul>
-                {''.join([f'<li>{factor}</li>' for factor in disease_info['diabetes']['risk_factors']])}
-            </ul>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    # Check if model is loaded
-    if 'diabetes' not in models:
-        st.error("⚠️ Diabetes prediction model not loaded. Please check that the model file exists.")
-        return
-    
-    # Input form
-    st.markdown('<h2 class="sub-header">Enter Your Health Metrics</h2>', unsafe_allow_html=True)
+def render_form(disease, key_prefix=None, exclude=()):
+    """Render the input widgets for a disease from its schema in two columns; returns {feature: value}."""
+    key_prefix = key_prefix or disease
+    fields = [f for f in SCHEMAS[disease] if f.name not in exclude]
+    values = {}
     
     col1, col2 = st.columns(2)
+    half = (len(fields) + 1) // 2
+    for i, feature in enumerate(fields):
+        with col1 if i < half else col2:
+            values[feature.name] = feature_widget(feature, key=f'{key_prefix}_{feature.name}')
     
-    with col1:
-        pregnancies = st.number_input('Number of Pregnancies', min_value=0, max_value=20, value=0, step=1)
-        glucose = st.number_input('Glucose Level (mg/dL)', min_value=0, max_value=300, value=120, step=1)
-        blood_pressure = st.number_input('Blood Pressure (mm Hg)', min_value=0, max_value=200, value=70, step=1)
-        skin_thickness = st.number_input('Skin Thickness (mm)', min_value=0, max_value=100, value=20, step=1)
-    
-    with col2:
-        insulin = st.number_input('Insulin Level (mu U/ml)', min_value=0, max_value=900, value=80, step=1)
-        bmi = st.number_input('BMI', min_value=0.0, max_value=70.0, value=25.0, step=0.1, format="%.1f")
-        dpf = st.number_input('Diabetes Pedigree Function', min_value=0.0, max_value=3.0, value=0.5, step=0.01, format="%.2f")
-        age = st.number_input('Age', min_value=0, max_value=120, value=33, step=1)
+    return values
+
+def feature_widget(feature, key, label=None):
+    """Render one schema feature as a number input or a labelled select box."""
+    if feature.is_categorical:
+        return st.selectbox(label or feature.label, feature.choices, index=feature.default_index,
+                            format_func=lambda x: x[0], key=key)[1]
+    return st.number_input(label or feature.label, min_value=feature.min_value, max_value=feature.max_value,
+                           value=feature.default, step=feature.step, format=feature.format, key=key)
+
+def prediction_page(models, disease):
+    """Display the prediction form and results for one disease."""
+    info = disease_info[disease]
+    st.markdown(f'<h1 class="main-header">{info["name"]} Risk Assessment</h1>', unsafe_allow_html=True)
     
-    # Prediction button
-    if st.button('Predict Diabetes Risk'):
-        with st.spinner('Analyzing your data...'):
-            # Simulate delay for better UX
-            time.sleep(1)
-            # Make prediction
-            prediction, probability = predict_diabetes(pregnancies, glucose, blood_pressure, skin_thickness, 
-                                                       insulin, bmi, dpf, age, models['diabetes'])
-            # Display results
-            display_results(prediction, probability, 'diabetes')
-
-def heart_disease_prediction_page(models):
-    """Display heart disease prediction form and results."""
-    st.markdown('<h1 class="main-header">Heart Disease Risk Assessment</h1>', unsafe_allow_html=True)
-    
-    # Information about heart disease
-    with st.expander("About Heart Disease"):
-        st.markdown(f"""
-        <div class="info-box">
-            <p>{disease_info['heart']['description']}</p>
-            <h4>Risk Factors:</h4>
-            <ul>
-                {''.join([f'<li>{factor}</li>' for factor in disease_info['heart']['risk_factors']])}
-            </ul>
-        </div>
-        """, unsafe_allow_html=True)
+    # Information about the disease
+    with st.expander(f"About {info['name']}"):
+        st.markdown(risk_factors_html(disease), unsafe_allow_html=True)
     
     # Check if model is loaded
-    if 'heart' not in models:
-        st.error("⚠️ Heart disease prediction model not loaded. Please check that the model file exists.")
+    if disease not in models:
+        st.error(f"⚠️ {info['name']} prediction model not loaded. Please check that the model file exists.")
         return
     
-    # Input form
-    st.markdown('<h2 class="sub-header">Enter Your Health Metrics</h2>', unsafe_allow_html=True)
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        age = st.number_input('Age', min_value=1, max_value=120, value=45, step=1)
-        sex = st.selectbox('Sex', [('Male', 1), ('Female', 0)], format_func=lambda x: x[0])[1]
-        cp = st.selectbox('Chest Pain Type', 
-                         [('Typical Angina', 0), ('Atypical Angina', 1), 
-                          ('Non-anginal Pain', 2), ('Asymptomatic', 3)], 
-                         format_func=lambda x: x[0])[1]
-        trestbps = st.number_input('Resting Blood Pressure (mm Hg)', min_value=50, max_value=300, value=120, step=1)
-        chol = st.number_input('Cholesterol (mg/dl)', min_value=50, max_value=600, value=200, step=1)
-        fbs = st.selectbox('Fasting Blood Sugar > 120 mg/dl', [('No', 0), ('Yes', 1)], format_func=lambda x: x[0])[1]
-        restecg = st.selectbox('Resting ECG Results', 
-                              [('Normal', 0), ('ST-T Wave Abnormality', 1), ('Left Ventricular Hypertrophy', 2)], 
-                              format_func=lambda x: x[0])[1]
-    
-    with col2:
-        thalach = st.number_input('Max Heart Rate Achieved', min_value=50, max_value=250, value=150, step=1)
-        exang = st.selectbox('Exercise Induced Angina', [('No', 0), ('Yes', 1)], format_func=lambda x: x[0])[1]
-        oldpeak = st.number_input('ST Depression Induced by Exercise', min_value=0.0, max_value=10.0, value=1.0, step=0.1, format="%.1f")
-        slope = st.selectbox('Slope of Peak Exercise ST Segment', 
-                            [('Upsloping', 0), ('Flat', 1), ('Downsloping', 2)], 
-                            format_func=lambda x: x[0])[1]
-        ca = st.number_input('Number of Major Vessels Colored by Fluoroscopy', min_value=0, max_value=4, value=0, step=1)
-        thal = st.selectbox('Thalassemia', 
-                           [('Normal', 0), ('Fixed Defect', 1), ('Reversible Defect', 2)], 
-                           format_func=lambda x: x[0])[1]
-    
-    # Prediction button
-    if st.button('Predict Heart Disease Risk'):
+    prediction_panel(models, disease)
+
+@fragment
+def prediction_panel(models, disease):
+    """Form, results and what-if panel; reruns on its own so the rest of the page isn't rebuilt."""
+    info = disease_info[disease]
+    result_key = f'{disease}_result'
+    
+    # Inputs only take effect on submit, so editing them doesn't rerun the script
+    with st.form(f'{disease}_form'):
+        st.markdown('<h2 class="sub-header">Enter Your Health Metrics</h2>', unsafe_allow_html=True)
+        values = render_form(disease)
+        # Early exit stops once the risk label is settled and reports a probability range
+        exact = not early_exit_enabled(disease) or st.checkbox(
+            "Compute exact probability", key=f'{disease}_exact',
+            help="Otherwise the model stops as soon as the risk level is certain and shows a probability range.")
+        submitted = st.form_submit_button(f"Predict {info['name']} Risk")
+    
+    # One (model, version) snapshot per run, so a hot swap mid-run can't mix versions;
+    # a split candidate serves this session instead if its arm says so
+    model, version, _ = models.route(disease, current_session_id())
+    
+    if submitted:
         with st.spinner('Analyzing your data...'):
-            # Simulate delay for better UX
-            time.sleep(1)
-            # Make prediction
-            prediction, probability = predict_heart_disease(age, sex, cp, trestbps, chol, fbs, restecg, 
-                                                            thalach, exang, oldpeak, slope, ca, thal, 
-                                                            models['heart'])
-            # Display results
-            display_results(prediction, probability, 'heart')
-
-def liver_disease_prediction_page(models):
-    """Display liver disease prediction form and results."""
-    st.markdown('<h1 class="main-header">Liver Disease Risk Assessment</h1>', unsafe_allow_html=True)
-    
-    # Information about liver disease
-    with st.expander("About Liver Disease"):
-        st.markdown(f"""
-        <div class="info-box">
-            <p>{disease_info['liver']['description']}</p>
-            <h4>Risk Factors:</h4>
-            <ul>
-                {''.join([f'<li>{factor}</li>' for factor in disease_info['liver']['risk_factors']])}
-            </ul>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    # Check if model is loaded
-    if 'liver' not in models:
-        st.error("⚠️ Liver disease prediction model not loaded. Please check that the model file exists.")
-        return
+            start_trace()
+            prediction, probability, interval, spread, input_data = predict_disease(
+                disease, values, model, version, exact)
+        st.session_state[result_key] = (prediction, probability, interval, spread, input_data, version)
+    
+    # The last result stays on screen while the what-if panel is used
+    if result_key in st.session_state:
+        prediction, probability, interval, spread, input_data, result_version = st.session_state[result_key]
+        show_results(prediction, probability, disease, interval, spread)
+        st.caption(f"Model version {result_version}")
+        if result_version == version:
+            contribution_chart(disease, model, version, input_data)
+    
+    what_if_panel(model, version, disease, values)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_sweep(disease, version, base_row, features, points, _model):
+    """Sweep results per model version, base inputs and grid, so reruns don't rescore."""
+    axes, probabilities = sweep(_model, base_row, disease, list(features), points)
+    return [axis.tolist() for axis in axes], probabilities
+
+def _axis_layout(feature, axis):
+    """Plotly axis settings for a swept feature; choices are labelled instead of showing codes."""
+    layout = dict(title=feature.label)
+    if feature.is_categorical:
+        labels = {code: label for label, code in feature.choices}
+        layout.update(tickvals=axis, ticktext=[labels[int(v)] for v in axis])
+    return layout
+
+def what_if_panel(model, version, disease, values):
+    """Show how risk changes as one or two inputs sweep their valid range, from one batched predict_proba."""
+    schema = {f.name: f for f in SCHEMAS[disease]}
+    with st.expander("🔍 What-if Analysis"):
+        st.markdown("See how the predicted risk changes if one or two of your current inputs were different.")
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            features = st.multiselect("Inputs to vary (up to two)", list(schema), max_selections=2,
+                                      format_func=lambda name: schema[name].label, key=f'{disease}_what_if_features')
+        with col2:
+            points = st.slider("Grid points", min_value=10, max_value=MAX_POINTS, value=DEFAULT_POINTS, step=10,
+                               key=f'{disease}_what_if_points')
+        if not features:
+            return
+        
+        base_row = tuple(to_row(values, disease)[0].tolist())
+        axes, probabilities = cached_sweep(disease, version, base_row, tuple(features), points, model)
+        threshold = DECISION_THRESHOLDS[disease]
+        
+        fig = go.Figure()
+        if len(features) == 1:
+            feature = schema[features[0]]
+            fig.add_trace(go.Scatter(x=axes[0], y=probabilities, mode='lines+markers',
+                                     hovertemplate='%{x}: %{y:.1%}<extra></extra>'))
+            fig.add_hline(y=threshold, line_dash='dot', annotation_text='High-risk threshold')
+            fig.add_vline(x=values[feature.name], line_dash='dash', annotation_text='Your value')
+            fig.update_layout(xaxis=_axis_layout(feature, axes[0]),
+                              yaxis=dict(range=[0, 1], tickformat='.0%', title='Predicted probability'))
+        else:
+            y_feature, x_feature = schema[features[0]], schema[features[1]]
+            fig.add_trace(go.Heatmap(x=axes[1], y=axes[0], z=probabilities, zmin=0, zmax=1, colorscale='RdYlGn_r',
+                                     colorbar=dict(title='Risk', tickformat='.0%'),
+                                     hovertemplate='%{y}, %{x}: %{z:.1%}<extra></extra>'))
+            fig.add_trace(go.Scatter(x=[values[x_feature.name]], y=[values[y_feature.name]], mode='markers',
+                                     marker=dict(symbol='x', size=12, color='black'), hoverinfo='skip'))
+            fig.update_layout(xaxis=_axis_layout(x_feature, axes[1]), yaxis=_axis_layout(y_feature, axes[0]),
+                              showlegend=False)
+        fig.update_layout(height=420, margin=dict(l=10, r=10, t=30, b=10))
+        st.plotly_chart(fig, use_container_width=True)
+        st.caption(f"{probabilities.size:,} combinations scored in a single batch; other inputs are held at "
+                   f"the values entered above.")
+
+def screening_page(models):
+    """Collect the union of all model inputs once and score every disease in parallel."""
+    st.markdown('<h1 class="main-header">Full Health Screening</h1>', unsafe_allow_html=True)
     
-    # Input form
-    st.markdown('<h2 class="sub-header">Enter Your Health Metrics</h2>', unsafe_allow_html=True)
+    st.markdown("""
+    <div class="info-box">
+        <p>Enter your details once to get a risk assessment from all five models at the same time.
+        Age, sex and blood pressure are shared between the models that use them.</p>
+    </div>
+    """, unsafe_allow_html=True)
     
-    col1, col2 = st.columns(2)
+    with st.form('screening_form'):
+        st.markdown('<h3 class="tab-subheader">Shared Details</h3>', unsafe_allow_html=True)
+        shared = {}
+        for col, (field, (disease, name, label)) in zip(st.columns(len(SHARED_INPUTS)), SHARED_INPUTS.items()):
+            with col:
+                shared[field] = feature_widget(SCHEMAS[disease][FEATURE_INDEX[disease][name]],
+                                               key=f'screen_{field}', label=label)
+        
+        specific = {}
+        for tab, disease in zip(st.tabs([disease_info[d]['name'] for d in SCHEMAS]), SCHEMAS):
+            with tab:
+                specific[disease] = render_form(disease, key_prefix=f'screen_{disease}',
+                                                exclude=shared_feature_names(disease))
+        
+        submitted = st.form_submit_button('Run Full Screening')
     
-    with col1:
-        age = st.number_input('Age', min_value=1, max_value=120, value=45, step=1, key='liver_age')
-        gender = st.selectbox('Gender', [('Male', 1), ('Female', 0)], format_func=lambda x: x[0])[1]
-        total_bilirubin = st.number_input('Total Bilirubin (mg/dL)', min_value=0.0, max_value=30.0, value=1.0, step=0.1, format="%.1f")
-        direct_bilirubin = st.number_input('Direct Bilirubin (mg/dL)', min_value=0.0, max_value=20.0, value=0.3, step=0.1, format="%.1f")
-        alkaline_phosphatase = st.number_input('Alkaline Phosphatase (IU/L)', min_value=20, max_value=2000, value=290, step=1)
+    if not submitted:
+        return
     
-    with col2:
-        sgpt = st.number_input('SGPT (IU/L)', min_value=1, max_value=2000, value=40, step=1)
-        sgot = st.number_input('SGOT (IU/L)', min_value=1, max_value=2000, value=40, step=1)
-        total_proteins = st.number_input('Total Proteins (g/dL)', min_value=1.0, max_value=15.0, value=6.8, step=0.1, format="%.1f")
-        albumin = st.number_input('Albumin (g/dL)', min_value=0.5, max_value=10.0, value=3.5, step=0.1, format="%.1f")
-        ag_ratio = st.number_input('A/G Ratio', min_value=0.1, max_value=5.0, value=1.0, step=0.1, format="%.1f")
-    
-    # Prediction button
-    if st.button('Predict Liver Disease Risk'):
-        with st.spinner('Analyzing your data...'):
-            # Simulate delay for better UX
-            time.sleep(1)
-            # Make prediction
-            prediction, probability = predict_liver_disease(age, gender, total_bilirubin, direct_bilirubin, 
-                                                           alkaline_phosphatase, sgpt, sgot, total_proteins, 
-                                                           albumin, ag_ratio, models['liver'])
-            # Display results
-            display_results(prediction, probability, 'liver')
-            
-def parkinsons_disease_prediction_page(models):
-    """Display Parkinson's disease prediction form and results."""
-    st.markdown('<h1 class="main-header">Parkinson\'s Disease Risk Assessment</h1>', unsafe_allow_html=True)
+    rows = build_feature_rows(shared, specific)
+    
+    cache = get_prediction_cache()
+    start = time.perf_counter()
+    with st.spinner('Running all models...'):
+        results = screen(models, rows,
+                         scorer=lambda model, X, disease, version: cache.score(model, X, disease, version),
+                         session_id=current_session_id())
+    total_ms = (time.perf_counter() - start) * 1000
+    
+    scored = {d: r for d, r in results.items() if 'error' not in r}
+    for disease, result in results.items():
+        if 'error' in result:
+            st.error(f"❌ {disease_info[disease]['name']}: {result['error']}")
+    if not scored:
+        return
     
-    # Info section
-    with st.expander("About Parkinson's Disease"):
-        st.markdown("""
-        <div class="info-box">
-            <p>Parkinson's disease is a progressive disorder of the nervous system that affects movement. It develops gradually, sometimes starting with a barely noticeable tremor.</p>
-            <h4>Common Symptoms:</h4>
-            <ul>
-                <li>Tremors</li>
-                <li>Slowed movement (bradykinesia)</li>
-                <li>Rigid muscles</li>
-                <li>Speech or writing changes</li>
-                <li>Impaired posture and balance</li>
-            </ul>
-        </div>
-        """, unsafe_allow_html=True)
+    history = get_history_store()
+    shadow = get_shadow_evaluator()
+    for disease, result in scored.items():
+        history.record_prediction(current_user_id(), disease, result['model_version'], result['prediction'],
+                                  result['probability'], rows[disease])
+        shadow.submit(disease, rows[disease], [result['prediction']], [result['probability']],
+                      result['model_version'], result['seconds'])
+    
+    slowest_ms = max(r['seconds'] for r in scored.values()) * 1000
+    st.caption(f"Scored {len(scored)} models in {total_ms:.1f} ms (slowest single model: {slowest_ms:.1f} ms)")
+    
+    names = [disease_info[d]['name'] for d in scored]
+    probabilities = [r['probability'] for r in scored.values()]
+    colors = ['#e74c3c' if r['prediction'] == 1 else '#2ecc71' for r in scored.values()]
+    fig = go.Figure(go.Bar(x=probabilities, y=names, orientation='h', marker_color=colors,
+                           text=[f"{p:.1%}" for p in probabilities], textposition='auto'))
+    fig.update_layout(xaxis=dict(range=[0, 1], tickformat='.0%', title='Predicted probability'),
+                      height=320, margin=dict(l=10, r=10, t=30, b=10), title='Risk by Disease')
+    st.plotly_chart(fig, use_container_width=True)
+    
+    for disease, result in scored.items():
+        label = '⚠️ High risk' if result['prediction'] == 1 else '✅ Low risk'
+        with st.expander(f"{disease_info[disease]['name']}: {label} ({result['probability']:.1%})"):
+            display_results(result['prediction'], result['probability'], disease)
+
+def batch_scoring_page(models):
+    """Score an uploaded CSV/Parquet cohort and offer the results for download."""
+    st.markdown('<h1 class="main-header">Batch Scoring</h1>', unsafe_allow_html=True)
+
+    st.markdown("""
+    <div class="info-box">
+        <p>Upload a CSV or Parquet file with one patient per row. Columns must match the selected model's
+        features; any extra columns (e.g. a patient ID) are kept in the output.</p>
+    </div>
+    """, unsafe_allow_html=True)
 
-    # Check model
-    if 'parkinsons' not in models:
-        st.error("⚠️ Parkinson's prediction model not loaded. Please check that the model file exists.")
+    disease = st.selectbox('Disease Model', list(FEATURE_ORDER),
+                           format_func=lambda d: disease_info[d]['name'], key='batch_disease')
+    st.markdown(f"**Required columns:** `{', '.join(FEATURE_ORDER[disease])}`")
+
+    if disease not in models:
+        st.error(f"⚠️ {disease_info[disease]['name']} prediction model not loaded. Please check that the model file exists.")
         return
 
-    st.markdown('<h2 class="sub-header">Enter Your Health Metrics</h2>', unsafe_allow_html=True)
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        fo = st.number_input("MDVP:Fo(Hz)", value=120.0)
-        fhi = st.number_input("MDVP:Fhi(Hz)", value=150.0)
-        flo = st.number_input("MDVP:Flo(Hz)", value=100.0)
-        jitter_percent = st.number_input("MDVP:Jitter(%)", value=0.005)
-        shimmer = st.number_input("MDVP:Shimmer", value=0.03)
-        rap = st.number_input("MDVP:RAP", value=0.003)
-        ppq = st.number_input("MDVP:PPQ", value=0.004)
-        ddp = st.number_input("Jitter:DDP", value=0.009)
-        shimmer_db = st.number_input("Shimmer:dB", value=0.03)
-        apq3 = st.number_input("Shimmer:APQ3", value=0.01)
+    uploaded = st.file_uploader('Cohort File', type=['csv', 'parquet'])
 
-    with col2:
-        apq5 = st.number_input("Shimmer:APQ5", value=0.02)
-        apq = st.number_input("Shimmer:APQ", value=0.02)
-        dda = st.number_input("Shimmer:DDA", value=0.01)
-        nhr = st.number_input("NHR", value=0.01)
-        hnr = st.number_input("HNR", value=20.0)
-        rpde = st.number_input("RPDE", value=0.5)
-        dfa = st.number_input("DFA", value=0.6)
-        spread1 = st.number_input("Spread1", value=-5.0)
-        spread2 = st.number_input("Spread2", value=0.1)
-        d2 = st.number_input("D2", value=2.0)
-        ppe = st.number_input("PPE", value=0.1)
-
-    if st.button("Predict Parkinson's Risk"):
-        with st.spinner('Analyzing your data...'):
-            time.sleep(1)
-            prediction, probability = predict_parkinsons_disease(
-                fo, fhi, flo, jitter_percent, shimmer, rap, ppq, ddp, shimmer_db,
-                apq3, apq5, apq, dda, nhr, hnr, rpde, dfa, spread1, spread2, d2, ppe,
-                models['parkinsons']
-            )
-            display_results(prediction, probability, 'parkinsons')
-
-
-def kidney_disease_prediction_page(models):
-    """Display kidney disease prediction form and results."""
-    st.markdown('<h1 class="main-header">Kidney Disease Risk Assessment</h1>', unsafe_allow_html=True)
-    
-    # Information about kidney disease
-    with st.expander("About Kidney Disease"):
-        st.markdown(f"""
-        <div class="info-box">
-            <p>{disease_info['kidney']['description']}</p>
-            <h4>Risk Factors:</h4>
-            <ul>
-                {''.join([f'<li>{factor}</li>' for factor in disease_info['kidney']['risk_factors']])}
-            </ul>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    # Check if model is loaded
-    if 'kidney' not in models:
-        st.error("⚠️ Kidney disease prediction model not loaded. Please check that the model file exists.")
+    if uploaded is not None and st.button('Score Cohort'):
+        with st.spinner('Scoring cohort...'):
+            try:
+                scored = score_cohort(read_cohort(uploaded, uploaded.name), disease, models[disease],
+                                      with_interval=intervals_enabled(disease))
+            except ValueError as e:
+                st.error(f"❌ {e}")
+                return
+
+        positives = int(scored['prediction'].sum())
+        st.success(f"✅ Scored {len(scored)} rows, {positives} predicted at high risk")
+        st.dataframe(scored.head(100))
+        st.download_button('Download Results (CSV)', scored.to_csv(index=False),
+                           file_name=f"{disease}_scored.csv", mime='text/csv')
+
+def _option_index(options, value):
+    return options.index(value) if value in options else 0
+
+def risk_trend_chart(history, user_id):
+    """Plot each disease's predicted probability over time from the daily/weekly rollups."""
+    if not history.trend(user_id, period='week', limit=1):
         return
     
-    # Input form
-    st.markdown('<h2 class="sub-header">Enter Your Health Metrics</h2>', unsafe_allow_html=True)
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        age = st.number_input('Age', min_value=1, max_value=120, value=45, step=1, key='kidney_age')
-        bp = st.number_input('Blood Pressure (mm Hg)', min_value=50, max_value=200, value=80, step=1)
-        sg = st.selectbox('Specific Gravity', 
-                         [('1.005', 0), ('1.010', 1), ('1.015', 2), ('1.020', 3), ('1.025', 4)], 
-                         index=2, format_func=lambda x: x[0])[1]
-        albumin = st.selectbox('Albumin', 
-                              [('0', 0), ('1', 1), ('2', 2), ('3', 3), ('4', 4), ('5', 5)], 
-                              format_func=lambda x: x[0])[1]
-        sugar = st.selectbox('Sugar', 
-                             [('0', 0), ('1', 1), ('2', 2), ('3', 3), ('4', 4), ('5', 5)], 
-                             format_func=lambda x: x[0])[1]
-    
-    with col2:
-        rbc = st.selectbox('Red Blood Cells', [('Normal', 0), ('Abnormal', 1)], format_func=lambda x: x[0])[1]
-        pc = st.selectbox('Pus Cell', [('Normal', 0), ('Abnormal', 1)], format_func=lambda x: x[0])[1]
-        pcc = st.selectbox('Pus Cell Clumps', [('Not Present', 0), ('Present', 1)], format_func=lambda x: x[0])[1]
-        bu = st.number_input('Blood Urea (mg/dL)', min_value=1.0, max_value=200.0, value=44.0, step=0.1, format="%.1f")
-        sc = st.number_input('Serum Creatinine (mg/dL)', min_value=0.1, max_value=15.0, value=1.3, step=0.1, format="%.1f")
-        sod = st.number_input('Sodium (mEq/L)', min_value=100, max_value=200, value=135, step=1)
-    
-    # Prediction button
-    if st.button('Predict Kidney Disease Risk'):
-        with st.spinner('Analyzing your data...'):
-            # Simulate delay for better UX
-            time.sleep(1)
-            # Make prediction
-            prediction, probability = predict_kidney_disease(age, bp, sg, albumin, sugar, rbc, pc, pcc, bu, sc, sod, 
-                                                           models['kidney'])
-            # Display results
-            display_results(prediction, probability, 'kidney')
+    st.markdown('<h2 class="sub-header">Risk Trends</h2>', unsafe_allow_html=True)
+    period = st.radio("Trend Period", ['day', 'week'], horizontal=True, key='trend_period',
+                      format_func=lambda p: 'Daily' if p == 'day' else 'Weekly')
+    trend = pd.DataFrame(history.trend(user_id, period=period, limit=366 if period == 'day' else 104))
+    trend['date'] = pd.to_datetime(trend['bucket_start'], unit='s')
+    fig = go.Figure()
+    for disease, rows in trend.groupby('disease', sort=False):
+        fig.add_trace(go.Scatter(
+            x=rows['date'], y=rows['mean_probability'], mode='lines+markers', name=disease_info[disease]['name'],
+            error_y=dict(type='data', symmetric=False, array=rows['max_probability'] - rows['mean_probability'],
+                         arrayminus=rows['mean_probability'] - rows['min_probability'], thickness=1),
+            customdata=rows[['count', 'positives']],
+            hovertemplate='%{x|%Y-%m-%d}: %{y:.1%} mean (%{customdata[0]} predictions, '
+                          '%{customdata[1]} high risk)<extra>%{fullData.name}</extra>'))
+    fig.update_layout(yaxis=dict(range=[0, 1], tickformat='.0%', title='Predicted probability'),
+                      height=400, margin=dict(l=10, r=10, t=30, b=10), hovermode='closest')
+    st.plotly_chart(fig, use_container_width=True)
 
 def user_profile_page():
     """Display and manage user health profile."""
     st.markdown('<h1 class="main-header">My Health Profile</h1>', unsafe_allow_html=True)
     
+    history = get_history_store()
+    user_id = current_user_id()
+    
+    # Returning users pick their profile up again with their email and the profile key issued on first save
+    if user_id.startswith('guest-'):
+        col1, col2, col3 = st.columns([2, 2, 1])
+        with col1:
+            lookup = st.text_input("Returning user? Email", key='profile_lookup')
+        with col2:
+            profile_key = st.text_input("Profile key", type='password', key='profile_key')
+        with col3:
+            st.write("")
+            if st.button("Load Profile") and lookup.strip() and profile_key.strip():
+                owner = lookup.strip().lower()
+                # Same message either way, so the form can't be used to probe which emails have profiles
+                if not history.check_profile_key(owner, profile_key):
+                    st.warning("Email or profile key is incorrect.")
+                else:
+                    history.merge_user(user_id, owner)
+                    st.session_state.user_id = owner
+                    history.flush(timeout=2.0)
+                    st.rerun()
+    
+    saved = history.get_profile(user_id) or {}
+    
     # Profile form
     st.markdown('<div class="profile-card">', unsafe_allow_html=True)
     st.markdown('<h3>Personal Information</h3>', unsafe_allow_html=True)
     
+    genders = ["Male", "Female", "Other"]
+    blood_types = ["A+", "A-", "B+", "B-", "AB+", "AB-", "O+", "O-", "Unknown"]
+    
     col1, col2 = st.columns(2)
     
     with col1:
-        name = st.text_input("Full Name", value="John Doe")
-        age = st.number_input("Age", min_value=1, max_value=120, value=35)
-        gender = st.selectbox("Gender", ["Male", "Female", "Other"])
-        height = st.number_input("Height (cm)", min_value=50, max_value=250, value=170)
-        weight = st.number_input("Weight (kg)", min_value=20, max_value=300, value=70)
+        name = st.text_input("Full Name", value=saved.get('name', "John Doe"))
+        age = st.number_input("Age", min_value=1, max_value=120, value=saved.get('age', 35))
+        gender = st.selectbox("Gender", genders, index=_option_index(genders, saved.get('gender')))
+        height = st.number_input("Height (cm)", min_value=50, max_value=250, value=saved.get('height', 170))
+        weight = st.number_input("Weight (kg)", min_value=20, max_value=300, value=saved.get('weight', 70))
     
     with col2:
-        blood_type = st.selectbox("Blood Type", ["A+", "A-", "B+", "B-", "AB+", "AB-", "O+", "O-", "Unknown"])
-        email = st.text_input("Email", value="john.doe@example.com")
-        phone = st.text_input("Phone Number", value="+1234567890")
-        emergency_contact = st.text_input("Emergency Contact", value="Jane Doe: +0987654321")
+        blood_type = st.selectbox("Blood Type", blood_types, index=_option_index(blood_types, saved.get('blood_type')))
+        email = st.text_input("Email (required)", value=saved.get('email', ""))
+        phone = st.text_input("Phone Number", value=saved.get('phone', "+1234567890"))
+        emergency_contact = st.text_input("Emergency Contact",
+                                          value=saved.get('emergency_contact', "Jane Doe: +0987654321"))
     
     st.markdown('</div>', unsafe_allow_html=True)
     
@@ -861,17 +757,17 @@ def user_profile_page():
     existing_conditions = st.multiselect(
         "Existing Medical Conditions",
         ["Diabetes", "Hypertension", "Heart Disease", "Kidney Disease", "Liver Disease", "Asthma", "Cancer", "Other"],
-        default=[]
+        default=saved.get('existing_conditions', [])
     )
     
-    allergies = st.text_area("Allergies", value="None")
+    allergies = st.text_area("Allergies", value=saved.get('allergies', "None"))
     
-    medications = st.text_area("Current Medications", value="None")
+    medications = st.text_area("Current Medications", value=saved.get('medications', "None"))
     
     family_history = st.multiselect(
         "Family Medical History",
         ["Diabetes", "Hypertension", "Heart Disease", "Kidney Disease", "Liver Disease", "Cancer", "Other"],
-        default=[]
+        default=saved.get('family_history', [])
     )
     
     st.markdown('</div>', unsafe_allow_html=True)
@@ -880,24 +776,68 @@ def user_profile_page():
     st.markdown('<div class="profile-card">', unsafe_allow_html=True)
     st.markdown('<h3>Lifestyle Information</h3>', unsafe_allow_html=True)
     
+    activity_levels = ["Sedentary", "Light", "Moderate", "Active", "Very Active"]
+    alcohol_levels = ["None", "Occasional", "Moderate", "Heavy"]
+    diets = ["Regular", "Vegetarian", "Vegan", "Keto", "Paleo", "Other"]
+    
     col1, col2 = st.columns(2)
     
     with col1:
-        exercise = st.selectbox("Physical Activity Level", ["Sedentary", "Light", "Moderate", "Active", "Very Active"])
-        sleep = st.number_input("Average Sleep Hours", min_value=1, max_value=24, value=7)
-        smoker = st.checkbox("Smoker")
+        exercise = st.selectbox("Physical Activity Level", activity_levels,
+                                index=_option_index(activity_levels, saved.get('exercise')))
+        sleep = st.number_input("Average Sleep Hours", min_value=1, max_value=24, value=saved.get('sleep', 7))
+        smoker = st.checkbox("Smoker", value=saved.get('smoker', False))
     
     with col2:
-        alcohol = st.selectbox("Alcohol Consumption", ["None", "Occasional", "Moderate", "Heavy"])
-        diet = st.selectbox("Diet Type", ["Regular", "Vegetarian", "Vegan", "Keto", "Paleo", "Other"])
-        stress = st.slider("Stress Level (1-10)", min_value=1, max_value=10, value=5)
+        alcohol = st.selectbox("Alcohol Consumption", alcohol_levels,
+                               index=_option_index(alcohol_levels, saved.get('alcohol')))
+        diet = st.selectbox("Diet Type", diets, index=_option_index(diets, saved.get('diet')))
+        stress = st.slider("Stress Level (1-10)", min_value=1, max_value=10, value=saved.get('stress', 5))
     
     st.markdown('</div>', unsafe_allow_html=True)
     
     # Save profile button
     if st.button("Save Profile"):
+        if not email.strip():
+            st.error("❌ An email address is required to save your profile.")
+            return
+        profile = {
+            'name': name, 'age': age, 'gender': gender, 'height': height, 'weight': weight,
+            'blood_type': blood_type, 'email': email.strip(), 'phone': phone, 'emergency_contact': emergency_contact,
+            'existing_conditions': existing_conditions, 'allergies': allergies, 'medications': medications,
+            'family_history': family_history, 'exercise': exercise, 'sleep': sleep, 'smoker': smoker,
+            'alcohol': alcohol, 'diet': diet, 'stress': stress,
+        }
+        # The profile is keyed by email; predictions made earlier in this session move with it
+        new_user_id = email.strip().lower()
+        new_key = None
+        if new_user_id != user_id:
+            new_key = history.claim_profile(new_user_id)
+            if new_key is None:
+                st.error("❌ A profile already exists for this email. Load it with its profile key to make changes.")
+                return
+            history.merge_user(user_id, new_user_id)
+            st.session_state.user_id = new_user_id
+        history.save_profile(new_user_id, profile)
+        history.flush(timeout=2.0)
         st.success("Profile saved successfully!")
-        st.info("Note: In a production environment, this data would be securely stored in a database.")
+        if new_key is not None:
+            st.info("Your profile key is below. You need it together with your email to load this profile "
+                    "again, and it is shown only this once.")
+            st.code(new_key, language=None)
+    
+    risk_trend_chart(history, current_user_id())
+    
+    # Recent predictions
+    recent = history.predictions(current_user_id(), limit=20)
+    if recent:
+        st.markdown('<h2 class="sub-header">Recent Predictions</h2>', unsafe_allow_html=True)
+        st.dataframe(pd.DataFrame({
+            'Date': pd.to_datetime([r['created_at'] for r in recent], unit='s').strftime('%Y-%m-%d %H:%M'),
+            'Disease': [disease_info[r['disease']]['name'] for r in recent],
+            'Risk': ['High' if r['prediction'] == 1 else 'Low' for r in recent],
+            'Probability': [f"{r['probability']:.1%}" for r in recent],
+        }), hide_index=True)
 
 def about_page():
     """Display information about the app and the diseases it can predict."""
@@ -918,20 +858,7 @@ def about_page():
     
     for disease_key, disease_data in disease_info.items():
         with st.expander(f"{disease_data['name']}"):
-            st.markdown(f"""
-            <h4>{disease_data['name']}</h4>
-            <p>{disease_data['description']}</p>
-            
-            <h5>Common Symptoms</h5>
-            <ul>
-                {''.join([f'<li>{symptom}</li>' for symptom in disease_data['symptoms']])}
-            </ul>
-            
-            <h5>Risk Factors</h5>
-            <ul>
-                {''.join([f'<li>{factor}</li>' for factor in disease_data['risk_factors']])}
-            </ul>
-            """, unsafe_allow_html=True)
+            st.markdown(disease_summary_html(disease_key), unsafe_allow_html=True)
     
     # Technical details
     st.markdown('<h2 class="sub-header">Technical Details</h2>', unsafe_allow_html=True)
@@ -954,10 +881,13 @@ def about_page():
 def main():
     # Load trained models
     models = load_models()
+    start_metrics_exporters(models)
     
     # Set up sidebar
     st.sidebar.markdown('<h3 style="text-align: center;">Navigation</h3>', unsafe_allow_html=True)
     
+    st.sidebar.checkbox('Show latency debug panel', key='show_latency_debug')
+    
     # Define the pages
     pages = {
         'home': 'Home',
@@ -966,37 +896,54 @@ def main():
         'liver': 'Liver Disease Prediction',
         'kidney': 'Kidney Disease Prediction',
         'parkinsons': 'Parkinsons Disease Prediction',
+        'screening': 'Full Health Screening',
+        'batch': 'Batch Scoring',
         'profile': 'My Health Profile',
         'about': 'About'
     }
     # Parkinson's model
 
-    # Sidebar navigation
+    # Sidebar navigation; the callback switches page before the rerun, so one click is one run
     for page_id, page_name in pages.items():
-        if st.sidebar.button(page_name):
-            st.session_state.page = page_id
-            st.rerun()
+        st.sidebar.button(page_name, on_click=go_to, args=(page_id,))
     
     # Set default page
     if 'page' not in st.session_state:
         st.session_state.page = 'home'
     
     # Display the appropriate page
-    if st.session_state.page == 'home':
+    page = st.session_state.page
+    inc('page_views_total', page=page)
+    try:
+        with timer('page_render_seconds', page=page):
+            render_page(page, models)
+    except Exception as e:
+        inc('page_errors_total', page=page, error=type(e).__name__)
+        raise
+    
+    model_status_sidebar(models)
+
+def render_page(page, models):
+    """Dispatch to the selected page."""
+    if page == 'home':
         home_page()
-    elif st.session_state.page == 'diabetes':
-        diabetes_prediction_page(models)
-    elif st.session_state.page == 'heart':
-        heart_disease_prediction_page(models)
-    elif st.session_state.page == 'liver':
-        liver_disease_prediction_page(models)
-    elif st.session_state.page == 'kidney':
-        kidney_disease_prediction_page(models)
-    elif st.session_state.page == 'parkinsons':
-        parkinsons_disease_prediction_page(models)
-    elif st.session_state.page == 'profile':
+    elif page == 'diabetes':
+        prediction_page(models, 'diabetes')
+    elif page == 'heart':
+        prediction_page(models, 'heart')
+    elif page == 'liver':
+        prediction_page(models, 'liver')
+    elif page == 'kidney':
+        prediction_page(models, 'kidney')
+    elif page == 'parkinsons':
+        prediction_page(models, 'parkinsons')
+    elif page == 'screening':
+        screening_page(models)
+    elif page == 'batch':
+        batch_scoring_page(models)
+    elif page == 'profile':
         user_profile_page()
-    elif st.session_state.page == 'about':
+    elif page == 'about':
         about_page()
         
 if __name__ == '__main__':
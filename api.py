@@ -0,0 +1,197 @@
+"""Headless JSON scoring service for the disease models.
+
+Run with several worker processes (models are loaded once per worker and stay in memory):
+    gunicorn --workers 4 --preload --bind 0.0.0.0:8000 api:app
+
+With threaded workers (--threads), POOLED_MODELS=kidney moves the GIL-bound
+models into per-worker inference processes (see process_pool.py).
+
+Or for local testing:
+    python api.py
+
+Endpoints:
+    GET  /health              -> per-model load status, timings and size
+    GET  /metrics             -> Prometheus text exposition
+    POST /predict/<disease>   -> body is one feature object, a list of them, or {"rows": [...]};
+                                 {"rows": [...], "user_id": "..."} also records the results in
+                                 that user's prediction history
+    POST /predict/<disease>?exact=0
+                              -> for models in EARLY_EXIT_MODELS, each result also carries
+                                 "probability_interval" and "trees_visited" (see early_exit.py);
+                                 "probability" is then the interval's midpoint
+
+A/B splits (see shadow.py) assign sessions by the body's user_id, or the
+X-Session-Id header when there is none; requests with neither are served by
+the active model.
+"""
+import json
+import os
+import threading
+import time
+from urllib.parse import parse_qs
+
+from disease_models import FEATURE_ORDER, rows_to_matrix
+from early_exit import early_exit_enabled, early_exit_for, score_interval
+from history_store import HistoryStore
+from metrics import PROMETHEUS_CONTENT_TYPE, SIZE_BUCKETS, inc, observe, register_collector, render_prometheus
+from micro_batcher import MicroBatchScheduler, micro_batching_enabled
+from model_registry import ModelRegistry
+from prediction_cache import PredictionCache
+from shadow import ShadowEvaluator
+
+# Warmed at import by default so gunicorn --preload shares one copy between
+# forked workers; MODEL_WARMUP=0 loads each model on its first request instead.
+# Each worker then watches models/manifest.json and swaps in newly published versions.
+models = ModelRegistry()
+if os.environ.get('MODEL_WARMUP', '1') != '0':
+    models.warm_up(background=False)
+
+# With threaded workers (gunicorn --threads), MICRO_BATCH=1 merges concurrent requests per model
+if micro_batching_enabled():
+    prediction_cache = PredictionCache.from_env(scorer=MicroBatchScheduler.from_env().score)
+else:
+    prediction_cache = PredictionCache.from_env()
+
+history = HistoryStore.from_env()
+shadow = ShadowEvaluator.from_env(models)
+
+register_collector(models.collect_metrics)
+register_collector(prediction_cache.collect_metrics)
+register_collector(history.collect_metrics)
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+# Early-exit forests per (disease, model version), built on first use
+_early_exit_forests = {}
+_early_exit_lock = threading.Lock()
+
+
+def _early_exit_forest(disease, version, model):
+    key = (disease, version)
+    with _early_exit_lock:
+        if key not in _early_exit_forests:
+            _early_exit_forests[key] = early_exit_for(model)
+        return _early_exit_forests[key]
+
+
+def _json_response(start_response, status, payload):
+    body = json.dumps(payload).encode('utf-8')
+    start_response(status, [('Content-Type', 'application/json'), ('Content-Length', str(len(body)))])
+    return [body]
+
+
+def _read_rows(environ):
+    """Parse the request body into (list of feature dicts, user_id or None)."""
+    try:
+        length = int(environ.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        length = 0
+    if length <= 0:
+        raise ValueError("Request body is empty")
+    if length > MAX_BODY_BYTES:
+        raise ValueError("Request body is too large")
+
+    try:
+        payload = json.loads(environ['wsgi.input'].read(length))
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON: {e}")
+
+    user_id = None
+    if isinstance(payload, dict) and 'rows' in payload:
+        user_id = payload.get('user_id')
+        if user_id is not None and not isinstance(user_id, str):
+            raise ValueError("user_id must be a string")
+        payload = payload['rows']
+    elif isinstance(payload, dict):
+        payload = [payload]
+    if not isinstance(payload, list) or not all(isinstance(row, dict) for row in payload):
+        raise ValueError("Body must be a feature object, a list of objects, or {\"rows\": [...]}")
+    return payload, user_id
+
+
+def predict(environ, start_response, disease):
+    if disease not in FEATURE_ORDER:
+        return _json_response(start_response, '404 Not Found', {'error': f"Unknown disease '{disease}'"})
+    if disease not in models:
+        return _json_response(start_response, '503 Service Unavailable',
+                              {'error': f"{disease} model not loaded"})
+
+    start = time.perf_counter()
+    try:
+        rows, user_id = _read_rows(environ)
+        X = rows_to_matrix(rows, disease)
+    except ValueError as e:
+        inc('api_errors_total', disease=disease, status='400')
+        return _json_response(start_response, '400 Bad Request', {'error': str(e)})
+
+    model, version, _ = models.route(disease, user_id or environ.get('HTTP_X_SESSION_ID'))
+    early_exit = (early_exit_enabled(disease)
+                  and parse_qs(environ.get('QUERY_STRING', '')).get('exact', ['1'])[-1] in ('0', 'false'))
+    try:
+        scored = time.perf_counter()
+        if early_exit:
+            predictions, lower, upper, visited = score_interval(_early_exit_forest(disease, version, model), X, disease)
+            probabilities = (lower + upper) / 2
+        else:
+            predictions, probabilities = prediction_cache.score(model, X, disease, version)
+        scored = time.perf_counter() - scored
+    except Exception as e:
+        inc('api_errors_total', disease=disease, status='500')
+        return _json_response(start_response, '500 Internal Server Error', {'error': f"{type(e).__name__}: {e}"})
+    # Only queues the rows; a shadow candidate scores them on its own thread (exact probabilities only)
+    if not early_exit:
+        shadow.submit(disease, X, predictions, probabilities, version, scored)
+    observe('api_request_seconds', time.perf_counter() - start, disease=disease)
+    observe('api_request_rows', X.shape[0], buckets=SIZE_BUCKETS, disease=disease)
+    if user_id:
+        for row, prediction, probability in zip(X, predictions, probabilities):
+            history.record_prediction(user_id, disease, version, prediction, probability, row)
+    results = [{'prediction': int(p), 'probability': float(prob)}
+               for p, prob in zip(predictions, probabilities)]
+    if early_exit:
+        for result, low, high, trees in zip(results, lower, upper, visited):
+            result['probability_interval'] = [float(low), float(high)]
+            result['trees_visited'] = int(trees)
+
+    return _json_response(start_response, '200 OK', {
+        'disease': disease,
+        'model_version': version,
+        'results': results,
+        'latency_ms': round((time.perf_counter() - start) * 1000, 3),
+    })
+
+
+def app(environ, start_response):
+    """WSGI entry point."""
+    method = environ['REQUEST_METHOD']
+    path = environ.get('PATH_INFO', '').rstrip('/')
+
+    if path == '/health' and method == 'GET':
+        return _json_response(start_response, '200 OK', {
+            'status': 'ok',
+            'models': models.stats(),
+            'cache': prediction_cache.stats(),
+            'history': history.stats(),
+            'shadow': shadow.stats(),
+            'pool': models.pool.stats() if models.pool is not None else None,
+        })
+
+    if path == '/metrics' and method == 'GET':
+        body = render_prometheus().encode('utf-8')
+        start_response('200 OK', [('Content-Type', PROMETHEUS_CONTENT_TYPE), ('Content-Length', str(len(body)))])
+        return [body]
+
+    if path.startswith('/predict/'):
+        if method != 'POST':
+            return _json_response(start_response, '405 Method Not Allowed', {'error': "Use POST"})
+        return predict(environ, start_response, path[len('/predict/'):])
+
+    return _json_response(start_response, '404 Not Found', {'error': f"No route for {path or '/'}"})
+
+
+if __name__ == '__main__':
+    from wsgiref.simple_server import make_server
+
+    with make_server('127.0.0.1', 8000, app) as server:
+        print("Serving on http://127.0.0.1:8000")
+        server.serve_forever()
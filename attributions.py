@@ -0,0 +1,104 @@
+"""Per-prediction feature attributions for the tree-based disease models.
+
+The diabetes RandomForest, the heart GradientBoosting model and the Parkinson's
+RandomForest pipeline use path attribution over the flattened node tables from
+tree_export: each node's expected output is precomputed from the leaf values
+weighted by training cover, and every split on a row's path credits its
+feature with the change in expected output. Contributions plus the base value
+add up exactly to the model's output (probability for forests, log-odds for
+boosting). The liver XGBoost model uses the booster's native TreeSHAP.
+"""
+import numpy as np
+
+from tree_export import EVAL_BLOCK_ROWS, CompiledEnsemble, flatten_ensemble
+
+EXPLAINABLE_DISEASES = ('diabetes', 'heart', 'liver', 'parkinsons')
+
+
+def _expected_values(ensemble):
+    """Cover-weighted mean leaf value below every node, computed bottom-up one level per pass."""
+    nodes = np.arange(ensemble.value.shape[0])
+    left, right = np.asarray(ensemble.left), np.asarray(ensemble.right)
+    is_leaf = left == nodes
+    cover_left, cover_right = ensemble.cover[left], ensemble.cover[right]
+    total = np.where(is_leaf, 1.0, cover_left + cover_right)
+    expected = np.where(is_leaf, ensemble.value, 0.0)
+    for _ in range(ensemble.meta['max_depth']):
+        expected = np.where(is_leaf, ensemble.value, (cover_left * expected[left] + cover_right * expected[right]) / total)
+    return expected
+
+
+class TreePathExplainer:
+    """Path attributions for a CompiledEnsemble, in batches of rows."""
+
+    def __init__(self, ensemble):
+        if ensemble.cover is None:
+            raise ValueError("Node tables were exported without cover; re-run tree_export.py")
+        self.ensemble = ensemble
+        meta = ensemble.meta
+        if meta['kind'] == 'GradientBoostingClassifier':
+            self.output = 'log-odds'
+            scale, offset = meta['learning_rate'], meta['init_raw']
+        else:
+            self.output = 'probability'
+            scale, offset = 1.0 / meta['n_trees'], 0.0
+
+        expected = _expected_values(ensemble)
+        self.expected_value = float(offset + scale * expected[ensemble.roots].sum())
+        # Credit for leaving a node, laid out like CompiledEnsemble._children ([right, left] per node);
+        # leaves step to themselves and earn nothing.
+        self._gain = scale * (expected[ensemble._children] - np.repeat(expected, 2))
+
+    def explain(self, X):
+        """Per-feature contributions, shape (n_rows, n_features); row sums + expected_value = model output."""
+        ensemble = self.ensemble
+        X = ensemble._prepare(X)
+        n_rows, n_features = X.shape
+        out = np.empty((n_rows, n_features))
+        for start in range(0, n_rows, EVAL_BLOCK_ROWS):
+            block = X[start:start + EVAL_BLOCK_ROWS]
+            flat = block.ravel()
+            row_offsets = (np.arange(block.shape[0], dtype=np.int64) * n_features)[:, None]
+            nodes = np.broadcast_to(ensemble.roots, (block.shape[0], ensemble.roots.shape[0])).astype(np.int64)
+            contributions = np.zeros(block.shape[0] * n_features)
+            for _ in range(ensemble.meta['max_depth']):
+                features = ensemble.feature[nodes]
+                step = 2 * nodes + (flat[row_offsets + features] <= ensemble.threshold[nodes])
+                contributions += np.bincount((row_offsets + features).ravel(), weights=self._gain[step].ravel(),
+                                             minlength=contributions.shape[0])
+                nodes = ensemble._children[step]
+            out[start:start + EVAL_BLOCK_ROWS] = contributions.reshape(block.shape[0], n_features)
+        return out
+
+
+class XGBoostExplainer:
+    """Exact TreeSHAP values from the XGBoost booster itself (pred_contribs), in log-odds."""
+
+    output = 'log-odds'
+
+    def __init__(self, model):
+        import xgboost
+
+        self._dmatrix = xgboost.DMatrix
+        self.booster = model.get_booster()
+        n_features = int(model.n_features_in_)
+        self.expected_value = float(self._contribs(np.zeros((1, n_features)))[0, -1])
+
+    def _contribs(self, X):
+        return self.booster.predict(self._dmatrix(np.asarray(X, dtype=np.float64),
+                                                  feature_names=self.booster.feature_names), pred_contribs=True)
+
+    def explain(self, X):
+        return self._contribs(X)[:, :-1].astype(np.float64)
+
+
+def explainer_for(model):
+    """Build the attribution backend for a loaded model (sklearn ensemble, pipeline, compiled tables or XGBoost)."""
+    if hasattr(model, 'local_model'):
+        model = model.local_model()  # PooledModel / CascadeModel: explain the full model in-process
+    if isinstance(model, CompiledEnsemble):
+        return TreePathExplainer(model)
+    if hasattr(model, 'get_booster'):
+        return XGBoostExplainer(model)
+    tables, meta = flatten_ensemble(model)  # raises TypeError for models without trees (e.g. the kidney SVC)
+    return TreePathExplainer(CompiledEnsemble(tables, meta))
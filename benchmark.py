@@ -0,0 +1,189 @@
+"""Reproducible inference benchmark for the five disease models.
+
+Generates synthetic patients inside each feature's valid range (feature_schema),
+then measures model load time, single-row latency percentiles, batch
+throughput and peak memory. Results are written as JSON so runs can be
+compared when models or library versions change.
+
+Usage:
+    python benchmark.py -o bench.json
+    python benchmark.py --sizes 1 100 10000 --compare bench.json
+"""
+import argparse
+import json
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from importlib import metadata
+
+import numpy as np
+
+from disease_models import FEATURE_ORDER, score
+from feature_schema import sample
+from model_registry import ModelRegistry
+from svm_backend import BatchedSVC
+from xgboost_backend import XGBoostInplaceModel
+
+DEFAULT_SIZES = (1, 100, 10000, 1000000)
+
+def _percentiles(samples):
+    samples = np.asarray(samples) * 1000
+    return {f'p{q}': float(np.percentile(samples, q)) for q in (50, 90, 99)} | {
+        'mean': float(samples.mean()), 'min': float(samples.min()), 'max': float(samples.max())}
+
+
+def bench_single_row(model, disease, X, scorer=score):
+    """Latency in ms of scoring one row at a time, over every row of X."""
+    scorer(model, X[:1], disease)  # warm-up
+    samples = []
+    for i in range(X.shape[0]):
+        start = time.perf_counter()
+        scorer(model, X[i:i + 1], disease)
+        samples.append(time.perf_counter() - start)
+    return _percentiles(samples)
+
+
+def bench_batch(model, disease, X, repeats, scorer=score):
+    """Rows/second and peak traced allocation for scoring all of X in one call."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        scorer(model, X, disease)
+    elapsed = (time.perf_counter() - start) / repeats
+
+    # Memory is measured on a separate pass so tracing doesn't skew the timings
+    tracemalloc.start()
+    scorer(model, X, disease)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'rows': int(X.shape[0]),
+        'seconds': elapsed,
+        'rows_per_second': X.shape[0] / elapsed if elapsed else float('inf'),
+        'peak_alloc_mb': peak / 2**20,
+    }
+
+
+def speedups(stats, baseline):
+    """How many times faster `stats` is than `baseline`: single-row p50 and throughput per batch size."""
+    return {
+        'single_row_p50': baseline['single_row_ms']['p50'] / stats['single_row_ms']['p50'],
+        'batch': {b['rows']: b['rows_per_second'] / old['rows_per_second']
+                  for b, old in zip(stats['batch'], baseline['batch'])},
+    }
+
+
+def environment():
+    versions = {}
+    for package in ('numpy', 'scikit-learn', 'xgboost', 'pandas'):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return {'python': platform.python_version(), 'platform': platform.platform(),
+            'machine': platform.machine(), 'packages': versions}
+
+
+def run_benchmark(diseases, sizes, single_rows=1000, seed=0, scorers=None):
+    """Benchmark each disease; `scorers` maps a variant name to a score()-compatible callable."""
+    scorers = scorers or {'default': score}
+    # Full models only; cascade.py reports the surrogate tier's own timings
+    registry = ModelRegistry(use_compiled=False, reload_interval=0, cascaded=())
+    results = {'environment': environment(), 'config': {
+        'sizes': list(sizes), 'single_rows': single_rows, 'seed': seed, 'variants': list(scorers)}, 'models': {}}
+
+    for disease in diseases:
+        model = registry.get(disease)
+        load = registry.stats()[disease]
+        entry = {
+            'load_seconds': load['import_seconds'] + load['load_seconds'],
+            'load_rss_mb': load['rss_bytes'] / 2**20,
+            'variants': {},
+        }
+        X_single = sample(disease, single_rows, seed)
+        runs = [(variant, scorer, model) for variant, scorer in scorers.items()]
+        # Where the registry serves a faster backend (XGBoost inplace_predict, batched SVC),
+        # also time the sklearn estimator it replaced
+        if isinstance(model, (XGBoostInplaceModel, BatchedSVC)):
+            runs += [(f'{variant}-sklearn', scorer, model.model) for variant, scorer in scorers.items()]
+        for variant, scorer, variant_model in runs:
+            entry['variants'][variant] = {
+                'single_row_ms': bench_single_row(variant_model, disease, X_single, scorer),
+                'batch': [bench_batch(variant_model, disease, sample(disease, size, seed),
+                                      repeats=3 if size <= 10000 else 1, scorer=scorer)
+                          for size in sizes],
+            }
+            print(f"{disease:<11} {variant:<10} p50 {entry['variants'][variant]['single_row_ms']['p50']:.3f} ms  "
+                  + '  '.join(f"{b['rows']}: {b['rows_per_second']:,.0f} rows/s"
+                              for b in entry['variants'][variant]['batch']), file=sys.stderr)
+        for variant in scorers:
+            baseline = entry['variants'].get(f'{variant}-sklearn')
+            if baseline is not None:
+                speedup = speedups(entry['variants'][variant], baseline)
+                entry['variants'][variant]['speedup_vs_sklearn'] = speedup
+                print(f"{disease:<11} {variant:<10} vs sklearn: single-row p50 {speedup['single_row_p50']:.2f}x  "
+                      + '  '.join(f"{rows}: {x:.2f}x" for rows, x in speedup['batch'].items()), file=sys.stderr)
+        results['models'][disease] = entry
+
+    results['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return results
+
+
+def compare(current, previous, tolerance=0.2):
+    """List metrics that got worse than `previous` by more than `tolerance` (fractional)."""
+    regressions = []
+    for disease, entry in current['models'].items():
+        old_entry = previous.get('models', {}).get(disease)
+        if not old_entry:
+            continue
+        for variant, stats in entry['variants'].items():
+            old = old_entry.get('variants', {}).get(variant)
+            if not old:
+                continue
+            new_p50, old_p50 = stats['single_row_ms']['p50'], old['single_row_ms']['p50']
+            if new_p50 > old_p50 * (1 + tolerance):
+                regressions.append(f"{disease}/{variant}: single-row p50 {old_p50:.3f} -> {new_p50:.3f} ms")
+            old_batches = {b['rows']: b for b in old['batch']}
+            for batch in stats['batch']:
+                prev = old_batches.get(batch['rows'])
+                if prev and batch['rows_per_second'] < prev['rows_per_second'] * (1 - tolerance):
+                    regressions.append(f"{disease}/{variant}: {batch['rows']}-row throughput "
+                                       f"{prev['rows_per_second']:,.0f} -> {batch['rows_per_second']:,.0f} rows/s")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark disease model inference.")
+    parser.add_argument('diseases', nargs='*', help="Diseases to benchmark (default: all)")
+    parser.add_argument('--sizes', nargs='+', type=int, default=list(DEFAULT_SIZES), help="Batch sizes")
+    parser.add_argument('--single-rows', type=int, default=1000, help="Rows timed one at a time")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', help="Write results JSON here (default: stdout)")
+    parser.add_argument('--compare', help="Previous results JSON to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed slowdown before flagging")
+    args = parser.parse_args(argv)
+
+    unknown = set(args.diseases) - set(FEATURE_ORDER)
+    if unknown:
+        parser.error(f"unknown disease(s): {', '.join(sorted(unknown))}")
+
+    results = run_benchmark(args.diseases or list(FEATURE_ORDER), args.sizes, args.single_rows, args.seed)
+
+    if args.compare:
+        with open(args.compare) as f:
+            results['regressions'] = compare(results, json.load(f), args.tolerance)
+        for line in results['regressions']:
+            print(f"REGRESSION {line}", file=sys.stderr)
+
+    payload = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(payload)
+    else:
+        print(payload)
+    return 1 if results.get('regressions') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
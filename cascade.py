@@ -0,0 +1,415 @@
+"""Two-tier cascade: a tiny distilled surrogate answers clear-cut rows, the full model the rest.
+
+Most submissions are far from the decision threshold, where any reasonable
+model gives the same label. For each disease a depth-limited regression tree
+is distilled from the full model's probabilities on synthetic app-range
+inputs (feature_schema.sample). It is stored as a small JSON node table under
+models/surrogates/ and costs a handful of NumPy steps per batch.
+
+An uncertainty band (low, high) around the decision threshold is tuned on
+held-out rows. Rows scoring at or below `low`, or above `high`, are labelled
+by the surrogate, and its score is reported as the probability. Rows inside
+the band, and rows with missing values, go to the full model. The band is the
+widest coverage whose surrogate-labelled rows disagree with the full model on
+at most `max_disagreement` of the tuning rows, and always reaches at least
+MIN_BAND_WIDTH below and above the threshold: uniform synthetic rows are
+sparse near the threshold, so without that floor a band can collapse onto
+one side of it. The report, on a third held-out set, is stored next to the
+tree.
+
+Synthetic rows cover the whole app range evenly, which is not what patients
+look like. Pass --cohort with a real or validation cohort for one disease
+(CSV or Parquet, as for batch_predict.py) to tune the band and write the
+report on half of it each; the tree itself is still fitted on synthetic rows.
+
+A surrogate is only used with the model file it was distilled from (by
+SHA-256) and the threshold it was tuned for, so publishing a new model
+version or changing <DISEASE>_THRESHOLD turns the cascade off for that
+disease until it is re-distilled. So does a stored band narrower than
+MIN_BAND_WIDTH on either side of the threshold. Enable per disease with CASCADE_MODELS,
+e.g. CASCADE_MODELS=diabetes,heart,liver. The cascade_rows_total counter
+shows how much traffic each tier absorbs.
+
+Usage:
+    python cascade.py                      # distill, tune and report for every model
+    python cascade.py heart --depth 5 --max-disagreement 0.002
+    python cascade.py heart --cohort validation/heart.csv   # tune and report on real rows
+    python cascade.py --report             # re-check saved surrogates against the current models
+    python cascade.py heart --report --cohort validation/heart.csv
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from metrics import inc
+
+SURROGATE_DIR = 'models/surrogates'
+FORMAT_VERSION = 1
+DEFAULT_DEPTH = 6
+DEFAULT_ROWS = 50000
+# Share of tuning rows the surrogate tier may label differently from the full model
+DEFAULT_MAX_DISAGREEMENT = 0.001
+MIN_SAMPLES_LEAF = 20
+# The band reaches at least this far below and above the threshold; narrower stored bands are refused
+MIN_BAND_WIDTH = 0.05
+# Fewest complete cohort rows accepted for tuning plus the report
+MIN_COHORT_ROWS = 200
+
+_NODE_ARRAYS = ('feature', 'threshold', 'left', 'right', 'value')
+
+
+def cascade_diseases():
+    """Diseases listed in CASCADE_MODELS (comma-separated)."""
+    return {name.strip() for name in os.environ.get('CASCADE_MODELS', '').split(',') if name.strip()}
+
+
+class SurrogateTree:
+    """A distilled regression tree evaluated from its node table; scores approximate the full model's probability."""
+
+    def __init__(self, nodes, meta):
+        self.meta = meta
+        self.feature = np.asarray(nodes['feature'], dtype=np.int64)
+        self.threshold = np.asarray(nodes['threshold'], dtype=np.float64)
+        self.left = np.asarray(nodes['left'], dtype=np.int64)
+        self.right = np.asarray(nodes['right'], dtype=np.int64)
+        self.value = np.asarray(nodes['value'], dtype=np.float64)
+        self.depth = int(meta['depth'])
+        self.low, self.high = meta['band']
+
+    @classmethod
+    def fit(cls, X, targets, depth=DEFAULT_DEPTH, min_samples_leaf=MIN_SAMPLES_LEAF):
+        """Fit a regression tree to the full model's positive-class probabilities."""
+        from sklearn.tree import DecisionTreeRegressor
+
+        tree = DecisionTreeRegressor(max_depth=depth, min_samples_leaf=min_samples_leaf, random_state=0)
+        tree = tree.fit(X, targets).tree_
+        # Leaves point to themselves (as in tree_export), so scoring steps a fixed `depth` times without branching
+        nodes = np.arange(tree.node_count)
+        is_leaf = tree.children_left == -1
+        table = {
+            'feature': np.where(is_leaf, 0, tree.feature).tolist(),
+            'threshold': np.where(is_leaf, np.inf, tree.threshold).tolist(),
+            'left': np.where(is_leaf, nodes, tree.children_left).tolist(),
+            'right': np.where(is_leaf, nodes, tree.children_right).tolist(),
+            'value': tree.value[:, 0, 0].tolist(),
+        }
+        return cls(table, {'depth': tree.max_depth, 'band': [0.0, 0.0]})
+
+    def score(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        rows = np.arange(X.shape[0])
+        nodes = np.zeros(X.shape[0], dtype=np.int64)
+        for _ in range(self.depth):
+            went_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(went_left, self.left[nodes], self.right[nodes])
+        return self.value[nodes]
+
+    def answers(self, scores):
+        """Rows the surrogate labels on its own: outside the (low, high] uncertainty band."""
+        return (scores <= self.low) | (scores > self.high)
+
+    def covers(self, threshold, min_width=MIN_BAND_WIDTH):
+        """Whether the band reaches at least `min_width` below and above `threshold`."""
+        return self.low <= threshold - min_width and self.high >= threshold + min_width
+
+    def to_json(self):
+        return {'nodes': {name: getattr(self, name).tolist() for name in _NODE_ARRAYS}, **self.meta}
+
+
+class CascadeModel:
+    """predict_proba-compatible cascade: the surrogate scores every row, `full` only the uncertain ones."""
+
+    def __init__(self, surrogate, full, disease):
+        self.surrogate = surrogate
+        self.full = full
+        self.disease = disease
+        self.classes_ = np.asarray(getattr(full, 'classes_', [0, 1]))
+        self.n_features_in_ = full.n_features_in_
+        classes = list(self.classes_)
+        self._pos = classes.index(1) if 1 in classes else len(classes) - 1
+
+    def positive_proba(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        scores = self.surrogate.score(X)
+        # Surrogates are fitted on complete rows; the liver model's missing values always go to the full model
+        escalate = ~self.surrogate.answers(scores) | np.isnan(X).any(axis=1)
+        n_full = int(np.count_nonzero(escalate))
+        if n_full:
+            scores[escalate] = self.full.predict_proba(X[escalate])[:, self._pos]
+            inc('cascade_rows_total', n_full, disease=self.disease, tier='full')
+        if n_full < X.shape[0]:
+            inc('cascade_rows_total', X.shape[0] - n_full, disease=self.disease, tier='surrogate')
+        return scores
+
+    def predict_proba(self, X):
+        p = self.positive_proba(X)
+        columns = [None, None]
+        columns[self._pos], columns[1 - self._pos] = p, 1.0 - p
+        return np.column_stack(columns)
+
+    def predict(self, X):
+        return np.where(self.positive_proba(X) > 0.5, self.classes_[self._pos], self.classes_[1 - self._pos])
+
+    def local_model(self):
+        """The full model, for work that needs its internals (feature attributions, early exit)."""
+        return self.full.local_model() if hasattr(self.full, 'local_model') else self.full
+
+    def release(self):
+        if hasattr(self.full, 'release'):
+            self.full.release()
+
+
+# --- Storage ---
+def surrogate_path(disease, base_dir=SURROGATE_DIR):
+    return os.path.join(base_dir, f'{disease}.json')
+
+
+def has_surrogate(disease, base_dir=SURROGATE_DIR):
+    return os.path.exists(surrogate_path(disease, base_dir))
+
+
+def save_surrogate(surrogate, disease, base_dir=SURROGATE_DIR):
+    os.makedirs(base_dir, exist_ok=True)
+    path = surrogate_path(disease, base_dir)
+    with open(path, 'w') as f:
+        json.dump(surrogate.to_json(), f, indent=1)
+    return path
+
+
+def load_surrogate(disease, base_dir=SURROGATE_DIR):
+    with open(surrogate_path(disease, base_dir)) as f:
+        data = json.load(f)
+    if data.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"{surrogate_path(disease, base_dir)} has format {data.get('format_version')}, "
+                         f"expected {FORMAT_VERSION}; re-run cascade.py")
+    return SurrogateTree(data.pop('nodes'), data)
+
+
+def cascade_for(model, disease, source_sha256, base_dir=SURROGATE_DIR):
+    """Wrap a loaded model in a CascadeModel if a surrogate distilled from this file and threshold exists.
+
+    Otherwise the model is returned as is and cascade_fallbacks_total records why.
+    """
+    from disease_models import DECISION_THRESHOLDS
+
+    if not has_surrogate(disease, base_dir):
+        inc('cascade_fallbacks_total', disease=disease, reason='missing')
+        return model
+    surrogate = load_surrogate(disease, base_dir)
+    if surrogate.meta['source_sha256'] != source_sha256:
+        inc('cascade_fallbacks_total', disease=disease, reason='stale')
+        return model
+    if surrogate.meta['threshold'] != DECISION_THRESHOLDS[disease]:
+        inc('cascade_fallbacks_total', disease=disease, reason='threshold')
+        return model
+    if not surrogate.covers(surrogate.meta['threshold']):
+        inc('cascade_fallbacks_total', disease=disease, reason='band')
+        return model
+    return CascadeModel(surrogate, model, disease)
+
+
+# --- Distillation and band tuning ---
+def tune_band(scores, labels, threshold, max_disagreement=DEFAULT_MAX_DISAGREEMENT, min_width=MIN_BAND_WIDTH):
+    """Pick (low, high) around the threshold that lets the surrogate answer as many rows as possible.
+
+    `labels` are the full model's decisions. Rows with score <= low are
+    labelled negative and rows with score > high positive; together they may
+    disagree with `labels` on at most max_disagreement of all rows. The band
+    always satisfies low <= threshold - min_width and high >= threshold + min_width.
+    """
+    budget = max_disagreement * len(scores)
+    cuts = np.unique(scores)
+    low_limit, high_limit = threshold - min_width, threshold + min_width
+    lows = np.concatenate([[-np.inf], cuts[cuts <= low_limit], [low_limit]])
+    highs = np.concatenate([[high_limit], cuts[cuts >= high_limit], [np.inf]])
+    order = np.argsort(scores, kind='stable')
+    sorted_scores = scores[order]
+    positives = np.concatenate([[0], np.cumsum(labels[order])])
+
+    # Rows answered negative (score <= low) and the full-model positives among them, per candidate low
+    n_low = np.searchsorted(sorted_scores, lows, side='right')
+    errors_low = positives[n_low]
+    # Rows answered positive (score > high) and the full-model negatives among them, per candidate high
+    n_high_start = np.searchsorted(sorted_scores, highs, side='right')
+    answered_high = len(scores) - n_high_start
+    errors_high = answered_high - (positives[-1] - positives[n_high_start])
+
+    errors = errors_low[:, None] + errors_high[None, :]
+    coverage = np.where(errors <= budget, n_low[:, None] + answered_high[None, :], -1)
+    best = np.unravel_index(np.argmax(coverage - errors / (len(scores) + 1.0)), coverage.shape)
+    return float(lows[best[0]]), float(highs[best[1]])
+
+
+def agreement_report(surrogate, full, X, threshold, pos=1):
+    """How the cascade compares with the full model on X: tier shares, label agreement, probability error."""
+    exact = full.predict_proba(X)[:, pos]
+    scores = surrogate.score(X)
+    answered = surrogate.answers(scores) & ~np.isnan(X).any(axis=1)
+    cascade = np.where(answered, scores, exact)
+    disagreements = int(np.count_nonzero((cascade > threshold) != (exact > threshold)))
+    return {
+        'rows': int(X.shape[0]),
+        'surrogate_share': float(answered.mean()),
+        'label_agreement': 1.0 - disagreements / X.shape[0],
+        'disagreements': disagreements,
+        'surrogate_mean_abs_error': float(np.abs(scores - exact)[answered].mean()) if answered.any() else 0.0,
+    }
+
+
+def split_cohort(X, seed=0):
+    """Shuffle a validated cohort matrix and halve it into (tuning, report) rows."""
+    if np.count_nonzero(~np.isnan(X).any(axis=1)) < MIN_COHORT_ROWS:
+        raise ValueError(f"Cohort has fewer than {MIN_COHORT_ROWS} complete rows; "
+                         "too few to tune the band on")
+    X = X[np.random.default_rng(seed).permutation(X.shape[0])]
+    return X[:X.shape[0] // 2], X[X.shape[0] // 2:]
+
+
+def distill(full, disease, threshold, n_rows=DEFAULT_ROWS, depth=DEFAULT_DEPTH,
+            max_disagreement=DEFAULT_MAX_DISAGREEMENT, seed=0, min_width=MIN_BAND_WIDTH, cohort=None):
+    """Fit, tune and check a surrogate for a loaded (serving) model; returns a SurrogateTree with its report.
+
+    With `cohort` (a validated matrix) the band is tuned and the report
+    written on its two halves instead of on synthetic rows.
+    """
+    from disease_models import positive_class_index
+    from feature_schema import sample
+
+    pos = positive_class_index(full)
+    # Separate rows for fitting, band tuning and the report, so neither is judged on rows it was fitted to
+    X_fit = sample(disease, n_rows, seed=seed)
+    if cohort is None:
+        X_tune, X_test = (sample(disease, n_rows, seed=seed + i) for i in (1, 2))
+    else:
+        X_tune, X_test = split_cohort(cohort, seed)
+        # Incomplete rows always go to the full model, so they don't count towards the band
+        X_tune = X_tune[~np.isnan(X_tune).any(axis=1)]
+    surrogate = SurrogateTree.fit(X_fit, full.predict_proba(X_fit)[:, pos], depth)
+    tune_labels = full.predict_proba(X_tune)[:, pos] > threshold
+    surrogate.low, surrogate.high = tune_band(surrogate.score(X_tune), tune_labels, threshold,
+                                              max_disagreement, min_width)
+    surrogate.meta.update(format_version=FORMAT_VERSION, disease=disease, threshold=threshold,
+                          band=[surrogate.low, surrogate.high], max_disagreement=max_disagreement,
+                          min_band_width=min_width, rows=n_rows, seed=seed)
+    surrogate.meta['report'] = agreement_report(surrogate, full, X_test, threshold, pos)
+    return surrogate
+
+
+def _median_seconds(func, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples))
+
+
+def _timings(cascade, full, X):
+    """Median single-row and whole-batch seconds for the full model and the cascade."""
+    timings = {}
+    for name, model in (('full', full), ('cascade', cascade)):
+        single = [_median_seconds(lambda: model.predict_proba(X[i:i + 1]), 5) for i in range(100)]
+        timings[name] = (float(np.median(single)), _median_seconds(lambda: model.predict_proba(X), 3))
+    return timings
+
+
+def main(argv=None):
+    # batch_predict imports model_registry, which imports this module
+    from batch_predict import read_cohort
+    from disease_models import (DECISION_THRESHOLDS, MODEL_PATHS, load_model, positive_class_index, serving_model,
+                                validate_columns)
+    from feature_schema import sample
+    from model_manifest import active_entry, file_sha256, load_manifest, verify
+
+    parser = argparse.ArgumentParser(description="Distill surrogate models and tune the cascade's uncertainty bands.")
+    parser.add_argument('diseases', nargs='*', help=f"Any of {', '.join(MODEL_PATHS)} (default: all)")
+    parser.add_argument('--report', action='store_true', help="Only re-check the saved surrogates")
+    parser.add_argument('--out-dir', default=SURROGATE_DIR)
+    parser.add_argument('--rows', type=int, default=DEFAULT_ROWS, help="Rows each for fitting, tuning and the report")
+    parser.add_argument('--depth', type=int, default=DEFAULT_DEPTH)
+    parser.add_argument('--max-disagreement', type=float, default=DEFAULT_MAX_DISAGREEMENT)
+    parser.add_argument('--min-band-width', type=float, default=MIN_BAND_WIDTH,
+                        help=f"How far the band reaches at least on each side of the threshold (>= {MIN_BAND_WIDTH})")
+    parser.add_argument('--cohort', help="CSV or Parquet cohort for one disease to tune and report on")
+    args = parser.parse_args(argv)
+    unknown = set(args.diseases) - set(MODEL_PATHS)
+    if unknown:
+        parser.error(f"unknown disease: {', '.join(sorted(unknown))}")
+    if args.min_band_width < MIN_BAND_WIDTH:
+        parser.error(f"--min-band-width below {MIN_BAND_WIDTH}; the app would refuse the surrogate")
+    if args.cohort and len(args.diseases) != 1:
+        parser.error("--cohort needs exactly one disease")
+    cohort = None
+    if args.cohort:
+        try:
+            cohort = validate_columns(read_cohort(args.cohort), args.diseases[0])
+        except (OSError, ValueError) as e:
+            parser.error(f"{args.cohort}: {e}")
+
+    status = 0
+    manifest = load_manifest()
+    for disease in args.diseases or MODEL_PATHS:
+        # Distill from whichever version is active, tagged with its checksum
+        _, spec = active_entry(manifest, disease)
+        verify(spec)
+        sha256 = spec.get('sha256') or file_sha256(spec['path'])
+        full = serving_model(load_model(disease, spec['path']), disease)
+        threshold = DECISION_THRESHOLDS[disease]
+
+        if args.report:
+            if not has_surrogate(disease, args.out_dir):
+                print(f"{disease}: no surrogate in {args.out_dir}")
+                status = 1
+                continue
+            surrogate = load_surrogate(disease, args.out_dir)
+            if surrogate.meta['source_sha256'] != sha256 or surrogate.meta['threshold'] != threshold:
+                print(f"{disease}: surrogate is stale (other model file or threshold); re-run without --report")
+                status = 1
+                continue
+            if not surrogate.covers(threshold):
+                print(f"{disease}: band ({surrogate.low:.3f}, {surrogate.high:.3f}] is narrower than "
+                      f"{MIN_BAND_WIDTH} on a side of threshold {threshold}; re-run without --report")
+                status = 1
+                continue
+            if cohort is None:
+                X_report = sample(disease, args.rows, seed=surrogate.meta['seed'] + 3)
+                source = "fresh synthetic rows"
+            else:
+                X_report, source = cohort, os.path.basename(args.cohort)
+            report = agreement_report(surrogate, full, X_report, threshold, positive_class_index(full))
+            print(f"{disease}: {surrogate_path(disease, args.out_dir)} on {source}")
+        else:
+            try:
+                surrogate = distill(full, disease, threshold, args.rows, args.depth, args.max_disagreement,
+                                    min_width=args.min_band_width, cohort=cohort)
+            except ValueError as e:
+                print(f"{disease}: {e}")
+                status = 1
+                continue
+            surrogate.meta['source_sha256'] = sha256
+            surrogate.meta['tuned_on'] = os.path.basename(args.cohort) if args.cohort else 'synthetic'
+            path = save_surrogate(surrogate, disease, args.out_dir)
+            report = surrogate.meta['report']
+            print(f"{disease}: saved {path} (depth {surrogate.depth}, {len(surrogate.value)} nodes, "
+                  f"tuned on {surrogate.meta['tuned_on']} rows)")
+
+        timings = _timings(CascadeModel(surrogate, full, disease), full, sample(disease, 10000, seed=4))
+        print(f"  band ({surrogate.low:.3f}, {surrogate.high:.3f}] around threshold {threshold}: "
+              f"surrogate answers {report['surrogate_share']:.1%} of {report['rows']} held-out rows, "
+              f"label agreement {report['label_agreement']:.3%} ({report['disagreements']} rows), "
+              f"mean |Δp| {report['surrogate_mean_abs_error']:.3f} where it answers")
+        print(f"  single row p50: full {timings['full'][0] * 1000:.3f} ms, cascade {timings['cascade'][0] * 1000:.3f} ms; "
+              f"10000 rows: full {timings['full'][1] * 1000:.1f} ms, cascade {timings['cascade'][1] * 1000:.1f} ms")
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
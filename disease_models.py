@@ -0,0 +1,165 @@
+"""Model paths, feature orders and scoring helpers shared by the app, API and batch tools."""
+import os
+import pickle
+
+import numpy as np
+
+from feature_schema import SCHEMAS, encode_column, feature_names, range_errors, to_row
+from metrics import inc
+from svm_backend import BatchedSVC, check_parity, parity_inputs
+from xgboost_backend import XGBoostInplaceModel
+
+# --- Model files ---
+MODEL_PATHS = {
+    'diabetes': 'models/diabetes_model.pkl',
+    'heart': 'models/heart_disease_model.pkl',
+    'liver': 'models/liver_disease_model.pkl',
+    'kidney': 'models/kidney_disease_model.pkl',
+    'parkinsons': 'models/parkinsons_model.pkl',
+}
+
+# --- Feature order expected by each model (see feature_schema.py) ---
+FEATURE_ORDER = {disease: feature_names(disease) for disease in SCHEMAS}
+
+DEFAULT_CHUNK_SIZE = 10000
+
+# --- Decision thresholds ---
+# Probability above which a row is labelled positive; override per disease
+# with e.g. HEART_THRESHOLD=0.4. For the tree ensembles 0.5 reproduces the
+# model's own predict(). The kidney SVC is different: its labels come from
+# the Platt-scaled predict_proba, which disagrees with SVC.predict() (the sign
+# of the decision function) on many rows, e.g. ~70% of app-range samples are
+# positive here but negative by predict().
+DECISION_THRESHOLDS = {
+    disease: float(os.environ.get(f'{disease.upper()}_THRESHOLD', 0.5))
+    for disease in MODEL_PATHS
+}
+
+
+def load_model(disease, path=None):
+    """Unpickle the trained model for a disease."""
+    with open(path or MODEL_PATHS[disease], 'rb') as f:
+        return pickle.load(f)
+
+
+def serving_model(model, disease=None):
+    """The fastest scoring form of a freshly unpickled model, with identical outputs.
+
+    XGBoost classifiers are scored through Booster.inplace_predict
+    (XGBOOST_INPLACE=0 disables) and probability SVCs through BatchedSVC
+    (BATCHED_SVC=0 disables). The batched SVC is checked against sklearn on
+    the support vectors and a few hundred random rows first; if it doesn't
+    match, the sklearn model is served instead.
+    """
+    if hasattr(model, 'get_booster') and os.environ.get('XGBOOST_INPLACE', '1') != '0':
+        return XGBoostInplaceModel(model)
+    if type(model).__name__ == 'SVC' and model.probability and os.environ.get('BATCHED_SVC', '1') != '0':
+        batched = BatchedSVC(model)
+        try:
+            check_parity(model, batched, parity_inputs(model, 256))
+        except AssertionError:
+            inc('model_backend_fallbacks_total', disease=disease or 'unknown', backend='BatchedSVC')
+            return model
+        return batched
+    return model
+
+
+# --- Scoring core ---
+def positive_class_index(model):
+    """Column of predict_proba holding the positive (1) class."""
+    classes = list(getattr(model, 'classes_', [0, 1]))
+    return classes.index(1) if 1 in classes else len(classes) - 1
+
+
+def score(model, X, disease, threshold=None):
+    """Run the model once and derive labels from the positive-class probability.
+
+    Replaces the old predict() + predict_proba() pair, which ran every tree (or
+    the SVC kernel) twice per request.
+    """
+    if threshold is None:
+        threshold = DECISION_THRESHOLDS[disease]
+
+    pos = positive_class_index(model)
+    classes = getattr(model, 'classes_', np.array([0, 1]))
+    probabilities = model.predict_proba(X)[:, pos]
+    # Strict '>' matches argmax tie-breaking in predict() at the default 0.5
+    predictions = np.where(probabilities > threshold, classes[pos], classes[1 - pos])
+    return predictions, probabilities
+
+
+# --- Batch scoring ---
+def validate_columns(df, disease):
+    """Check a cohort DataFrame against a model's schema and return it as a float matrix in model order.
+
+    Categorical columns may hold either codes or choice labels (e.g. 'Male').
+    """
+    schema = SCHEMAS[disease]
+    missing = [f.name for f in schema if f.name not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns for {disease} model: {', '.join(missing)}")
+
+    non_numeric = [f.name for f in schema
+                   if not f.is_categorical and not np.issubdtype(df[f.name].dtype, np.number)]
+    if non_numeric:
+        raise ValueError(f"Non-numeric columns for {disease} model: {', '.join(non_numeric)}")
+
+    # Only the liver XGBoost model can handle missing values
+    if disease != 'liver':
+        incomplete = [f.name for f in schema if df[f.name].isna().any()]
+        if incomplete:
+            raise ValueError(f"Missing values in columns: {', '.join(incomplete)}")
+
+    X = np.empty((len(df), len(schema)), dtype=np.float64)
+    for j, feature in enumerate(schema):
+        X[:, j] = encode_column(feature, df[feature.name].to_numpy())
+
+    errors = range_errors(X, disease)
+    if errors:
+        raise ValueError("Out-of-range values: " + '; '.join(errors))
+    return X
+
+
+def rows_to_matrix(rows, disease):
+    """Convert a list of feature dicts (e.g. a JSON body) into a validated float matrix in model order.
+
+    Applies the same checks as validate_columns: booleans are not numbers, and
+    only the liver model accepts missing values (None / JSON null, or NaN);
+    infinities never pass.
+    """
+    schema = SCHEMAS[disease]
+    X = np.empty((len(rows), len(schema)), dtype=np.float64)
+    for i, row in enumerate(rows):
+        # float(True) is 1.0, so bools would otherwise slip through as numbers
+        booleans = [f.name for f in schema if isinstance(row.get(f.name), bool)]
+        if booleans:
+            raise ValueError(f"Row {i}: non-numeric value for {', '.join(booleans)}")
+        try:
+            to_row(row, disease, out=X[i])
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Row {i}: {e}")
+
+    for problem, bad in (('missing', np.isnan(X) if disease != 'liver' else np.zeros(X.shape, dtype=bool)),
+                         ('non-finite', np.isinf(X))):
+        if bad.any():
+            i = int(np.flatnonzero(bad.any(axis=1))[0])
+            names = ', '.join(schema[j].name for j in np.flatnonzero(bad[i]))
+            raise ValueError(f"Row {i}: {problem} value for {names}")
+
+    errors = range_errors(X, disease)
+    if errors:
+        raise ValueError("Out-of-range values: " + '; '.join(errors))
+    return X
+
+
+def score_batch(model, X, disease, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Score a feature matrix in vectorized chunks, returning predictions and positive-class probabilities."""
+    n_rows = X.shape[0]
+    predictions = np.empty(n_rows, dtype=np.int64)
+    probabilities = np.empty(n_rows, dtype=np.float64)
+
+    for start in range(0, n_rows, chunk_size):
+        end = start + chunk_size
+        predictions[start:end], probabilities[start:end] = score(model, X[start:end], disease)
+
+    return predictions, probabilities
@@ -0,0 +1,214 @@
+"""Early-exit evaluation of the random forests for threshold decisions.
+
+A forest's probability is the mean of its trees' leaf values, and every tree's
+leaf values lie in a known [min, max] range. After visiting some of the trees
+the final mean is therefore bounded by
+
+    (visited sum + sum of remaining minima) / n_trees
+    (visited sum + sum of remaining maxima) / n_trees
+
+and once that whole interval is on one side of the decision threshold, the
+remaining trees cannot change the label. EarlyExitForest visits trees in a
+fixed order (widest leaf range first so the interval shrinks fastest, then
+shallowest first) and retires each row as soon as its label is settled. It
+reports the interval instead of a point probability; rows near the threshold
+simply run every tree and end with an exact value.
+
+No row can be settled before a certain number of trees (with fully grown trees
+every leaf is 0 or 1, so at a 0.5 threshold that is half the forest); those
+are evaluated in one pass, and the rest a chunk at a time, since every chunk
+costs a full descent of its deepest tree.
+
+Applies to the diabetes RandomForest and the Parkinson's pipeline's forest
+(node tables from tree_export). Enable per disease with EARLY_EXIT_MODELS,
+e.g. EARLY_EXIT_MODELS=diabetes,parkinsons.
+
+Usage:
+    python early_exit.py                   # tree visits saved and agreement with the full forest
+    python early_exit.py diabetes --rows 50000
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from metrics import inc
+from tree_export import EVAL_BLOCK_ROWS, CompiledEnsemble, flatten_ensemble
+
+EARLY_EXIT_DISEASES = ('diabetes', 'parkinsons')
+# Trees evaluated between interval checks once a row could first be settled
+DEFAULT_CHUNK_TREES = 10
+# Bounds are sums in a different order than the full mean; keep this much away from the threshold
+BOUND_MARGIN = 1e-12
+
+
+def early_exit_enabled(disease):
+    """Whether EARLY_EXIT_MODELS turns on early-exit evaluation for a disease."""
+    enabled = {name.strip() for name in os.environ.get('EARLY_EXIT_MODELS', '').split(',') if name.strip()}
+    return disease in enabled and disease in EARLY_EXIT_DISEASES
+
+
+def _tree_stats(ensemble):
+    """Per-tree (min leaf value, max leaf value, depth) from the flattened node table."""
+    n_nodes = ensemble.value.shape[0]
+    nodes = np.arange(n_nodes)
+    left, right = np.asarray(ensemble.left), np.asarray(ensemble.right)
+    is_leaf = left == nodes
+    roots = np.asarray(ensemble.roots, dtype=np.int64)
+    tree_of = np.repeat(np.arange(roots.shape[0]), np.diff(np.append(roots, n_nodes)))
+
+    leaf_values = np.asarray(ensemble.value)[is_leaf]
+    leaf_trees = tree_of[is_leaf]
+    low = np.full(roots.shape[0], np.inf)
+    high = np.full(roots.shape[0], -np.inf)
+    np.minimum.at(low, leaf_trees, leaf_values)
+    np.maximum.at(high, leaf_trees, leaf_values)
+
+    # Children always follow their parent in sklearn's node order, so one forward pass sets every depth
+    depth = np.zeros(n_nodes, dtype=np.int64)
+    for node in np.flatnonzero(~is_leaf):
+        depth[left[node]] = depth[right[node]] = depth[node] + 1
+    tree_depth = np.zeros(roots.shape[0], dtype=np.int64)
+    np.maximum.at(tree_depth, tree_of, depth)
+    return low, high, tree_depth
+
+
+class EarlyExitForest:
+    """Threshold decisions from a RandomForest's node tables with as few trees as each row needs."""
+
+    def __init__(self, ensemble, chunk_trees=DEFAULT_CHUNK_TREES):
+        if ensemble.meta['kind'] != 'RandomForestClassifier':
+            raise TypeError(f"Early exit needs a RandomForest, got {ensemble.meta['kind']}")
+        self.ensemble = ensemble
+        self.chunk_trees = chunk_trees
+        self.classes_ = ensemble.classes_
+        self.n_features_in_ = ensemble.n_features_in_
+        self.n_trees = ensemble.roots.shape[0]
+
+        low, high, depth = _tree_stats(ensemble)
+        self.order = np.lexsort((depth, -(high - low)))
+        self.low, self.high = low[self.order], high[self.order]
+        self.roots = np.asarray(ensemble.roots, dtype=np.int64)[self.order]
+        self.depth = depth[self.order]
+        # Sum of the minimum / maximum leaf value of the trees still to visit after the first k
+        self.remaining_low = np.append(np.cumsum(self.low[::-1])[::-1], 0.0)
+        self.remaining_high = np.append(np.cumsum(self.high[::-1])[::-1], 0.0)
+
+    def first_exit(self, threshold):
+        """Fewest trees after which any row could possibly be settled at this threshold."""
+        visited_high = np.append(0.0, np.cumsum(self.high))
+        visited_low = np.append(0.0, np.cumsum(self.low))
+        limit = threshold * self.n_trees
+        possible = ((visited_high + self.remaining_low > limit + BOUND_MARGIN * self.n_trees)
+                    | (visited_low + self.remaining_high <= limit - BOUND_MARGIN * self.n_trees))
+        return max(int(np.argmax(possible)) if possible.any() else self.n_trees, 1)
+
+    def _visit(self, X, first, last):
+        """Sum of the leaf values of trees order[first:last] for each row of prepared X."""
+        ensemble = self.ensemble
+        n_rows, n_features = X.shape
+        flat = X.ravel()
+        row_offsets = (np.arange(n_rows, dtype=np.int64) * n_features)[:, None]
+        nodes = np.broadcast_to(self.roots[first:last], (n_rows, last - first)).astype(np.int64)
+        for _ in range(int(self.depth[first:last].max())):
+            went_left = flat[row_offsets + ensemble.feature[nodes]] <= ensemble.threshold[nodes]
+            nodes = ensemble._children[2 * nodes + went_left]
+        return ensemble.value[nodes].sum(axis=1)
+
+    def decide(self, X, threshold):
+        """Label each row against `threshold`, stopping per row once the remaining trees can't flip it.
+
+        Returns (predictions, lower, upper, trees_visited): the label, bounds on
+        the full forest's probability, and how many trees each row needed.
+        Rows that needed every tree have lower == upper.
+        """
+        X = self.ensemble._prepare(X)
+        n_rows = X.shape[0]
+        lower, upper = np.empty(n_rows), np.empty(n_rows)
+        visited = np.empty(n_rows, dtype=np.int64)
+        first_exit = self.first_exit(threshold)
+        bounds = [0] + list(range(first_exit, self.n_trees, self.chunk_trees)) + [self.n_trees]
+        for start in range(0, n_rows, EVAL_BLOCK_ROWS):
+            block = X[start:start + EVAL_BLOCK_ROWS]
+            active = np.arange(block.shape[0])
+            totals = np.zeros(block.shape[0])
+            for first, last in zip(bounds[:-1], bounds[1:]):
+                totals[active] += self._visit(block[active], first, last)
+                low = (totals[active] + self.remaining_low[last]) / self.n_trees
+                high = (totals[active] + self.remaining_high[last]) / self.n_trees
+                rows = start + active
+                lower[rows], upper[rows], visited[rows] = low, high, last
+                if last == self.n_trees:
+                    break
+                undecided = (low <= threshold + BOUND_MARGIN) & (high > threshold - BOUND_MARGIN)
+                active = active[undecided]
+                if active.size == 0:
+                    break
+        predictions = np.where(lower > threshold, self.classes_[1], self.classes_[0])
+        return predictions, lower, upper, visited
+
+    def predict_proba(self, X):
+        """Exact probabilities from every tree (the fallback when a point value is needed)."""
+        return self.ensemble.predict_proba(X)
+
+
+def early_exit_for(model, chunk_trees=DEFAULT_CHUNK_TREES):
+    """Build an EarlyExitForest from compiled node tables or a fitted forest (optionally in a scaler pipeline)."""
+    if hasattr(model, 'local_model'):
+        model = model.local_model()  # PooledModel / CascadeModel: walk the full model's trees in-process
+    if isinstance(model, CompiledEnsemble):
+        return EarlyExitForest(model, chunk_trees)
+    tables, meta = flatten_ensemble(model)  # raises TypeError for models without trees
+    return EarlyExitForest(CompiledEnsemble(tables, meta), chunk_trees)
+
+
+def score_interval(forest, X, disease, threshold=None):
+    """score()-style early-exit decision: (predictions, lower, upper, trees_visited).
+
+    Counts rows, rows that stopped early and tree visits per disease, so the
+    saving shows up next to the other scoring metrics.
+    """
+    from disease_models import DECISION_THRESHOLDS
+
+    predictions, lower, upper, visited = forest.decide(X, DECISION_THRESHOLDS[disease] if threshold is None else threshold)
+    inc('early_exit_rows_total', len(visited), disease=disease)
+    inc('early_exit_rows_stopped_total', int(np.count_nonzero(visited < forest.n_trees)), disease=disease)
+    inc('early_exit_trees_visited_total', int(visited.sum()), disease=disease)
+    inc('early_exit_trees_total', len(visited) * forest.n_trees, disease=disease)
+    return predictions, lower, upper, visited
+
+
+def main(argv=None):
+    from disease_models import DECISION_THRESHOLDS, load_model
+    from feature_schema import sample
+    from tree_export import parity_inputs
+
+    parser = argparse.ArgumentParser(description="Measure early-exit savings for the random forests.")
+    parser.add_argument('diseases', nargs='*', help=f"Any of {', '.join(EARLY_EXIT_DISEASES)} (default: all)")
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--chunk-trees', type=int, default=DEFAULT_CHUNK_TREES)
+    args = parser.parse_args(argv)
+
+    status = 0
+    for disease in args.diseases or EARLY_EXIT_DISEASES:
+        model = load_model(disease)
+        forest = early_exit_for(model, args.chunk_trees)
+        threshold = DECISION_THRESHOLDS[disease]
+        for label, X in (('app-range inputs', sample(disease, args.rows, seed=0)),
+                         ('split-range inputs', parity_inputs(model, args.rows))):
+            predictions, lower, upper, visited = forest.decide(X, threshold)
+            exact = model.predict_proba(X)[:, 1]
+            expected = np.where(exact > threshold, forest.classes_[1], forest.classes_[0])
+            mismatched = int(np.count_nonzero(predictions != expected))
+            outside = int(np.count_nonzero((exact < lower - 1e-9) | (exact > upper + 1e-9)))
+            print(f"{disease} ({label}): {visited.mean():.1f}/{forest.n_trees} trees per row on average, "
+                  f"{np.mean(visited < forest.n_trees):.0%} of rows exited early, "
+                  f"mean interval width {np.mean(upper - lower):.3f}; "
+                  f"{mismatched} label mismatches, {outside} probabilities outside their interval")
+            status |= bool(mismatched or outside)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
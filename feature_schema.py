@@ -0,0 +1,211 @@
+"""Declarative feature schemas for the five disease models.
+
+Each schema lists a model's features in the exact order the model expects,
+with dtype, valid range, default and (for categorical inputs) the label ->
+code encoding. Forms, batch loaders, the API and input validation are all
+generated from these definitions.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+BINARY_MALE_FEMALE = (('Male', 1), ('Female', 0))
+NO_YES = (('No', 0), ('Yes', 1))
+NORMAL_ABNORMAL = (('Normal', 0), ('Abnormal', 1))
+GRADES_0_5 = tuple((str(i), i) for i in range(6))
+
+
+@dataclass(frozen=True)
+class Feature:
+    """One model input: a numeric field or a categorical choice encoded as an integer code."""
+    name: str
+    label: str
+    dtype: str = 'float'          # 'int' or 'float'
+    min_value: float = None
+    max_value: float = None
+    default: float = 0.0
+    step: float = None
+    format: str = None
+    choices: tuple = None         # ((label, code), ...) for categorical inputs
+    default_index: int = 0
+
+    @property
+    def is_categorical(self):
+        return self.choices is not None
+
+    @property
+    def bounds(self):
+        """(min, max) valid values; categorical bounds come from the codes."""
+        if self.is_categorical:
+            codes = [code for _, code in self.choices]
+            return min(codes), max(codes)
+        return self.min_value, self.max_value
+
+    def encode(self, value):
+        """Map a choice label (e.g. 'Male') to its code; numbers pass through as float, None (JSON null) as NaN."""
+        if value is None:
+            return np.nan
+        if self.is_categorical and isinstance(value, str):
+            for label, code in self.choices:
+                if label.lower() == value.strip().lower():
+                    return float(code)
+            raise ValueError(f"'{value}' is not a valid {self.name} "
+                             f"(expected one of {', '.join(label for label, _ in self.choices)})")
+        return float(value)
+
+
+def number(name, label, min_value, max_value, default, step=None, format=None):
+    dtype = 'int' if all(isinstance(v, int) for v in (min_value, max_value, default)) else 'float'
+    return Feature(name, label, dtype, min_value, max_value, default, step, format)
+
+
+def choice(name, label, choices, default_index=0):
+    return Feature(name, label, 'int', choices=tuple(choices), default=choices[default_index][1],
+                   default_index=default_index)
+
+
+SCHEMAS = {
+    'diabetes': (
+        number('pregnancies', 'Number of Pregnancies', 0, 20, 0, 1),
+        number('glucose', 'Glucose Level (mg/dL)', 0, 300, 120, 1),
+        number('blood_pressure', 'Blood Pressure (mm Hg)', 0, 200, 70, 1),
+        number('skin_thickness', 'Skin Thickness (mm)', 0, 100, 20, 1),
+        number('insulin', 'Insulin Level (mu U/ml)', 0, 900, 80, 1),
+        number('bmi', 'BMI', 0.0, 70.0, 25.0, 0.1, "%.1f"),
+        number('dpf', 'Diabetes Pedigree Function', 0.0, 3.0, 0.5, 0.01, "%.2f"),
+        number('age', 'Age', 0, 120, 33, 1),
+    ),
+    'heart': (
+        number('age', 'Age', 1, 120, 45, 1),
+        choice('sex', 'Sex', BINARY_MALE_FEMALE),
+        choice('cp', 'Chest Pain Type', [('Typical Angina', 0), ('Atypical Angina', 1),
+                                         ('Non-anginal Pain', 2), ('Asymptomatic', 3)]),
+        number('trestbps', 'Resting Blood Pressure (mm Hg)', 50, 300, 120, 1),
+        number('chol', 'Cholesterol (mg/dl)', 50, 600, 200, 1),
+        choice('fbs', 'Fasting Blood Sugar > 120 mg/dl', NO_YES),
+        choice('restecg', 'Resting ECG Results', [('Normal', 0), ('ST-T Wave Abnormality', 1),
+                                                  ('Left Ventricular Hypertrophy', 2)]),
+        number('thalach', 'Max Heart Rate Achieved', 50, 250, 150, 1),
+        choice('exang', 'Exercise Induced Angina', NO_YES),
+        number('oldpeak', 'ST Depression Induced by Exercise', 0.0, 10.0, 1.0, 0.1, "%.1f"),
+        choice('slope', 'Slope of Peak Exercise ST Segment', [('Upsloping', 0), ('Flat', 1), ('Downsloping', 2)]),
+        number('ca', 'Number of Major Vessels Colored by Fluoroscopy', 0, 4, 0, 1),
+        choice('thal', 'Thalassemia', [('Normal', 0), ('Fixed Defect', 1), ('Reversible Defect', 2)]),
+    ),
+    'liver': (
+        number('age', 'Age', 1, 120, 45, 1),
+        choice('gender', 'Gender', BINARY_MALE_FEMALE),
+        number('total_bilirubin', 'Total Bilirubin (mg/dL)', 0.0, 30.0, 1.0, 0.1, "%.1f"),
+        number('direct_bilirubin', 'Direct Bilirubin (mg/dL)', 0.0, 20.0, 0.3, 0.1, "%.1f"),
+        number('alkaline_phosphatase', 'Alkaline Phosphatase (IU/L)', 20, 2000, 290, 1),
+        number('sgpt', 'SGPT (IU/L)', 1, 2000, 40, 1),
+        number('sgot', 'SGOT (IU/L)', 1, 2000, 40, 1),
+        number('total_proteins', 'Total Proteins (g/dL)', 1.0, 15.0, 6.8, 0.1, "%.1f"),
+        number('albumin', 'Albumin (g/dL)', 0.5, 10.0, 3.5, 0.1, "%.1f"),
+        number('ag_ratio', 'A/G Ratio', 0.1, 5.0, 1.0, 0.1, "%.1f"),
+    ),
+    'kidney': (
+        number('age', 'Age', 1, 120, 45, 1),
+        number('bp', 'Blood Pressure (mm Hg)', 50, 200, 80, 1),
+        choice('sg', 'Specific Gravity', [('1.005', 0), ('1.010', 1), ('1.015', 2), ('1.020', 3), ('1.025', 4)],
+               default_index=2),
+        choice('albumin', 'Albumin', GRADES_0_5),
+        choice('sugar', 'Sugar', GRADES_0_5),
+        choice('rbc', 'Red Blood Cells', NORMAL_ABNORMAL),
+        choice('pc', 'Pus Cell', NORMAL_ABNORMAL),
+        choice('pcc', 'Pus Cell Clumps', [('Not Present', 0), ('Present', 1)]),
+        number('bu', 'Blood Urea (mg/dL)', 1.0, 200.0, 44.0, 0.1, "%.1f"),
+        number('sc', 'Serum Creatinine (mg/dL)', 0.1, 15.0, 1.3, 0.1, "%.1f"),
+        number('sod', 'Sodium (mEq/L)', 100, 200, 135, 1),
+    ),
+    # Order follows the pipeline's feature_names_in_ (UCI Parkinson's voice dataset);
+    # ranges are generous bounds around the values seen in that dataset.
+    'parkinsons': (
+        number('fo', 'MDVP:Fo(Hz)', 50.0, 300.0, 120.0, 1.0, "%.3f"),
+        number('fhi', 'MDVP:Fhi(Hz)', 50.0, 600.0, 150.0, 1.0, "%.3f"),
+        number('flo', 'MDVP:Flo(Hz)', 50.0, 300.0, 100.0, 1.0, "%.3f"),
+        number('jitter_percent', 'MDVP:Jitter(%)', 0.0, 0.1, 0.005, 0.0001, "%.5f"),
+        number('jitter_abs', 'MDVP:Jitter(Abs)', 0.0, 0.001, 0.00004, 0.00001, "%.5f"),
+        number('rap', 'MDVP:RAP', 0.0, 0.05, 0.003, 0.0001, "%.5f"),
+        number('ppq', 'MDVP:PPQ', 0.0, 0.05, 0.004, 0.0001, "%.5f"),
+        number('ddp', 'Jitter:DDP', 0.0, 0.15, 0.009, 0.0001, "%.5f"),
+        number('shimmer', 'MDVP:Shimmer', 0.0, 0.2, 0.03, 0.001, "%.4f"),
+        number('shimmer_db', 'MDVP:Shimmer(dB)', 0.0, 2.0, 0.03, 0.01, "%.3f"),
+        number('apq3', 'Shimmer:APQ3', 0.0, 0.1, 0.01, 0.001, "%.4f"),
+        number('apq5', 'Shimmer:APQ5', 0.0, 0.1, 0.02, 0.001, "%.4f"),
+        number('apq', 'MDVP:APQ', 0.0, 0.2, 0.02, 0.001, "%.4f"),
+        number('dda', 'Shimmer:DDA', 0.0, 0.3, 0.01, 0.001, "%.4f"),
+        number('nhr', 'NHR', 0.0, 0.5, 0.01, 0.001, "%.4f"),
+        number('hnr', 'HNR', 0.0, 40.0, 20.0, 0.1, "%.3f"),
+        number('rpde', 'RPDE', 0.0, 1.0, 0.5, 0.01, "%.4f"),
+        number('dfa', 'DFA', 0.0, 1.0, 0.6, 0.01, "%.4f"),
+        number('spread1', 'Spread1', -10.0, 0.0, -5.0, 0.1, "%.4f"),
+        number('spread2', 'Spread2', 0.0, 1.0, 0.1, 0.01, "%.4f"),
+        number('d2', 'D2', 0.0, 5.0, 2.0, 0.01, "%.4f"),
+        number('ppe', 'PPE', 0.0, 1.0, 0.1, 0.01, "%.4f"),
+    ),
+}
+
+FEATURE_INDEX = {disease: {f.name: i for i, f in enumerate(schema)} for disease, schema in SCHEMAS.items()}
+_LOWER = {disease: np.array([f.bounds[0] for f in schema], dtype=np.float64) for disease, schema in SCHEMAS.items()}
+_UPPER = {disease: np.array([f.bounds[1] for f in schema], dtype=np.float64) for disease, schema in SCHEMAS.items()}
+
+
+def feature_names(disease):
+    return [f.name for f in SCHEMAS[disease]]
+
+
+def defaults(disease):
+    """Default value of every feature, keyed by name."""
+    return {f.name: f.default for f in SCHEMAS[disease]}
+
+
+def to_row(values, disease, out=None):
+    """Write a {name: value} mapping straight into a preallocated (1, n_features) float array."""
+    schema = SCHEMAS[disease]
+    if out is None:
+        out = np.empty((1, len(schema)), dtype=np.float64)
+    row = out.reshape(-1)
+    for i, feature in enumerate(schema):
+        if feature.name not in values:
+            raise ValueError(f"Missing {disease} feature: {feature.name}")
+        row[i] = feature.encode(values[feature.name])
+    return out
+
+
+def encode_column(feature, values):
+    """Encode a whole column (e.g. a DataFrame Series) of codes or choice labels to float."""
+    values = np.asarray(values, dtype=object if feature.is_categorical else None)
+    if values.dtype == object:
+        return np.array([feature.encode(v) for v in values], dtype=np.float64)
+    return values.astype(np.float64)
+
+
+def range_errors(X, disease, max_rows=5):
+    """Describe values outside each feature's valid range (NaN is reported separately by callers)."""
+    lower, upper = _LOWER[disease], _UPPER[disease]
+    lo_ok = np.isnan(lower) | (X >= lower)
+    hi_ok = np.isnan(upper) | (X <= upper)
+    bad = ~(lo_ok & hi_ok) & ~np.isnan(X)
+    errors = []
+    for j in np.flatnonzero(bad.any(axis=0)):
+        feature = SCHEMAS[disease][j]
+        rows = np.flatnonzero(bad[:, j])
+        shown = ', '.join(str(r) for r in rows[:max_rows]) + (' ...' if rows.size > max_rows else '')
+        errors.append(f"{feature.name} outside [{feature.bounds[0]}, {feature.bounds[1]}] "
+                      f"in {rows.size} row(s): {shown}")
+    return errors
+
+
+def sample(disease, n_rows, seed=0):
+    """Uniform random rows within each feature's valid range, in model order."""
+    rng = np.random.default_rng(seed)
+    X = np.empty((n_rows, len(SCHEMAS[disease])))
+    for j, feature in enumerate(SCHEMAS[disease]):
+        if feature.is_categorical:
+            X[:, j] = rng.choice([code for _, code in feature.choices], n_rows)
+        elif feature.dtype == 'int':
+            X[:, j] = rng.integers(feature.min_value, feature.max_value + 1, n_rows)
+        else:
+            X[:, j] = rng.uniform(feature.min_value, feature.max_value, n_rows)
+    return X
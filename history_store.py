@@ -0,0 +1,389 @@
+"""Embedded SQLite store for user profiles and prediction history.
+
+Writes go onto a queue and a background thread commits them in batches, so
+recording a prediction never waits on disk I/O. Reads use one connection per
+thread; WAL mode lets them run while the writer commits.
+
+Per-user, per-disease daily and weekly rollups are updated in the same
+transaction as each insert, so trend charts read a few hundred rollup rows
+instead of aggregating raw history.
+
+Profiles are keyed by email, but an email alone never grants access: the
+first save of a profile issues a random profile key (only its SHA-256 is
+stored) that must be presented to load the profile again.
+"""
+import atexit
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import queue
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from feature_schema import feature_names
+from metrics import SIZE_BUCKETS, inc, observe
+
+DEFAULT_PATH = os.path.join('data', 'health_history.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    user_id     TEXT PRIMARY KEY,
+    data        TEXT NOT NULL,
+    updated_at  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS profile_keys (
+    user_id     TEXT PRIMARY KEY,
+    key_sha256  TEXT NOT NULL,
+    created_at  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS predictions (
+    id             INTEGER PRIMARY KEY,
+    user_id        TEXT NOT NULL,
+    disease        TEXT NOT NULL,
+    model_version  TEXT NOT NULL,
+    prediction     INTEGER NOT NULL,
+    probability    REAL NOT NULL,
+    inputs         TEXT NOT NULL,
+    created_at     REAL NOT NULL
+);
+-- Trend queries filter by user and disease and scan a time range
+CREATE INDEX IF NOT EXISTS idx_predictions_user_disease_time ON predictions (user_id, disease, created_at);
+CREATE INDEX IF NOT EXISTS idx_predictions_disease_time ON predictions (disease, created_at);
+CREATE INDEX IF NOT EXISTS idx_predictions_time ON predictions (created_at);
+CREATE TABLE IF NOT EXISTS prediction_rollups (
+    user_id          TEXT NOT NULL,
+    disease          TEXT NOT NULL,
+    period           TEXT NOT NULL,
+    bucket_start     REAL NOT NULL,
+    count            INTEGER NOT NULL,
+    positives        INTEGER NOT NULL,
+    sum_probability  REAL NOT NULL,
+    min_probability  REAL NOT NULL,
+    max_probability  REAL NOT NULL,
+    last_probability REAL NOT NULL,
+    last_at          REAL NOT NULL,
+    PRIMARY KEY (user_id, disease, period, bucket_start)
+);
+"""
+
+DAY = 86400
+WEEK = 7 * DAY
+# Seconds from a UTC bucket start to the start of its period; weeks start on Monday (the epoch was a Thursday)
+ROLLUP_PERIODS = {'day': (DAY, 0), 'week': (WEEK, 3 * DAY)}
+
+_ROLLUP_COLUMNS = ('user_id, disease, period, bucket_start, count, positives, sum_probability, min_probability, '
+                   'max_probability, last_probability, last_at')
+_ROLLUP_UPSERT = f"""
+INSERT INTO prediction_rollups ({_ROLLUP_COLUMNS}) {{source}}
+ON CONFLICT (user_id, disease, period, bucket_start) DO UPDATE SET
+    count = count + excluded.count,
+    positives = positives + excluded.positives,
+    sum_probability = sum_probability + excluded.sum_probability,
+    min_probability = MIN(min_probability, excluded.min_probability),
+    max_probability = MAX(max_probability, excluded.max_probability),
+    last_probability = CASE WHEN excluded.last_at >= last_at THEN excluded.last_probability ELSE last_probability END,
+    last_at = MAX(last_at, excluded.last_at)
+"""
+
+
+def bucket_start(timestamp, period):
+    """UTC start of the day or (Monday-based) week containing `timestamp`."""
+    size, offset = ROLLUP_PERIODS[period]
+    seconds = int(timestamp)
+    return float(seconds - (seconds + offset) % size)
+
+
+def rollup_rows(predictions):
+    """Aggregate prediction insert tuples into one rollup row per (user, disease, period, bucket)."""
+    groups = {}
+    for user_id, disease, _, prediction, probability, _, created_at in predictions:
+        for period in ROLLUP_PERIODS:
+            key = (user_id, disease, period, bucket_start(created_at, period))
+            group = groups.get(key)
+            if group is None:
+                groups[key] = [1, prediction, probability, probability, probability, probability, created_at]
+                continue
+            group[0] += 1
+            group[1] += prediction
+            group[2] += probability
+            group[3] = min(group[3], probability)
+            group[4] = max(group[4], probability)
+            if created_at >= group[6]:
+                group[5], group[6] = probability, created_at
+    return [key + tuple(group) for key, group in groups.items()]
+
+
+_STOP = object()
+
+
+def _key_digest(key):
+    return hashlib.sha256(key.strip().encode('utf-8')).hexdigest()
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=30.0, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+class HistoryStore:
+    """Profiles and predictions in SQLite, with asynchronous batched writes.
+
+    `record_prediction` and `save_profile` only enqueue; the writer thread
+    commits up to `max_batch` queued writes per transaction, waiting at most
+    `flush_interval` seconds after the first one. If the queue is full the
+    write is dropped (and counted) rather than blocking the caller.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, flush_interval=0.5, max_batch=500, max_queue=10000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        conn = _connect(path)
+        conn.executescript(SCHEMA)
+        # Stores created before rollups existed get theirs built once from the raw history
+        if (conn.execute('SELECT 1 FROM predictions LIMIT 1').fetchone()
+                and not conn.execute('SELECT 1 FROM prediction_rollups LIMIT 1').fetchone()):
+            self.rebuild_rollups(conn)
+        conn.close()
+
+        self.max_queue = max_queue
+        self.written = 0
+        self.dropped = 0
+        self._local = threading.local()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._writer = None
+        self._writer_pid = None
+        self._start_lock = threading.Lock()
+        atexit.register(self.close)  # commit whatever is still queued on shutdown
+
+    @classmethod
+    def from_env(cls):
+        """Build a store at HISTORY_DB, flushing every HISTORY_FLUSH_SECONDS."""
+        return cls(path=os.environ.get('HISTORY_DB', DEFAULT_PATH),
+                   flush_interval=float(os.environ.get('HISTORY_FLUSH_SECONDS', 0.5)))
+
+    # --- writes ---
+
+    def _ensure_writer(self):
+        """Start the writer thread on first use, and again in a forked child (threads don't survive fork)."""
+        if self._writer_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._writer_pid != os.getpid():
+                if self._writer_pid is not None:
+                    self._queue = queue.Queue(maxsize=self.max_queue)
+                    self._local = threading.local()
+                self._writer = threading.Thread(target=self._run, args=(self._queue,), name='history-writer',
+                                                daemon=True)
+                self._writer.start()
+                self._writer_pid = os.getpid()
+
+    def _enqueue(self, item):
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+            inc('history_writes_dropped_total', kind=item[0])
+
+    def record_prediction(self, user_id, disease, model_version, prediction, probability, inputs,
+                          created_at=None):
+        """Queue one prediction; `inputs` is a {feature: value} mapping or a row in model order."""
+        if not isinstance(inputs, dict):
+            inputs = dict(zip(feature_names(disease), np.asarray(inputs, dtype=np.float64).reshape(-1).tolist()))
+        self._enqueue(('prediction', (user_id, disease, model_version, int(prediction), float(probability),
+                                      json.dumps(inputs), created_at or time.time())))
+
+    def save_profile(self, user_id, profile):
+        """Queue an insert-or-replace of a user's profile (any JSON-serialisable dict)."""
+        self._enqueue(('profile', (user_id, json.dumps(profile), time.time())))
+
+    def claim_profile(self, user_id):
+        """Make `user_id` a new profile owned by the caller and return its profile key.
+
+        Committed immediately, not queued. Returns None if the ID already has a
+        key or a saved profile (profiles from before keys existed can't be
+        claimed by whoever types their email first).
+        """
+        key = secrets.token_urlsafe(18)
+        conn = self._reader()
+        with conn:
+            if conn.execute('SELECT 1 FROM profiles WHERE user_id = ?', (user_id,)).fetchone():
+                return None
+            claimed = conn.execute('INSERT OR IGNORE INTO profile_keys (user_id, key_sha256, created_at) '
+                                   'VALUES (?, ?, ?)', (user_id, _key_digest(key), time.time())).rowcount
+        return key if claimed else None
+
+    def check_profile_key(self, user_id, key):
+        """Whether `key` is the profile key issued for `user_id`."""
+        row = self._reader().execute('SELECT key_sha256 FROM profile_keys WHERE user_id = ?', (user_id,)).fetchone()
+        return row is not None and hmac.compare_digest(row['key_sha256'], _key_digest(key))
+
+    def merge_user(self, old_user_id, new_user_id):
+        """Queue moving every prediction of `old_user_id` (e.g. a guest session) to `new_user_id`."""
+        self._enqueue(('merge', (new_user_id, old_user_id)))
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far has been committed."""
+        self._ensure_writer()
+        done = threading.Event()
+        self._queue.put(('flush', done))
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        if self._writer is not None and self._writer_pid == os.getpid():
+            self._queue.put(_STOP)
+            self._writer.join(timeout)
+
+    def _collect(self, pending):
+        """Block for the first write, then gather more until the batch is full or the interval passes."""
+        batch = [pending.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch and batch[-1] is not _STOP and batch[-1][0] != 'flush':
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, conn, predictions, merges, profiles):
+        with conn:
+            if predictions:
+                conn.executemany(
+                    'INSERT INTO predictions (user_id, disease, model_version, prediction, probability, inputs, '
+                    'created_at) VALUES (?, ?, ?, ?, ?, ?, ?)', predictions)
+                conn.executemany(_ROLLUP_UPSERT.format(source=f'VALUES ({", ".join("?" * 11)})'),
+                                 rollup_rows(predictions))
+            for new_user_id, old_user_id in merges:
+                conn.execute('UPDATE predictions SET user_id = ? WHERE user_id = ?', (new_user_id, old_user_id))
+                # "WHERE true" keeps SQLite from parsing ON CONFLICT as part of the SELECT's join
+                conn.execute(_ROLLUP_UPSERT.format(
+                    source=f'SELECT ?, {_ROLLUP_COLUMNS.split(", ", 1)[1]} FROM prediction_rollups '
+                           f'WHERE user_id = ? AND true'), (new_user_id, old_user_id))
+                conn.execute('DELETE FROM prediction_rollups WHERE user_id = ?', (old_user_id,))
+            if profiles:
+                conn.executemany('INSERT OR REPLACE INTO profiles (user_id, data, updated_at) VALUES (?, ?, ?)',
+                                 profiles)
+
+    def _run(self, pending):
+        conn = _connect(self.path)
+        while True:
+            batch = self._collect(pending)
+            items = [item for item in batch if item is not _STOP]
+            predictions = [args for kind, args in items if kind == 'prediction']
+            merges = [args for kind, args in items if kind == 'merge']
+            profiles = [args for kind, args in items if kind == 'profile']
+
+            if predictions or merges or profiles:
+                start = time.perf_counter()
+                try:
+                    self._write(conn, predictions, merges, profiles)
+                except sqlite3.Error:
+                    inc('history_write_errors_total')
+                else:
+                    self.written += len(predictions) + len(profiles)
+                    inc('history_writes_total', len(predictions), kind='prediction')
+                    inc('history_writes_total', len(profiles), kind='profile')
+                    observe('history_flush_seconds', time.perf_counter() - start)
+                    observe('history_flush_rows', len(predictions) + len(profiles), buckets=SIZE_BUCKETS)
+
+            for kind, event in items:
+                if kind == 'flush':
+                    event.set()
+            if len(items) < len(batch):
+                conn.close()
+                return
+
+    # --- reads ---
+
+    def _reader(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = _connect(self.path)
+        return conn
+
+    def get_profile(self, user_id):
+        row = self._reader().execute('SELECT data FROM profiles WHERE user_id = ?', (user_id,)).fetchone()
+        return json.loads(row['data']) if row else None
+
+    def predictions(self, user_id, disease=None, since=None, until=None, limit=1000):
+        """A user's predictions, newest first, optionally filtered by disease and time range."""
+        clauses, params = ['user_id = ?'], [user_id]
+        if disease is not None:
+            clauses.append('disease = ?')
+            params.append(disease)
+        if since is not None:
+            clauses.append('created_at >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('created_at < ?')
+            params.append(until)
+        params.append(limit)
+        rows = self._reader().execute(
+            f'SELECT id, disease, model_version, prediction, probability, inputs, created_at FROM predictions '
+            f'WHERE {" AND ".join(clauses)} ORDER BY created_at DESC LIMIT ?', params).fetchall()
+        return [dict(row, inputs=json.loads(row['inputs'])) for row in rows]
+
+    def trend(self, user_id, disease=None, period='day', since=None, limit=366):
+        """Rollup rows for a user, oldest first: at most `limit` buckets per disease.
+
+        Each row has disease, bucket_start, count, positives and the mean, min,
+        max and last probability in that bucket.
+        """
+        if period not in ROLLUP_PERIODS:
+            raise ValueError(f"Unknown period '{period}' (expected one of {', '.join(ROLLUP_PERIODS)})")
+        diseases = [disease] if disease is not None else [row['disease'] for row in self._reader().execute(
+            'SELECT DISTINCT disease FROM prediction_rollups WHERE user_id = ?', (user_id,))]
+
+        rows = []
+        for name in diseases:
+            params = [user_id, name, period]
+            since_clause = ''
+            if since is not None:
+                since_clause = 'AND bucket_start >= ? '
+                params.append(bucket_start(since, period))
+            params.append(limit)
+            # Newest `limit` buckets straight off the primary key, then flipped to chronological order
+            rows.extend(reversed(self._reader().execute(
+                'SELECT disease, bucket_start, count, positives, sum_probability / count AS mean_probability, '
+                'min_probability, max_probability, last_probability, last_at FROM prediction_rollups '
+                f'WHERE user_id = ? AND disease = ? AND period = ? {since_clause}'
+                'ORDER BY bucket_start DESC LIMIT ?', params).fetchall()))
+        return [dict(row) for row in rows]
+
+    def rebuild_rollups(self, conn=None):
+        """Recompute every rollup from the raw predictions (for migrations or repair)."""
+        conn = conn or _connect(self.path)
+        with conn:
+            conn.execute('DELETE FROM prediction_rollups')
+            for period, (size, offset) in ROLLUP_PERIODS.items():
+                conn.execute(
+                    f'INSERT INTO prediction_rollups ({_ROLLUP_COLUMNS}) '
+                    f'SELECT user_id, disease, ?, bucket, COUNT(*), SUM(prediction), SUM(probability), '
+                    f'MIN(probability), MAX(probability), MAX(last_probability), MAX(created_at) FROM ('
+                    f'  SELECT *, FIRST_VALUE(probability) OVER ('
+                    f'    PARTITION BY user_id, disease, bucket ORDER BY created_at DESC) AS last_probability '
+                    f'  FROM (SELECT *, CAST(created_at AS INTEGER) - ((CAST(created_at AS INTEGER) + ?) % ?) '
+                    f'        AS bucket FROM predictions)'
+                    f') GROUP BY user_id, disease, bucket', (period, offset, size))
+
+    def stats(self):
+        return {'path': self.path, 'queued': self._queue.qsize(), 'written': self.written, 'dropped': self.dropped}
+
+    def collect_metrics(self):
+        """Gauges for metrics.register_collector."""
+        return {'history_queue_depth': [({}, self._queue.qsize())]}
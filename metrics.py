@@ -0,0 +1,246 @@
+"""In-process counters, gauges and latency histograms for the prediction hot paths.
+
+Everything can be rendered in the Prometheus text format and exported through
+the API's /metrics route, a standalone HTTP listener or a textfile for
+node_exporter (see start_exporters_from_env).
+"""
+import os
+import threading
+import time
+from collections import defaultdict
+
+# Histogram bucket upper bounds in seconds (Prometheus-style, cumulative on export)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bucket upper bounds for row/batch-size histograms
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_histograms = {}
+_local = threading.local()
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    """Increment a counter."""
+    with _lock:
+        _counters[_key(name, labels)] += value
+
+
+def observe(name, value, buckets=LATENCY_BUCKETS, **labels):
+    """Record one observation in a histogram (bucket bounds are fixed by the first observation)."""
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = {'bounds': tuple(buckets), 'buckets': [0] * (len(buckets) + 1),
+                                       'sum': 0.0, 'count': 0}
+        for i, bound in enumerate(hist['bounds']):
+            if value <= bound:
+                hist['buckets'][i] += 1
+                break
+        else:
+            hist['buckets'][-1] += 1
+        hist['sum'] += value
+        hist['count'] += 1
+
+
+class timer:
+    """Context manager that records the elapsed time of a block in a histogram.
+
+    If a trace is active on the current thread (see start_trace), the elapsed
+    time is also stored there under the 'stage' label so a page can show the
+    breakdown of its own request.
+    """
+
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = labels
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.elapsed = time.perf_counter() - self._start
+        observe(self.name, self.elapsed, **self.labels)
+        trace = getattr(_local, 'trace', None)
+        if trace is not None:
+            trace[self.labels.get('stage', self.name)] = self.elapsed
+        return False
+
+
+def start_trace():
+    """Begin collecting per-stage timings for the current thread's request."""
+    _local.trace = {}
+    return _local.trace
+
+
+def current_trace():
+    """Return the per-stage timings collected since start_trace, or an empty dict."""
+    return dict(getattr(_local, 'trace', None) or {})
+
+
+def histogram_quantile(q, hist):
+    """Estimate a quantile from histogram buckets (upper bound of the bucket holding it)."""
+    if not hist['count']:
+        return 0.0
+    target = q * hist['count']
+    seen = 0
+    for i, count in enumerate(hist['buckets']):
+        seen += count
+        if seen >= target:
+            return hist['bounds'][i] if i < len(hist['bounds']) else float('inf')
+    return float('inf')
+
+
+def snapshot():
+    """Return a copy of all counters and histograms keyed by (name, labels)."""
+    with _lock:
+        return (dict(_counters),
+                {key: {'bounds': h['bounds'], 'buckets': list(h['buckets']), 'sum': h['sum'], 'count': h['count']}
+                 for key, h in _histograms.items()})
+
+
+# --- Gauges and collectors ---
+_gauges = {}
+_collectors = []
+
+
+def set_gauge(name, value, **labels):
+    """Set a gauge to its current value."""
+    with _lock:
+        _gauges[_key(name, labels)] = float(value)
+
+
+def register_collector(collect):
+    """Register a callable returning {name: [(labels dict, value), ...]} gauges, evaluated at export time."""
+    with _lock:
+        if collect not in _collectors:
+            _collectors.append(collect)
+
+
+# --- Prometheus text exposition ---
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+def render_prometheus(namespace='health_app'):
+    """Render all counters, gauges and histograms in the Prometheus text format."""
+    counters, histograms = snapshot()
+    with _lock:
+        gauges = dict(_gauges)
+        collectors = list(_collectors)
+
+    for collect in collectors:
+        try:
+            for name, samples in collect().items():
+                for labels, value in samples:
+                    gauges[_key(name, labels)] = float(value)
+        except Exception:
+            counters[_key('metrics_collector_errors_total', {})] = counters.get(
+                _key('metrics_collector_errors_total', {}), 0) + 1
+
+    lines = []
+
+    def _by_name(items):
+        grouped = defaultdict(list)
+        for (name, labels), value in items:
+            grouped[f'{namespace}_{name}'].append((labels, value))
+        return sorted(grouped.items())
+
+    for name, samples in _by_name(counters.items()):
+        lines.append(f'# TYPE {name} counter')
+        lines.extend(f'{name}{_format_labels(labels)} {_format_value(v)}' for labels, v in samples)
+
+    for name, samples in _by_name(gauges.items()):
+        lines.append(f'# TYPE {name} gauge')
+        lines.extend(f'{name}{_format_labels(labels)} {_format_value(v)}' for labels, v in samples)
+
+    for name, samples in _by_name(histograms.items()):
+        lines.append(f'# TYPE {name} histogram')
+        for labels, hist in samples:
+            cumulative = 0
+            for bound, count in zip(list(hist['bounds']) + [float('inf')], hist['buckets']):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", _format_value(bound))])} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(hist["sum"])}')
+            lines.append(f'{name}_count{_format_labels(labels)} {hist["count"]}')
+
+    return '\n'.join(lines) + '\n'
+
+
+# --- Exporters ---
+def write_textfile(path):
+    """Atomically write the current metrics to `path` (node_exporter textfile collector format)."""
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        f.write(render_prometheus())
+    os.replace(tmp, path)
+
+
+def start_file_exporter(path, interval=15.0):
+    """Rewrite the metrics file every `interval` seconds from a daemon thread."""
+    def _run():
+        while True:
+            try:
+                write_textfile(path)
+            except OSError:
+                inc('metrics_export_errors_total')
+            time.sleep(interval)
+
+    thread = threading.Thread(target=_run, name='metrics-file-exporter', daemon=True)
+    thread.start()
+    return thread
+
+
+def start_http_exporter(port, addr='0.0.0.0'):
+    """Serve GET /metrics on a background thread for processes (like Streamlit) without their own HTTP routes."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip('/') != '/metrics':
+                self.send_error(404)
+                return
+            body = render_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((addr, port), _Handler)
+    thread = threading.Thread(target=server.serve_forever, name='metrics-http-exporter', daemon=True)
+    thread.start()
+    return server
+
+
+def start_exporters_from_env():
+    """Start the exporters configured by METRICS_FILE / METRICS_PORT, if any."""
+    started = []
+    if os.environ.get('METRICS_FILE'):
+        started.append(start_file_exporter(os.environ['METRICS_FILE'],
+                                           float(os.environ.get('METRICS_FILE_INTERVAL', 15))))
+    if os.environ.get('METRICS_PORT'):
+        started.append(start_http_exporter(int(os.environ['METRICS_PORT'])))
+    return started
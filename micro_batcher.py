@@ -0,0 +1,158 @@
+"""Micro-batching of concurrent single-row scoring requests.
+
+Streamlit serves every session from its own thread, so under load many
+threads call predict_proba with one row each. A MicroBatcher per disease
+collects requests for up to `max_wait_ms` (or `max_batch_rows` rows), runs a
+single vectorized score() over all of them and hands each caller its rows.
+
+The worker thread starts on first use and again in a forked child (e.g.
+gunicorn --preload builds the scheduler before forking). A caller whose batch
+isn't scored within `timeout` seconds scores its own rows directly instead.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import numpy as np
+
+from disease_models import DECISION_THRESHOLDS, MODEL_PATHS, score
+from metrics import SIZE_BUCKETS, inc, observe
+
+
+class _Request:
+    __slots__ = ('model', 'X', 'threshold', 'future', 'enqueued')
+
+    def __init__(self, model, X, threshold):
+        self.model = model
+        self.X = X
+        self.threshold = threshold
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class MicroBatcher:
+    """Collects concurrent requests for one disease model and scores them together."""
+
+    def __init__(self, disease, max_wait_ms=2.0, max_batch_rows=64, timeout=5.0):
+        self.disease = disease
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_rows = max_batch_rows
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._pending = None  # request taken from the queue that didn't fit the last batch
+        self._worker = None
+        self._worker_pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_worker(self):
+        """Start the worker on first use, and again in a forked child (threads don't survive fork)."""
+        if self._worker_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._worker_pid != os.getpid():
+                if self._worker_pid is not None:
+                    self._queue = queue.Queue()
+                    self._pending = None
+                self._worker = threading.Thread(target=self._run, name=f'micro-batcher-{self.disease}',
+                                                daemon=True)
+                self._worker.start()
+                self._worker_pid = os.getpid()
+
+    def submit(self, model, X, threshold=None):
+        """Queue rows for scoring and return a Future of (predictions, probabilities)."""
+        if threshold is None:
+            threshold = DECISION_THRESHOLDS[self.disease]
+        self._ensure_worker()
+        request = _Request(model, np.asarray(X, dtype=np.float64), threshold)
+        self._queue.put(request)
+        return request.future
+
+    def score(self, model, X, disease=None, threshold=None):
+        """Blocking drop-in for disease_models.score(); scores directly if the batch takes over `timeout`."""
+        if threshold is None:
+            threshold = DECISION_THRESHOLDS[self.disease]
+        future = self.submit(model, X, threshold)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            inc('micro_batch_timeouts_total', disease=self.disease)
+            return score(model, np.asarray(X, dtype=np.float64), self.disease, threshold)
+
+    def _next_request(self, timeout=None):
+        if self._pending is not None:
+            request, self._pending = self._pending, None
+            return request
+        return self._queue.get(timeout=timeout)
+
+    def _collect(self):
+        """Block for the first request, then gather compatible ones until the window or row cap is hit."""
+        first = self._next_request()
+        batch, rows = [first], first.X.shape[0]
+        deadline = time.perf_counter() + self.max_wait
+
+        while rows < self.max_batch_rows:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._next_request(timeout=remaining)
+            except queue.Empty:
+                break
+            # Only rows for the same model object and threshold can share a call
+            if request.model is not first.model or request.threshold != first.threshold:
+                self._pending = request
+                break
+            batch.append(request)
+            rows += request.X.shape[0]
+        return batch, rows
+
+    def _run(self):
+        while True:
+            batch, rows = self._collect()
+            started = time.perf_counter()
+            for request in batch:
+                observe('micro_batch_wait_seconds', started - request.enqueued, disease=self.disease)
+
+            try:
+                X = batch[0].X if len(batch) == 1 else np.vstack([request.X for request in batch])
+                predictions, probabilities = score(batch[0].model, X, self.disease, batch[0].threshold)
+            except Exception as e:
+                inc('micro_batch_errors_total', disease=self.disease)
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+
+            observe('micro_batch_seconds', time.perf_counter() - started, disease=self.disease)
+            observe('micro_batch_rows', rows, buckets=SIZE_BUCKETS, disease=self.disease)
+            inc('micro_batches_total', disease=self.disease)
+
+            offset = 0
+            for request in batch:
+                n = request.X.shape[0]
+                request.future.set_result((predictions[offset:offset + n], probabilities[offset:offset + n]))
+                offset += n
+
+
+class MicroBatchScheduler:
+    """One MicroBatcher per disease, exposed through the score() signature."""
+
+    def __init__(self, max_wait_ms=2.0, max_batch_rows=64, diseases=None, timeout=5.0):
+        self.batchers = {disease: MicroBatcher(disease, max_wait_ms, max_batch_rows, timeout)
+                         for disease in diseases or MODEL_PATHS}
+
+    @classmethod
+    def from_env(cls):
+        """Build a scheduler from MICRO_BATCH_WAIT_MS, MICRO_BATCH_MAX_ROWS and MICRO_BATCH_TIMEOUT_MS."""
+        return cls(max_wait_ms=float(os.environ.get('MICRO_BATCH_WAIT_MS', 2.0)),
+                   max_batch_rows=int(os.environ.get('MICRO_BATCH_MAX_ROWS', 64)),
+                   timeout=float(os.environ.get('MICRO_BATCH_TIMEOUT_MS', 5000)) / 1000.0)
+
+    def score(self, model, X, disease, threshold=None):
+        return self.batchers[disease].score(model, X, threshold=threshold)
+
+
+def micro_batching_enabled():
+    return os.environ.get('MICRO_BATCH') == '1'
@@ -0,0 +1,253 @@
+"""Versioned model manifest: which file each disease serves, with its checksum.
+
+models/manifest.json lists every published version of each model with the
+file's SHA-256, plus the active version and the one it replaced. New
+versions are copied under models/versions/<disease>/ before the manifest is
+switched, and both steps are atomic renames, so a reader never sees a
+half-written model or manifest. ModelRegistry watches the manifest and swaps
+models in without a restart.
+
+A published version can also be made the disease's candidate instead of
+going live: in 'shadow' mode it scores the same inputs off the request path
+for comparison only (see shadow.py); in 'split' mode a fraction of sessions
+is served by it.
+
+Usage:
+    python model_manifest.py list
+    python model_manifest.py publish diabetes retrained.pkl --version 2025-06-01
+    python model_manifest.py publish kidney retrained.pkl --version 2 --no-activate
+    python model_manifest.py candidate kidney 2 --mode shadow
+    python model_manifest.py candidate kidney 2 --mode split --fraction 0.1
+    python model_manifest.py candidate kidney --clear
+    python model_manifest.py promote kidney                # make the candidate the active version
+    python model_manifest.py rollback diabetes            # back to the previous version
+    python model_manifest.py rollback diabetes --to 1
+    python model_manifest.py init                         # manifest for the files in MODEL_PATHS
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from disease_models import MODEL_PATHS
+
+MANIFEST_PATH = 'models/manifest.json'
+VERSIONS_DIR = 'models/versions'
+FORMAT_VERSION = 1
+CANDIDATE_MODES = ('shadow', 'split')
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _atomic_write(path, write):
+    """Write to a temp file in the target directory, fsync, then rename over `path`."""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def implicit_manifest(paths=None):
+    """Manifest for plain models/*.pkl files when no manifest.json exists (no checksums to verify)."""
+    return {'format_version': FORMAT_VERSION, 'models': {
+        disease: {'active': 'unversioned', 'previous': None,
+                  'versions': {'unversioned': {'path': path, 'sha256': None}}}
+        for disease, path in (paths or MODEL_PATHS).items()
+    }}
+
+
+def load_manifest(path=MANIFEST_PATH, paths=None):
+    if not os.path.exists(path):
+        return implicit_manifest(paths)
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"{path} has format {manifest.get('format_version')}, expected {FORMAT_VERSION}")
+    return manifest
+
+
+def write_manifest(manifest, path=MANIFEST_PATH):
+    payload = json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8')
+    _atomic_write(path, lambda f: f.write(payload))
+
+
+def active_entry(manifest, disease):
+    """(version, {'path', 'sha256', ...}) currently active for a disease."""
+    model = manifest['models'][disease]
+    return model['active'], model['versions'][model['active']]
+
+
+def candidate_entry(manifest, disease):
+    """(version, spec, mode, fraction) of a disease's candidate, or None if it has none."""
+    candidate = manifest['models'][disease].get('candidate')
+    if candidate is None:
+        return None
+    return (candidate['version'], manifest['models'][disease]['versions'][candidate['version']],
+            candidate['mode'], candidate.get('fraction', 0.0))
+
+
+def verify(entry):
+    """Raise ValueError if a version's file doesn't match its recorded checksum."""
+    if entry.get('sha256') is None:
+        return
+    actual = file_sha256(entry['path'])
+    if actual != entry['sha256']:
+        raise ValueError(f"Checksum mismatch for {entry['path']}: expected {entry['sha256'][:12]}, "
+                         f"got {actual[:12]} (publish new files with model_manifest.py)")
+
+
+def init_manifest(path=MANIFEST_PATH, paths=None):
+    """Record the current model files as version '1' of each disease."""
+    manifest = {'format_version': FORMAT_VERSION, 'models': {}}
+    for disease, model_path in (paths or MODEL_PATHS).items():
+        manifest['models'][disease] = {'active': '1', 'previous': None, 'versions': {
+            '1': {'path': model_path, 'sha256': file_sha256(model_path), 'published_at': time.time()}}}
+    write_manifest(manifest, path)
+    return manifest
+
+
+def publish(disease, source, version=None, path=MANIFEST_PATH, versions_dir=VERSIONS_DIR, activate=True):
+    """Copy `source` in as a new version of a disease model and, unless `activate` is False, make it active."""
+    manifest = load_manifest(path)
+    if manifest['models'][disease]['active'] == 'unversioned':
+        raise ValueError(f"No {path} yet; run 'python model_manifest.py init' first")
+    versions = manifest['models'][disease]['versions']
+    version = version or time.strftime('%Y%m%d-%H%M%S')
+    if version in versions:
+        raise ValueError(f"{disease} version '{version}' already exists")
+
+    target = os.path.join(versions_dir, disease, f'{version}{os.path.splitext(source)[1] or ".pkl"}')
+    with open(source, 'rb') as src:
+        _atomic_write(target, lambda f: shutil.copyfileobj(src, f))
+    versions[version] = {'path': target, 'sha256': file_sha256(target), 'published_at': time.time()}
+    if activate:
+        manifest['models'][disease]['previous'] = manifest['models'][disease]['active']
+        manifest['models'][disease]['active'] = version
+    write_manifest(manifest, path)
+    return version
+
+
+def set_candidate(disease, version=None, mode='shadow', fraction=0.0, path=MANIFEST_PATH):
+    """Evaluate `version` next to the active model (mode 'shadow' or 'split'); version=None clears it."""
+    manifest = load_manifest(path)
+    model = manifest['models'][disease]
+    if version is None:
+        model.pop('candidate', None)
+    else:
+        if version not in model['versions']:
+            raise ValueError(f"{disease} has no version '{version}'")
+        if version == model['active']:
+            raise ValueError(f"{disease} version '{version}' is already active")
+        if mode not in CANDIDATE_MODES:
+            raise ValueError(f"Candidate mode must be one of {', '.join(CANDIDATE_MODES)}")
+        if mode == 'split' and not 0.0 < fraction <= 1.0:
+            raise ValueError("Split fraction must be in (0, 1]")
+        model['candidate'] = {'version': version, 'mode': mode, 'fraction': fraction if mode == 'split' else 0.0}
+    write_manifest(manifest, path)
+
+
+def promote(disease, path=MANIFEST_PATH):
+    """Make the candidate the active version; the current one becomes 'previous'."""
+    manifest = load_manifest(path)
+    model = manifest['models'][disease]
+    if 'candidate' not in model:
+        raise ValueError(f"{disease} has no candidate to promote")
+    model['previous'], model['active'] = model['active'], model.pop('candidate')['version']
+    write_manifest(manifest, path)
+    return model['active']
+
+
+def rollback(disease, to_version=None, path=MANIFEST_PATH):
+    """Re-activate the previous (or a named) version; the current one becomes 'previous'."""
+    manifest = load_manifest(path)
+    model = manifest['models'][disease]
+    target = to_version or model.get('previous')
+    if target is None:
+        raise ValueError(f"{disease} has no previous version to roll back to")
+    if target not in model['versions']:
+        raise ValueError(f"{disease} has no version '{target}'")
+    model['previous'], model['active'] = model['active'], target
+    if model.get('candidate', {}).get('version') == target:
+        del model['candidate']
+    write_manifest(manifest, path)
+    return target
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage versioned disease model files.")
+    parser.add_argument('--manifest', default=MANIFEST_PATH)
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="Show versions and which is active")
+    commands.add_parser('init', help="Create a manifest from the current model files")
+    publish_cmd = commands.add_parser('publish', help="Add a new model version and activate it")
+    publish_cmd.add_argument('disease', choices=list(MODEL_PATHS))
+    publish_cmd.add_argument('source', help="Trained model pickle")
+    publish_cmd.add_argument('--version', help="Version label (default: timestamp)")
+    publish_cmd.add_argument('--no-activate', dest='activate', action='store_false',
+                             help="Only add the version (e.g. to use it as a candidate)")
+    candidate_cmd = commands.add_parser('candidate', help="Shadow-test or A/B split a version against the active one")
+    candidate_cmd.add_argument('disease', choices=list(MODEL_PATHS))
+    candidate_cmd.add_argument('version', nargs='?')
+    candidate_cmd.add_argument('--mode', choices=CANDIDATE_MODES, default='shadow')
+    candidate_cmd.add_argument('--fraction', type=float, default=0.0, help="Share of sessions served in split mode")
+    candidate_cmd.add_argument('--clear', action='store_true', help="Stop evaluating the candidate")
+    promote_cmd = commands.add_parser('promote', help="Make the candidate the active version")
+    promote_cmd.add_argument('disease', choices=list(MODEL_PATHS))
+    rollback_cmd = commands.add_parser('rollback', help="Re-activate an earlier version")
+    rollback_cmd.add_argument('disease', choices=list(MODEL_PATHS))
+    rollback_cmd.add_argument('--to', dest='to_version', help="Version to activate (default: previous)")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'init':
+            if os.path.exists(args.manifest):
+                parser.error(f"{args.manifest} already exists")
+            init_manifest(args.manifest)
+            print(f"Wrote {args.manifest}")
+        elif args.command == 'publish':
+            version = publish(args.disease, args.source, args.version, args.manifest, activate=args.activate)
+            print(f"{args.disease}: published {'and activated ' if args.activate else ''}version {version}")
+        elif args.command == 'candidate':
+            if args.clear == (args.version is not None):
+                parser.error("give either a version or --clear")
+            set_candidate(args.disease, args.version, args.mode, args.fraction, args.manifest)
+            print(f"{args.disease}: candidate cleared" if args.clear else
+                  f"{args.disease}: version {args.version} is the {args.mode} candidate")
+        elif args.command == 'promote':
+            version = promote(args.disease, args.manifest)
+            print(f"{args.disease}: candidate {version} is now active")
+        elif args.command == 'rollback':
+            version = rollback(args.disease, args.to_version, args.manifest)
+            print(f"{args.disease}: active version is now {version}")
+        else:
+            for disease, model in load_manifest(args.manifest)['models'].items():
+                candidate = model.get('candidate', {}).get('version')
+                for version, entry in sorted(model['versions'].items()):
+                    marker = '*' if version == model['active'] else '~' if version == candidate else ' '
+                    print(f"{marker} {disease:<11} {version:<20} {(entry['sha256'] or '')[:12]:<12} {entry['path']}")
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,405 @@
+"""Lazy, per-disease, versioned model registry.
+
+Models are unpickled (and their backend library imported) the first time a
+page or API route asks for them, instead of all five at startup, and are
+hot-swapped when a new version is published to the manifest. A candidate
+version can run next to the active one in shadow or split mode (see shadow.py).
+Diseases in POOLED_MODELS are scored in worker processes (see process_pool.py),
+and diseases in CASCADE_MODELS behind a distilled surrogate (see cascade.py).
+"""
+import importlib
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+from cascade import CascadeModel, cascade_diseases, cascade_for
+from disease_models import MODEL_PATHS, load_model, serving_model
+from metrics import inc, observe
+from model_manifest import MANIFEST_PATH, active_entry, candidate_entry, file_sha256, load_manifest, verify
+from model_manifest import rollback as manifest_rollback
+from process_pool import InferencePool, PooledModel, pooled_diseases
+from shadow import split_bucket
+from tree_export import compiled_path, compiled_source, has_compiled, load_compiled
+
+# Library each pickle needs; imported explicitly so its cost shows up separately from unpickling
+MODEL_BACKENDS = {
+    'diabetes': 'sklearn.ensemble',
+    'heart': 'sklearn.ensemble',
+    'liver': 'xgboost',
+    'kidney': 'sklearn.svm',
+    'parkinsons': 'sklearn.pipeline',
+}
+
+
+def _rss_bytes():
+    """Resident set size of this process, or 0 where /proc is unavailable."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _stamp(path):
+    """(mtime, size) of a file, or None if it doesn't exist; used to notice replaced files cheaply."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _pooled_handle(model):
+    """The PooledModel behind a served model (directly or as a cascade's full tier), or None."""
+    model = model.full if isinstance(model, CascadeModel) else model
+    return model if isinstance(model, PooledModel) else None
+
+
+class ModelRegistry:
+    """Dict-like access to the disease models that loads each one on first use.
+
+    `disease in registry` loads the model if needed and is False if it failed,
+    so pages can keep their existing "model not loaded" checks.
+
+    Which file is served comes from models/manifest.json (see model_manifest.py).
+    Files are checked against their recorded SHA-256 before unpickling. A
+    background watcher polls the manifest every `reload_interval` seconds and
+    loads a newly activated version next to the old one. The new model is
+    swapped in only once it has loaded; if it fails, the old model keeps
+    serving. Without a manifest, the plain models/*.pkl files are watched
+    instead.
+
+    Diseases in `pooled` (default: POOLED_MODELS) are loaded into an
+    InferencePool of worker processes and served as PooledModel handles, so
+    their GIL-bound scoring doesn't stall the threads of this process.
+
+    Diseases in `cascaded` (default: CASCADE_MODELS) are served as a
+    CascadeModel when a surrogate distilled from the loaded file exists;
+    otherwise the full model is served alone.
+    """
+
+    def __init__(self, paths=None, use_compiled=None, manifest_path=MANIFEST_PATH, reload_interval=None,
+                 pooled=None, pool=None, cascaded=None):
+        self.paths = dict(paths or MODEL_PATHS)
+        # Serve memory-mapped node tables from tree_export.py where they exist
+        if use_compiled is None:
+            use_compiled = os.environ.get('USE_COMPILED_MODELS') == '1'
+        self.use_compiled = use_compiled
+        if reload_interval is None:
+            reload_interval = float(os.environ.get('MODEL_RELOAD_INTERVAL', 5.0))
+        self.reload_interval = reload_interval
+        self.pooled = set(pooled_diseases() if pooled is None else pooled)
+        # Workers only start when the first pooled model is loaded
+        self.pool = pool or (InferencePool.from_env() if self.pooled else None)
+        self.cascaded = set(cascade_diseases() if cascaded is None else cascaded)
+        self.manifest_path = manifest_path
+        self._manifest = load_manifest(manifest_path, self.paths)
+        self._manifest_stamp = _stamp(manifest_path)
+        self._entries = {}  # disease -> (model, version), replaced as one object so readers never see a mix
+        self._candidates = {}  # disease -> (model, version, mode, fraction)
+        self._candidate_errors = {}
+        self._file_stamps = {}
+        self._stats = {disease: {'loaded': False} for disease in self.paths}
+        self._locks = {disease: threading.Lock() for disease in self.paths}
+        # RSS deltas are only meaningful when loads don't overlap; serializes active-model loads
+        self._load_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        # Serializes candidate loads; separate, so a candidate load never blocks the active model
+        self._candidate_lock = threading.Lock()
+        self._watcher_pid = None
+
+    def get(self, disease):
+        """Return the model for a disease, loading it on first use."""
+        return self.get_versioned(disease)[0]
+
+    def get_versioned(self, disease):
+        """Return (model, version) from one consistent snapshot, loading on first use."""
+        if self.reload_interval and self._watcher_pid != os.getpid():
+            self._start_watcher()
+        entry = self._entries.get(disease)
+        if entry is not None:
+            return entry
+
+        with self._locks[disease]:
+            if disease not in self._entries:
+                version, spec = active_entry(self._manifest, disease)
+                try:
+                    model, stats = self._load(disease, version, spec)
+                except Exception as e:
+                    self._stats[disease] = {'loaded': False, 'path': spec['path'], 'error': f"{type(e).__name__}: {e}"}
+                    raise
+                self._file_stamps[disease] = stats.pop('stamp')
+                self._entries[disease] = (model, stats['version'])
+                self._stats[disease] = stats
+            return self._entries[disease]
+
+    def version(self, disease):
+        return self.get_versioned(disease)[1]
+
+    # --- candidates ---
+
+    def candidate_mode(self, disease):
+        """'shadow', 'split' or None for a disease's candidate, from the manifest (loads nothing)."""
+        entry = candidate_entry(self._manifest, disease)
+        return entry[2] if entry else None
+
+    def candidate(self, disease):
+        """(model, version, mode, fraction) of the disease's candidate, loading it on first use.
+
+        Returns None when there is no candidate or it failed to load; the
+        failure is reported in stats()[disease]['candidate_error'] and never
+        affects the active model.
+        """
+        entry = candidate_entry(self._manifest, disease)
+        if entry is None:
+            return None
+        version, spec, mode, fraction = entry
+        current = self._candidates.get(disease)
+        if current is not None and current[1] == version:
+            return current if current[2:] == (mode, fraction) else (current[0], version, mode, fraction)
+        if self._candidate_errors.get(disease, (None,))[0] == version:
+            return None  # don't retry a broken file on every request; a manifest change clears this
+
+        with self._candidate_lock:
+            current = self._candidates.get(disease)
+            if current is None or current[1] != version:
+                try:
+                    model, _ = self._load(disease, version, spec, candidate=True)
+                except Exception as e:
+                    self._candidate_errors[disease] = (version, f"{type(e).__name__}: {e}")
+                    return None
+                current = self._candidates[disease] = (model, version, mode, fraction)
+        return current
+
+    def route(self, disease, session_id=None):
+        """(model, version, arm) serving this session: the candidate for its split share, else the active model.
+
+        `arm` is 'candidate' or 'active'. Sessions without an ID always get the
+        active model.
+        """
+        if session_id is not None and self.candidate_mode(disease) == 'split':
+            candidate = self.candidate(disease)
+            if candidate is not None and split_bucket(session_id, disease) < candidate[3]:
+                inc('model_routed_total', disease=disease, arm='candidate')
+                return candidate[0], candidate[1], 'candidate'
+            inc('model_routed_total', disease=disease, arm='active')
+        model, version = self.get_versioned(disease)
+        return model, version, 'active'
+
+    def _load(self, disease, version, spec, candidate=False):
+        """Verify and load one model version; returns (model, stats) without touching the served entry.
+
+        Candidate loads (already serialized by _candidate_lock) skip _load_lock,
+        so an active model never waits for one; rss_bytes of loads that overlap
+        a candidate load includes some of its memory.
+        """
+        path = spec['path']
+        stats = {'loaded': False, 'path': path}
+        with nullcontext() if candidate else self._load_lock:
+            rss_before = _rss_bytes()
+            try:
+                stamp = _stamp(path)
+                start = time.perf_counter()
+                sha256 = spec.get('sha256')
+                verify(spec)
+                if sha256 is None:
+                    # Unversioned file: label it by content so predictions can still be traced to it
+                    sha256 = file_sha256(path)
+                    version = f"sha-{sha256[:12]}"
+                stats['verify_seconds'] = time.perf_counter() - start
+
+                compiled = self.use_compiled and has_compiled(disease) and compiled_source(disease) == sha256
+                if disease in self.pooled:
+                    # Unpickled in the worker processes; this process only keeps a handle
+                    stats['backend'] = 'pool'
+                    stats['import_seconds'] = 0.0
+                    start = time.perf_counter()
+                    model = self.pool.load(disease, version, {'loader': 'compiled' if compiled else 'pickle',
+                                                              'path': compiled_path(disease) if compiled else path})
+                    stats['load_seconds'] = time.perf_counter() - start
+                elif compiled:
+                    stats['path'] = compiled_path(disease)
+                    stats['import_seconds'] = 0.0
+                    start = time.perf_counter()
+                    model = load_compiled(disease)
+                    stats['load_seconds'] = time.perf_counter() - start
+                else:
+                    start = time.perf_counter()
+                    importlib.import_module(MODEL_BACKENDS[disease])
+                    stats['import_seconds'] = time.perf_counter() - start
+
+                    start = time.perf_counter()
+                    model = serving_model(load_model(disease, path), disease)
+                    stats['load_seconds'] = time.perf_counter() - start
+                if disease in self.cascaded:
+                    model = cascade_for(model, disease, sha256)
+            except Exception as e:
+                inc('model_load_errors_total', disease=disease, error=type(e).__name__)
+                raise
+
+            stats['rss_bytes'] = max(_rss_bytes() - rss_before, 0)
+            stats.setdefault('backend', 'thread')
+            stats['cascade'] = isinstance(model, CascadeModel)
+
+        stats.update(loaded=True, format=type(model).__name__, version=version, sha256=sha256,
+                     loaded_at=time.time(), stamp=stamp)
+        observe('model_load_seconds', stats['import_seconds'] + stats['load_seconds'], disease=disease)
+        return model, stats
+
+    # --- hot reload ---
+
+    def reload(self, diseases=None):
+        """Re-read the manifest and swap in every loaded model whose active version changed.
+
+        Returns {disease: new version} for the swaps that happened. A version
+        that fails to verify or load is reported in stats()['reload_error']
+        and the current model keeps serving.
+        """
+        with self._reload_lock:
+            self._manifest = load_manifest(self.manifest_path, self.paths)
+            self._manifest_stamp = _stamp(self.manifest_path)
+            swapped = {}
+            for disease in diseases or self.paths:
+                self._drop_stale_candidate(disease)
+                current = self._entries.get(disease)
+                if current is None:
+                    continue  # loads the new active version on first use
+                version, spec = active_entry(self._manifest, disease)
+                unchanged = (current[1] == version if spec.get('sha256') is not None
+                             else self._file_stamps.get(disease) == _stamp(spec['path']))
+                if unchanged:
+                    self._stats[disease].pop('reload_error', None)  # e.g. rolled back from a broken version
+                    continue
+                try:
+                    model, stats = self._load(disease, version, spec)
+                except Exception as e:
+                    inc('model_reloads_total', disease=disease, outcome='error')
+                    self._stats[disease] = dict(self._stats[disease], reload_error=f"{type(e).__name__}: {e}")
+                    continue
+                stats['previous_version'] = current[1]
+                self._file_stamps[disease] = stats.pop('stamp')
+                self._entries[disease] = (model, stats['version'])
+                self._stats[disease] = stats
+                if _pooled_handle(current[0]) is not None:
+                    current[0].release()
+                inc('model_reloads_total', disease=disease, outcome='ok')
+                swapped[disease] = stats['version']
+            return swapped
+
+    def _drop_stale_candidate(self, disease):
+        """Forget a loaded or failed candidate once the manifest names a different one (or none)."""
+        entry = candidate_entry(self._manifest, disease)
+        version = entry[0] if entry else None
+        if self._candidates.get(disease, (None, version))[1] != version:
+            model = _pooled_handle(self._candidates.pop(disease)[0])
+            if model is not None and model.key != (disease, self._entries.get(disease, (None, None))[1]):
+                model.release()
+        if self._candidate_errors.get(disease, (version,))[0] != version:
+            del self._candidate_errors[disease]
+
+    def rollback(self, disease, to_version=None):
+        """Activate the previous (or a named) version in the manifest and swap it in here immediately.
+
+        Other processes pick the change up on their next manifest poll.
+        """
+        version = manifest_rollback(disease, to_version, self.manifest_path)
+        self.reload([disease])
+        return version
+
+    def _changed_on_disk(self):
+        """Whether the manifest, or (without one) any loaded model file, has changed since the last check."""
+        if _stamp(self.manifest_path) != self._manifest_stamp:
+            return True
+        for disease, (_, version) in list(self._entries.items()):
+            _, spec = active_entry(self._manifest, disease)
+            if spec.get('sha256') is None and _stamp(spec['path']) != self._file_stamps.get(disease):
+                return True
+        return False
+
+    def _start_watcher(self):
+        """Start the reload thread once per process (threads don't survive a gunicorn --preload fork)."""
+        with self._reload_lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+        threading.Thread(target=self._watch, name='model-reload', daemon=True).start()
+
+    def _watch(self):
+        pending = False
+        while True:
+            time.sleep(self.reload_interval)
+            try:
+                changed = self._changed_on_disk()
+                # Unversioned files are copied in place, so wait one more interval for the copy to settle
+                if changed and (pending or _stamp(self.manifest_path) != self._manifest_stamp):
+                    self.reload()
+                    pending = False
+                else:
+                    pending = changed
+            except Exception:
+                inc('model_reload_errors_total')
+
+    def __getitem__(self, disease):
+        try:
+            return self.get(disease)
+        except Exception:
+            raise KeyError(disease)
+
+    def __contains__(self, disease):
+        if disease not in self.paths:
+            return False
+        try:
+            self.get(disease)
+            return True
+        except Exception:
+            return False
+
+    def is_loaded(self, disease):
+        return disease in self._entries
+
+    def warm_up(self, diseases=None, background=True):
+        """Load models ahead of first use, optionally on a daemon thread."""
+        def _run():
+            for disease in diseases or self.paths:
+                try:
+                    self.get(disease)
+                except Exception:
+                    pass  # recorded in stats; the page reports it when opened
+
+        if not background:
+            _run()
+            return None
+        thread = threading.Thread(target=_run, name='model-warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        """Per-model load status, version, timings and approximate resident size, plus any candidate."""
+        stats = {disease: dict(stats) for disease, stats in self._stats.items()}
+        for disease in stats:
+            entry = candidate_entry(self._manifest, disease)
+            if entry is not None:
+                version, _, mode, fraction = entry
+                stats[disease]['candidate'] = {'version': version, 'mode': mode, 'fraction': fraction,
+                                               'loaded': self._candidates.get(disease, (None, None))[1] == version}
+                error = self._candidate_errors.get(disease)
+                if error is not None and error[0] == version:
+                    stats[disease]['candidate']['error'] = error[1]
+        return stats
+
+    def collect_metrics(self):
+        """Gauges for metrics.register_collector: load state, version, load time and resident size per model,
+        plus live pool workers when a process pool is in use."""
+        stats = self.stats()
+        return {
+            **(self.pool.collect_metrics() if self.pool is not None else {}),
+            'model_loaded': [({'disease': d}, int(s['loaded'])) for d, s in stats.items()],
+            'model_info': [({'disease': d, 'version': s['version']}, 1) for d, s in stats.items() if s['loaded']],
+            'model_candidate_info': [({'disease': d, 'version': s['candidate']['version'], 'mode': s['candidate']['mode'],
+                                       'fraction': str(s['candidate']['fraction'])}, 1)
+                                     for d, s in stats.items() if 'candidate' in s],
+            'model_resident_bytes': [({'disease': d}, s['rss_bytes']) for d, s in stats.items() if s['loaded']],
+            'model_load_duration_seconds': [({'disease': d}, s['import_seconds'] + s['load_seconds'])
+                                            for d, s in stats.items() if s['loaded']],
+        }
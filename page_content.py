@@ -0,0 +1,307 @@
+"""Static page content: CSS, disease information and the HTML built from it.
+
+Streamlit re-executes a.py on every interaction, so anything defined there is
+rebuilt each rerun. Keeping the static content in an imported module (and the
+HTML builders behind lru_cache) means it is built once per process.
+"""
+from functools import lru_cache
+
+APP_CSS = """
+<style>
+/* Main styling */
+.main-header {
+    color: #2c3e50;
+    text-align: center;
+    font-size: 3rem;
+    font-weight: 700;
+    margin-bottom: 1rem;
+    padding-bottom: 1rem;
+    border-bottom: 2px solid #f1f1f1;
+    font-family: 'Arial', sans-serif;
+}
+.sub-header {
+    color: #2c3e50;
+    font-size: 2rem;
+    font-weight: 600;
+    margin-top: 1rem;
+    margin-bottom: 1.5rem;
+    font-family: 'Arial', sans-serif;
+}
+.tab-subheader {
+    color: #3498db;
+    font-size: 1.5rem;
+    font-weight: 600;
+    margin-top: 1.5rem;
+    margin-bottom: 1rem;
+}
+.result-box {
+    padding: 20px;
+    border-radius: 10px;
+    margin-bottom: 20px;
+    box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
+}
+.positive-result {
+    background-color: #ffe8e8;
+    border: 2px solid #ff9999;
+}
+.negative-result {
+    background-color: #e8ffe8;
+    border: 2px solid #99ff99;
+}
+.info-box {
+    background-color: #f0f7ff;
+    border: 1px solid #bbd6ff;
+    border-radius: 5px;
+    padding: 15px;
+    margin: 20px 0;
+    box-shadow: 0 2px 4px rgba(0, 0, 0, 0.05);
+}
+.treatment-box, .prevention-box {
+    background-color: #f9f9f9;
+    border-radius: 5px;
+    padding: 15px;
+    height: 100%;
+    border-left: 4px solid #3498db;
+    box-shadow: 0 2px 4px rgba(0, 0, 0, 0.05);
+}
+.prevention-box {
+    border-left-color: #2ecc71;
+}
+.cure-box {
+    background-color: #f9f9f9;
+    border-radius: 5px;
+    padding: 15px;
+    height: 100%;
+    border-left: 4px solid #9b59b6;
+    box-shadow: 0 2px 4px rgba(0, 0, 0, 0.05);
+}
+.sidebar .sidebar-content {
+    background-color: #f8f9fa;
+}
+div.stButton > button {
+    background-color: #3498db;
+    color: white;
+    border: none;
+    border-radius: 5px;
+    padding: 10px 20px;
+    font-weight: 600;
+    width: 100%;
+    transition: all 0.3s ease;
+}
+div.stButton > button:hover {
+    background-color: #2980b9;
+    transform: translateY(-2px);
+    box-shadow: 0 4px 8px rgba(0, 0, 0, 0.2);
+}
+.stTabs [data-baseweb="tab-list"] {
+    gap: 24px;
+}
+.stTabs [data-baseweb="tab"] {
+    height: 50px;
+    white-space: pre-wrap;
+    background-color: #f1f1f1;
+    border-radius: 4px 4px 0px 0px;
+    gap: 1px;
+    padding-top: 10px;
+    padding-bottom: 10px;
+}
+.stTabs [aria-selected="true"] {
+    background-color: #3498db;
+    color: white;
+}
+table {
+    font-size: 0.9rem;
+}
+thead tr th {
+    background-color: #f1f1f1;
+    font-weight: 600;
+}
+.footer {
+    text-align: center;
+    margin-top: 50px;
+    padding-top: 20px;
+    border-top: 1px solid #f1f1f1;
+    font-size: 0.8rem;
+    color: #7f8c8d;
+}
+.disease-card {
+    background-color: white;
+    border-radius: 10px;
+    padding: 20px;
+    box-shadow: 0 4px 8px rgba(0, 0, 0, 0.1);
+    height: 100%;
+    transition: all 0.3s ease;
+    border-left: 5px solid #3498db;
+}
+.disease-card:hover {
+    transform: translateY(-5px);
+    box-shadow: 0 8px 16px rgba(0, 0, 0, 0.2);
+}
+.disease-card-title {
+    font-size: 1.5rem;
+    font-weight: 600;
+    color: #2c3e50;
+    margin-bottom: 10px;
+}
+.disease-card-desc {
+    font-size: 0.9rem;
+    color: #7f8c8d;
+    margin-bottom: 20px;
+}
+.disease-card-stat {
+    font-size: 1.2rem;
+    font-weight: 600;
+    color: #e74c3c;
+}
+.stNumberInput input {
+    border-radius: 5px;
+    border: 1px solid #e0e0e0;
+}
+.stNumberInput input:focus {
+    border-color: #3498db;
+    box-shadow: 0 0 0 2px rgba(52, 152, 219, 0.2);
+}
+.nav-card {
+    background-color: white;
+    border-radius: 10px;
+    padding: 15px;
+    box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
+    margin-bottom: 15px;
+    cursor: pointer;
+    transition: all 0.3s ease;
+}
+.nav-card:hover {
+    transform: translateY(-3px);
+    box-shadow: 0 6px 12px rgba(0, 0, 0, 0.15);
+}
+.nav-card-title {
+    font-size: 1.2rem;
+    font-weight: 600;
+    color: #2c3e50;
+}
+.nav-card-icon {
+    font-size: 1.5rem;
+    margin-right: 10px;
+    color: #3498db;
+}
+.stNumberInput > div > div > input {
+    height: 40px;
+}
+.profile-card {
+    background-color: white;
+    border-radius: 10px;
+    padding: 20px;
+    box-shadow: 0 4px 8px rgba(0, 0, 0, 0.1);
+    margin-bottom: 20px;
+    border-top: 4px solid #3498db;
+}
+.stCheckbox label span {
+    font-size: 1rem;
+    color: #2c3e50;
+}
+</style>
+"""
+
+# --- Disease information ---
+disease_info = {
+    'diabetes': {
+        'name': 'Diabetes',
+        'description': 'Diabetes is a chronic disease that occurs when the pancreas is no longer able to make insulin, or when the body cannot make good use of the insulin it produces.',
+        'symptoms': ['Frequent urination', 'Increased thirst', 'Unexplained weight loss', 'Extreme hunger', 'Blurry vision', 'Fatigue', 'Slow-healing sores'],
+        'risk_factors': ['Overweight', 'Family history', 'Physical inactivity', 'Age', 'High blood pressure', 'Abnormal cholesterol levels', 'History of gestational diabetes'],
+        'treatments': ['Insulin therapy', 'Diet management', 'Regular exercise', 'Blood sugar monitoring', 'Oral medications', 'Regular foot care', 'Eye examinations', 'Kidney function tests'],
+        'prevention': ['Maintain a healthy weight', 'Regular physical activity (150 minutes per week)', 'Healthy diet with plenty of fiber and whole grains', 'Limit refined carbohydrates and sugary foods', 'Stay hydrated with water instead of sugary beverages', 'Avoid smoking', 'Limit alcohol consumption', 'Regular check-ups', 'Stress management', 'Adequate sleep'],
+        'cure': 'There is currently no cure for diabetes, but it can be managed effectively through lifestyle changes, medication, and regular monitoring. Type 2 diabetes can sometimes go into remission with significant weight loss and lifestyle changes, but ongoing management is still necessary. Research into artificial pancreas technology and islet cell transplantation shows promise for future treatment options.'
+    },
+    'heart': {
+        'name': 'Heart Disease',
+        'description': 'Heart disease describes a range of conditions that affect your heart, including coronary artery disease, heart rhythm problems (arrhythmias) and heart defects.',
+        'symptoms': ['Chest pain or discomfort', 'Shortness of breath', 'Pain in the neck, jaw, throat, upper abdomen or back', 'Numbness in arms or legs', 'Fatigue', 'Irregular heartbeat', 'Dizziness or lightheadedness', 'Swelling in legs, ankles, or feet'],
+        'risk_factors': ['Age', 'Sex', 'Family history', 'Smoking', 'High blood pressure', 'High cholesterol', 'Diabetes', 'Obesity', 'Physical inactivity', 'Stress', 'Poor diet', 'Excessive alcohol use'],
+        'treatments': ['Medications (statins, beta-blockers, ACE inhibitors)', 'Surgery or medical procedures (angioplasty, stent placement, bypass surgery)', 'Lifestyle changes', 'Cardiac rehabilitation', 'Implantable devices (pacemakers, ICDs)', 'Heart valve repair or replacement', 'Heart transplant (in severe cases)'],
+        'prevention': ['Regular exercise (at least 150 minutes of moderate activity weekly)', 'Heart-healthy diet rich in fruits, vegetables, and whole grains', 'Maintain healthy weight', 'Quit smoking and avoid secondhand smoke', 'Limit alcohol to 1-2 drinks per day', 'Manage stress through meditation, yoga, or other relaxation techniques', 'Regular check-ups and blood pressure monitoring', 'Manage existing health conditions like diabetes or high blood pressure', 'Get adequate sleep (7-8 hours)', 'Know your numbers (cholesterol, blood pressure, blood sugar)'],
+        'cure': 'Heart disease generally cannot be cured completely, but it can be effectively managed and its progression can be slowed or halted with proper treatment. Some forms of heart disease may be improved through interventions like valve replacements or repair of congenital defects. The focus of treatment is typically on controlling symptoms, reducing risk factors, and preventing complications. Emerging research in stem cell therapy and genetic treatments offers hope for more effective treatments in the future.'
+    },
+    'liver': {
+        'name': 'Liver Disease',
+        'description': 'Liver disease is any disturbance of liver function that causes illness. It can be inherited or caused by various factors such as viruses and alcohol use.',
+        'symptoms': ['Yellowish skin and eyes (jaundice)', 'Abdominal pain and swelling', 'Swelling in the legs and ankles', 'Itchy skin', 'Dark urine color', 'Pale stool color', 'Chronic fatigue', 'Nausea or vomiting', 'Loss of appetite', 'Tendency to bruise easily'],
+        'risk_factors': ['Heavy alcohol use', 'Obesity', 'Type 2 diabetes', 'Tattoos or body piercings', 'Injecting drugs using shared needles', 'Blood transfusion before 1992', 'Exposure to certain chemicals or toxins', 'Family history of liver disease', 'Unprotected sex', 'High levels of triglycerides in blood'],
+        'treatments': ['Lifestyle changes (reduced alcohol, healthy diet)', 'Medications to treat the underlying cause', 'Medications for symptom management', 'Liver transplant for advanced liver failure', 'Treatment for complications (varices, ascites)', 'Antiviral medications for viral hepatitis', 'Immunosuppressants for autoimmune hepatitis'],
+        'prevention': ['Limit alcohol consumption (no more than 1-2 drinks per day)', 'Maintain a healthy weight through diet and exercise', 'Get vaccinated against hepatitis A and B', 'Use medications wisely and follow recommended dosages', 'Avoid contact with other peoples blood and body fluids', 'Practice safe sex', 'Dont share needles', 'Use protective gear when handling toxins', 'Regular screening if at high risk', 'Avoid mixing medications and alcohol'],
+        'cure': 'The liver has remarkable regenerative capabilities, allowing it to heal from minor damage. Some liver conditions, like hepatitis A, can resolve completely with proper treatment and rest. For chronic conditions like hepatitis B, C, or cirrhosis, there are effective treatments but often not complete cures. Advanced liver disease may require a liver transplant. Early detection and intervention provide the best outcomes for liver disease management.'
+    },
+    'kidney': {
+        'name': 'Kidney Disease',
+        'description': 'Kidney disease is a condition in which the kidneys are damaged and cannot filter blood as well as they should. This can lead to waste buildup in the body.',
+        'symptoms': ['Nausea', 'Vomiting', 'Loss of appetite', 'Fatigue and weakness', 'Sleep problems', 'Changes in urine output', 'Decreased mental sharpness', 'Muscle twitches and cramps', 'Swelling of feet and ankles', 'Persistent itching', 'Chest pain', 'Shortness of breath'],
+        'risk_factors': ['Diabetes', 'High blood pressure', 'Heart disease', 'Family history of kidney disease', 'Age', 'Smoking', 'Obesity', 'Ethnicity (African Americans, Native Americans, and Asian Americans are at higher risk)', 'Chronic infections', 'Kidney stones'],
+        'treatments': ['Medications to control blood pressure', 'Medications to lower cholesterol', 'Medications for anemia', 'Dialysis (hemodialysis or peritoneal dialysis)', 'Kidney transplant', 'Dietary changes (low-sodium, low-protein diets)', 'Erythropoietin supplements for anemia', 'Phosphate binders'],
+        'prevention': ['Manage diabetes and high blood pressure through medication and lifestyle changes', 'Maintain a healthy weight through regular exercise and a balanced diet', 'Dont smoke or use tobacco products', 'Limit alcohol consumption', 'Stay hydrated but avoid excessive fluid intake', 'Follow a kidney-friendly diet low in sodium and protein if at risk', 'Monitor kidney function with regular tests if you have risk factors', 'Use caution with over-the-counter pain medications', 'Control blood cholesterol levels', 'Regular check-ups if you have kidney disease risk factors'],
+        'cure': 'Chronic kidney disease typically has no cure, but treatments can help control symptoms and slow progression. Acute kidney injuries may heal completely with proper treatment. For end-stage kidney disease, dialysis or kidney transplantation are the main treatment options. Kidney transplantation offers the closest thing to a cure, though anti-rejection medications will be needed for life. Ongoing research in regenerative medicine and artificial kidneys offers hope for future treatment breakthroughs.'
+    },
+
+'parkinsons': {
+    'name': "Parkinson's Disease",
+    'description': "Parkinson's disease is a progressive nervous system disorder that affects movement.",
+    'symptoms': ['Tremors', 'Slow movement', 'Stiffness', 'Balance problems', 'Speech changes'],
+    'risk_factors': ['Age', 'Genetics', 'Environmental toxins', 'Gender (men are more likely)', 'Head trauma'],
+    'treatments': ['Levodopa and carbidopa', 'Dopamine agonists', 'Physical therapy', 'Speech therapy', 'Surgical therapy like Deep Brain Stimulation'],
+    'prevention': ['Regular exercise', 'Healthy diet', 'Avoiding exposure to pesticides or herbicides', 'Wearing helmets during activities', 'Monitoring for early symptoms'],
+    'cure': 'There is currently no cure, but symptoms can be managed with medications, lifestyle changes, and therapy. Research in gene therapy and stem cells shows promise.'
+},
+
+}
+
+
+def _list_html(items):
+    return ''.join(f'<li>{item}</li>' for item in items)
+
+
+@lru_cache(maxsize=None)
+def about_box_html(disease):
+    """Description box shown under a high-risk result."""
+    info = disease_info[disease]
+    return (f'<div class="info-box">'
+            f'<h3>About {info["name"]}</h3>'
+            f'<p>{info["description"]}</p>'
+            f'</div>')
+
+
+@lru_cache(maxsize=None)
+def symptoms_markdown(disease):
+    return f"### Common Symptoms\n- {', '.join(disease_info[disease]['symptoms'])}"
+
+
+@lru_cache(maxsize=None)
+def treatment_box_html(disease):
+    return (f'<div class="treatment-box"><h4>Treatment Options</h4>'
+            f'<ul>{_list_html(disease_info[disease]["treatments"])}</ul></div>')
+
+
+@lru_cache(maxsize=None)
+def prevention_box_html(disease, title='Prevention Measures'):
+    return (f'<div class="prevention-box"><h4>{title}</h4>'
+            f'<ul>{_list_html(disease_info[disease]["prevention"])}</ul></div>')
+
+
+@lru_cache(maxsize=None)
+def cure_box_html(disease):
+    return f'<div class="cure-box"><h4>Cure Status</h4><p>{disease_info[disease]["cure"]}</p></div>'
+
+
+@lru_cache(maxsize=None)
+def risk_factors_html(disease):
+    """The 'About <disease>' expander on each prediction page."""
+    info = disease_info[disease]
+    return (f'<div class="info-box"><p>{info["description"]}</p>'
+            f'<h4>Risk Factors:</h4><ul>{_list_html(info["risk_factors"])}</ul></div>')
+
+
+@lru_cache(maxsize=None)
+def disease_summary_html(disease):
+    """One disease's entry on the About page."""
+    info = disease_info[disease]
+    return (f'<h4>{info["name"]}</h4><p>{info["description"]}</p>'
+            f'<h5>Common Symptoms</h5><ul>{_list_html(info["symptoms"])}</ul>'
+            f'<h5>Risk Factors</h5><ul>{_list_html(info["risk_factors"])}</ul>')
@@ -0,0 +1,147 @@
+"""LRU/TTL cache of prediction results keyed by disease, model version and feature vector."""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from disease_models import DECISION_THRESHOLDS, score
+from metrics import inc
+
+MODELS_DIR = 'models'
+
+
+def models_signature(models_dir=MODELS_DIR):
+    """(name, mtime, size) of every file under models/, used to detect replaced models."""
+    signature = []
+    for root, _, files in os.walk(models_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(sorted(signature))
+
+
+def feature_key(row):
+    """Stable hash of one feature row; ints and floats of equal value hash the same."""
+    row = np.ascontiguousarray(row, dtype=np.float64) + 0.0  # folds -0.0 into 0.0
+    return hashlib.blake2b(row.tobytes(), digest_size=16).digest()
+
+
+class PredictionCache:
+    """Thread-safe LRU cache with optional TTL for (prediction, probability) pairs.
+
+    The whole cache is dropped when any file in models/ changes, checked at
+    most once every `check_interval` seconds.
+    """
+
+    def __init__(self, maxsize=4096, ttl=3600.0, models_dir=MODELS_DIR, check_interval=1.0, scorer=score):
+        self.maxsize = maxsize
+        self.scorer = scorer  # called as scorer(model, X, disease, threshold) on misses
+        self.ttl = ttl
+        self.models_dir = models_dir
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._signature = models_signature(models_dir)
+        self._last_check = time.monotonic()
+
+    @classmethod
+    def from_env(cls, scorer=score):
+        """Build a cache sized by PREDICTION_CACHE_SIZE and PREDICTION_CACHE_TTL (0 disables expiry)."""
+        return cls(maxsize=int(os.environ.get('PREDICTION_CACHE_SIZE', 4096)),
+                   ttl=float(os.environ.get('PREDICTION_CACHE_TTL', 3600)),
+                   scorer=scorer)
+
+    def _check_models(self, now):
+        if now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        signature = models_signature(self.models_dir)
+        if signature != self._signature:
+            self._signature = signature
+            self._entries.clear()
+            inc('prediction_cache_invalidations_total')
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            self._check_models(now)
+            entry = self._entries.get(key)
+            if entry is not None and (not self.ttl or now - entry[0] <= self.ttl):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+    def score(self, model, X, disease, model_version='', threshold=None):
+        """Cached drop-in for disease_models.score(); misses are scored together in one call."""
+        if threshold is None:
+            threshold = DECISION_THRESHOLDS[disease]
+        X = np.asarray(X, dtype=np.float64)
+        predictions = np.empty(X.shape[0], dtype=np.int64)
+        probabilities = np.empty(X.shape[0], dtype=np.float64)
+
+        keys, missing = [], []
+        for i, row in enumerate(X):
+            key = (disease, model_version, threshold, feature_key(row))
+            keys.append(key)
+            cached = self.get(key)
+            if cached is None:
+                missing.append(i)
+            else:
+                predictions[i], probabilities[i] = cached
+
+        hits = X.shape[0] - len(missing)
+        if hits:
+            inc('prediction_cache_hits_total', hits, disease=disease)
+        if missing:
+            inc('prediction_cache_misses_total', len(missing), disease=disease)
+            new_predictions, new_probabilities = self.scorer(model, X[missing], disease, threshold)
+            for i, prediction, probability in zip(missing, new_predictions, new_probabilities):
+                predictions[i], probabilities[i] = prediction, probability
+                self.put(keys[i], (prediction, probability))
+
+        return predictions, probabilities
+
+    def collect_metrics(self):
+        """Gauges for metrics.register_collector."""
+        stats = self.stats()
+        return {
+            'prediction_cache_entries': [({}, stats['size'])],
+            'prediction_cache_hit_ratio': [({}, stats['hit_rate'])],
+        }
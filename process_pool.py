@@ -0,0 +1,363 @@
+"""Process-pool inference backend for models whose scoring holds the GIL.
+
+The kidney SVC and parts of sklearn's tree inference keep the GIL while they
+run, so one slow call in a Streamlit or threaded API worker stalls every other
+session in that process. Diseases listed in POOLED_MODELS are scored by a small
+pool of worker processes instead:
+
+- each worker loads the pooled models once when it starts (and any newly
+  published version the first time it is asked for it);
+- every worker owns a shared-memory block; the caller copies its float64 rows
+  into it and sends only (model key, shape) over a pipe, and the worker writes
+  predict_proba back into the same block, so no arrays are pickled;
+- a health-check thread pings idle workers, and a worker that dies, stops
+  answering or times out on a request is replaced automatically.
+
+ModelRegistry hands out a PooledModel for these diseases. It has the
+predict_proba/classes_ interface the rest of the code expects, so the cache,
+micro-batcher, screening and what-if sweeps work unchanged.
+
+Settings: POOLED_MODELS (comma-separated diseases, default none), POOL_WORKERS
+(default 2), POOL_TIMEOUT seconds per request (default 30) and
+POOL_HEALTH_INTERVAL seconds (default 10).
+"""
+import atexit
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from disease_models import load_model, serving_model
+from metrics import SIZE_BUCKETS, inc, observe
+from tree_export import load_compiled
+
+# Rows per round trip; larger inputs are sent in chunks of this size
+DEFAULT_CAPACITY_ROWS = 4096
+# Widest model input (Parkinson's, 22 features) with room to spare
+MAX_FEATURES = 32
+# predict_proba columns written back per row
+OUTPUT_COLUMNS = 2
+STARTUP_TIMEOUT = 120.0
+
+
+def pooled_diseases():
+    """Diseases configured for pooled execution via POOLED_MODELS."""
+    return {name.strip() for name in os.environ.get('POOLED_MODELS', '').split(',') if name.strip()}
+
+
+def _load_spec(spec):
+    if spec['loader'] == 'compiled':
+        return load_compiled(spec['disease'])
+    return serving_model(load_model(spec['disease'], spec['path']), spec['disease'])
+
+
+def _block_size(capacity):
+    return capacity * (MAX_FEATURES + OUTPUT_COLUMNS) * np.dtype(np.float64).itemsize
+
+
+# --- Worker process ---
+def _worker_main(conn, shm_name, capacity, specs):
+    """Serve load/predict/ping requests from one parent pipe until it closes."""
+    shm = SharedMemory(name=shm_name)
+    block = np.ndarray((capacity * (MAX_FEATURES + OUTPUT_COLUMNS),), dtype=np.float64, buffer=shm.buf)
+    inputs, outputs = block[:capacity * MAX_FEATURES], block[capacity * MAX_FEATURES:]
+    models = {}
+    try:
+        for key, spec in specs.items():
+            models[key] = _load_spec(spec)
+        conn.send(('ready', os.getpid()))
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break
+            op = message[0]
+            try:
+                if op == 'predict':
+                    _, key, n_rows, n_features = message
+                    proba = models[key].predict_proba(inputs[:n_rows * n_features].reshape(n_rows, n_features))
+                    outputs[:proba.size] = proba.ravel()
+                    conn.send(('ok', proba.shape[1]))
+                elif op == 'load':
+                    _, key, spec = message
+                    model = models[key] = _load_spec(spec)
+                    conn.send(('ok', [int(c) for c in getattr(model, 'classes_', [0, 1])],
+                               int(model.n_features_in_)))
+                elif op == 'unload':
+                    models.pop(message[1], None)
+                    conn.send(('ok',))
+                elif op == 'ping':
+                    conn.send(('pong', os.getpid()))
+                elif op == 'stop':
+                    break
+            except Exception as e:
+                conn.send(('error', f"{type(e).__name__}: {e}"))
+    finally:
+        del inputs, outputs, block
+        shm.close()
+
+
+# --- Parent side ---
+class WorkerError(RuntimeError):
+    """The model raised inside a worker; the worker itself is still healthy."""
+
+
+class _Worker:
+    def __init__(self, context, index, capacity):
+        self.context = context
+        self.index = index
+        self.capacity = capacity
+        self.shm = SharedMemory(create=True, size=_block_size(capacity))
+        block = np.ndarray((capacity * (MAX_FEATURES + OUTPUT_COLUMNS),), dtype=np.float64, buffer=self.shm.buf)
+        self.inputs, self.outputs = block[:capacity * MAX_FEATURES], block[capacity * MAX_FEATURES:]
+        self.process = None
+        self.conn = None
+        self.loaded = set()
+
+    def start(self, specs):
+        parent_conn, child_conn = self.context.Pipe()
+        self.process = self.context.Process(target=_worker_main, args=(child_conn, self.shm.name, self.capacity, specs),
+                                            name=f'inference-worker-{self.index}', daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        self.loaded = set(specs)
+        self.call(None, STARTUP_TIMEOUT)
+
+    def call(self, message, timeout):
+        """Send a message (None just waits for the startup reply) and return the worker's answer."""
+        if message is not None:
+            self.conn.send(message)
+        if not self.conn.poll(timeout):
+            raise TimeoutError(f"inference worker {self.index} did not answer within {timeout:.0f}s")
+        reply = self.conn.recv()
+        if reply[0] == 'error':
+            raise WorkerError(reply[1])
+        return reply
+
+    def stop(self, timeout=2.0):
+        if self.process is None:
+            return
+        try:
+            self.conn.send(('stop',))
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout)
+        self.conn.close()
+        self.process = None
+
+    def close(self):
+        self.stop()
+        self.inputs = self.outputs = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+class InferencePool:
+    """A fixed set of worker processes; each request takes an idle worker for one round trip."""
+
+    def __init__(self, workers=2, capacity_rows=DEFAULT_CAPACITY_ROWS, request_timeout=30.0, health_interval=10.0):
+        self.n_workers = workers
+        self.capacity_rows = capacity_rows
+        self.request_timeout = request_timeout
+        self.health_interval = health_interval
+        self.restarts = 0
+        # spawn: forking a process that already runs Streamlit/gunicorn threads isn't safe
+        self._context = multiprocessing.get_context('spawn')
+        self._specs = {}  # model key -> how workers load it
+        self._workers = []
+        self._idle = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Build a pool from POOL_WORKERS, POOL_TIMEOUT and POOL_HEALTH_INTERVAL."""
+        return cls(workers=int(os.environ.get('POOL_WORKERS', 2)),
+                   request_timeout=float(os.environ.get('POOL_TIMEOUT', 30.0)),
+                   health_interval=float(os.environ.get('POOL_HEALTH_INTERVAL', 10.0)))
+
+    def _ensure_started(self):
+        """Start the workers on first use, and again in a forked child (they belong to the parent)."""
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._idle = queue.Queue()
+            self._workers = [_Worker(self._context, i, self.capacity_rows) for i in range(self.n_workers)]
+            for worker in self._workers:
+                worker.start(dict(self._specs))
+                self._idle.put(worker)
+            self._pid = os.getpid()
+            atexit.register(self.close)
+            if self.health_interval:
+                threading.Thread(target=self._health_loop, name='inference-pool-health', daemon=True).start()
+
+    def _restart(self, worker, reason):
+        """Replace a dead or stuck worker process, reloading every registered model."""
+        inc('pool_worker_restarts_total', reason=reason)
+        self.restarts += 1
+        worker.stop(timeout=0.5)
+        worker.start(dict(self._specs))
+
+    def _with_worker(self, work):
+        """Run work(worker) on an idle worker, restarting it if it crashes or hangs.
+
+        A worker found dead is restarted and the request retried once on it;
+        a request that times out is not retried, since it may be what hung.
+        """
+        self._ensure_started()
+        wait_start = time.perf_counter()
+        worker = self._idle.get()
+        observe('pool_wait_seconds', time.perf_counter() - wait_start)
+        try:
+            for attempt in range(2):
+                try:
+                    # Drop versions that have been swapped out since this worker last ran
+                    for key in worker.loaded - set(self._specs):
+                        worker.call(('unload', key), self.request_timeout)
+                        worker.loaded.discard(key)
+                    return work(worker)
+                except WorkerError:
+                    raise
+                except (EOFError, OSError, TimeoutError) as e:
+                    self._restart(worker, 'timeout' if isinstance(e, TimeoutError) else 'crash')
+                    if attempt or isinstance(e, TimeoutError):
+                        raise RuntimeError(f"Inference worker failed ({type(e).__name__}: {e}); "
+                                           f"it has been restarted") from e
+        finally:
+            self._idle.put(worker)
+
+    def load(self, disease, version, spec):
+        """Register a model version, load it in one worker now, and return a PooledModel for it.
+
+        The other workers load it the first time they are asked for it, or at (re)start.
+        """
+        key = (disease, version)
+        spec = dict(spec, disease=disease)
+        self._specs[key] = spec
+
+        def _load(worker):
+            reply = worker.call(('load', key, spec), STARTUP_TIMEOUT)
+            worker.loaded.add(key)
+            return reply
+
+        _, classes, n_features = self._with_worker(_load)
+        return PooledModel(self, key, spec, classes, n_features)
+
+    def release(self, key):
+        """Forget a model version; workers unload it before their next request."""
+        self._specs.pop(key, None)
+
+    def predict_proba(self, key, spec, X):
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        n_rows, n_features = X.shape
+        if n_features > MAX_FEATURES:
+            raise ValueError(f"Pooled models take at most {MAX_FEATURES} features, got {n_features}")
+        start = time.perf_counter()
+
+        def _predict(worker):
+            if key not in worker.loaded:
+                worker.call(('load', key, spec), STARTUP_TIMEOUT)
+                worker.loaded.add(key)
+            chunks = []
+            for offset in range(0, n_rows, worker.capacity):
+                chunk = X[offset:offset + worker.capacity]
+                worker.inputs[:chunk.size] = chunk.ravel()
+                _, n_columns = worker.call(('predict', key, chunk.shape[0], n_features), self.request_timeout)
+                chunks.append(worker.outputs[:chunk.shape[0] * n_columns].reshape(chunk.shape[0], n_columns).copy())
+            return chunks[0] if len(chunks) == 1 else np.vstack(chunks)
+
+        proba = self._with_worker(_predict)
+        observe('pool_request_seconds', time.perf_counter() - start, disease=key[0])
+        observe('pool_request_rows', n_rows, buckets=SIZE_BUCKETS, disease=key[0])
+        return proba
+
+    # --- health ---
+
+    def check_health(self):
+        """Ping every idle worker and restart any that is dead or doesn't answer; returns the restart count."""
+        self._ensure_started()
+        restarted = 0
+        for _ in range(self.n_workers):
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break  # the rest are busy serving, which is its own liveness signal
+            try:
+                if not worker.process.is_alive():
+                    self._restart(worker, 'dead')
+                    restarted += 1
+                else:
+                    worker.call(('ping',), min(self.request_timeout, 5.0))
+            except (EOFError, OSError, TimeoutError, WorkerError):
+                self._restart(worker, 'unhealthy')
+                restarted += 1
+            finally:
+                self._idle.put(worker)
+        return restarted
+
+    def _health_loop(self):
+        while True:
+            time.sleep(self.health_interval)
+            try:
+                self.check_health()
+            except Exception:
+                inc('pool_health_check_errors_total')
+
+    def close(self):
+        """Stop the workers and free their shared memory."""
+        if self._pid != os.getpid():
+            return
+        for worker in self._workers:
+            worker.close()
+        self._workers = []
+        self._pid = None
+
+    def stats(self):
+        workers = [{'pid': w.process.pid if w.process else None,
+                    'alive': bool(w.process and w.process.is_alive()),
+                    'models': sorted(f'{d}@{v}' for d, v in w.loaded)} for w in self._workers]
+        return {'workers': workers, 'idle': self._idle.qsize() if self._idle else 0, 'restarts': self.restarts}
+
+    def collect_metrics(self):
+        """Gauges for metrics.register_collector."""
+        return {'pool_workers_alive': [({}, sum(w['alive'] for w in self.stats()['workers']))]}
+
+
+class PooledModel:
+    """Stand-in for a model that lives in the inference pool; scoring goes through shared memory."""
+
+    def __init__(self, pool, key, spec, classes, n_features):
+        self.pool = pool
+        self.key = key
+        self.spec = spec
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = n_features
+        self._local = None
+
+    def predict_proba(self, X):
+        return self.pool.predict_proba(self.key, self.spec, X)
+
+    def predict(self, X):
+        proba = self.predict_proba(X)
+        return self.classes_[proba.argmax(axis=1)]
+
+    def local_model(self):
+        """In-process copy for work that needs the model's internals (e.g. feature attributions)."""
+        if self._local is None:
+            self._local = _load_spec(self.spec)
+        return self._local
+
+    def release(self):
+        self.pool.release(self.key)
@@ -0,0 +1,87 @@
+"""Score one patient against all five disease models concurrently."""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from disease_models import FEATURE_ORDER, MODEL_PATHS, score
+from feature_schema import to_row
+from metrics import inc, observe
+
+# Inputs collected once and copied into each model's own feature name.
+# Blood pressure is split because the diabetes and kidney models were trained
+# on diastolic readings while the heart model uses resting systolic pressure.
+SHARED_FIELDS = {
+    'age': {'diabetes': 'age', 'heart': 'age', 'liver': 'age', 'kidney': 'age'},
+    'sex': {'heart': 'sex', 'liver': 'gender'},
+    'diastolic_bp': {'diabetes': 'blood_pressure', 'kidney': 'bp'},
+    'systolic_bp': {'heart': 'trestbps'},
+}
+
+# Widget used for each shared input: (disease, feature) whose schema supplies the range, plus a label
+SHARED_INPUTS = {
+    'age': ('heart', 'age', 'Age'),
+    'sex': ('heart', 'sex', 'Sex'),
+    'systolic_bp': ('heart', 'trestbps', 'Resting Systolic BP (mm Hg)'),
+    'diastolic_bp': ('kidney', 'bp', 'Diastolic BP (mm Hg)'),
+}
+
+# Model scoring is mostly native code (sklearn/XGBoost release the GIL), so threads overlap well
+_executor = ThreadPoolExecutor(max_workers=len(MODEL_PATHS), thread_name_prefix='screening')
+
+
+def shared_feature_names(disease):
+    """Feature names of a model that are filled from the shared inputs."""
+    return {mapping[disease] for mapping in SHARED_FIELDS.values() if disease in mapping}
+
+
+def build_feature_rows(shared, specific):
+    """Assemble one input row per disease in model feature order.
+
+    `shared` maps SHARED_FIELDS keys to values; `specific` maps each disease to
+    its remaining feature values.
+    """
+    rows = {}
+    for disease in FEATURE_ORDER:
+        values = dict(specific.get(disease, {}))
+        for field, mapping in SHARED_FIELDS.items():
+            if disease in mapping and field in shared:
+                values[mapping[disease]] = shared[field]
+        rows[disease] = to_row(values, disease)
+    return rows
+
+
+def _score_one(models, disease, X, scorer, session_id):
+    start = time.perf_counter()
+    model, version, _ = models.route(disease, session_id)
+    predictions, probabilities = scorer(model, X, disease, version)
+    return {
+        'prediction': int(predictions[0]),
+        'probability': float(probabilities[0]),
+        'model_version': version,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def _unversioned_score(model, X, disease, version):
+    return score(model, X, disease)
+
+
+def screen(models, rows, scorer=_unversioned_score, session_id=None):
+    """Score every disease row in parallel; total latency is roughly the slowest model.
+
+    `models` is a ModelRegistry; `scorer` is called as scorer(model, X, disease, version).
+    `session_id` picks the A/B arm where a disease has a split candidate.
+    """
+    start = time.perf_counter()
+    futures = {disease: _executor.submit(_score_one, models, disease, X, scorer, session_id)
+               for disease, X in rows.items()}
+
+    results = {}
+    for disease, future in futures.items():
+        try:
+            results[disease] = future.result()
+        except Exception as e:
+            inc('screening_errors_total', disease=disease)
+            results[disease] = {'error': f"{type(e).__name__}: {e}"}
+
+    observe('screening_seconds', time.perf_counter() - start)
+    return results
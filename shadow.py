@@ -0,0 +1,167 @@
+"""Shadow evaluation and A/B routing of candidate models.
+
+A candidate version set with `model_manifest.py candidate` runs in one of two modes:
+
+shadow  Every input the active model scores is queued here after the response
+        has been computed; a background thread scores it with the candidate
+        and records disagreement and latency. Callers only pay for a
+        queue.put_nowait, and inputs are dropped (and counted) if the queue
+        is full rather than slowing requests down.
+split   `split_bucket` maps each session to a fixed point in [0, 1); sessions
+        below the candidate's fraction are served by it (ModelRegistry.route).
+        Its predictions land in the history store under its version.
+
+Comparison results go to metrics (shadow_rows_total, shadow_disagreements_total,
+shadow_latency_seconds, shadow_probability_delta) and, when SHADOW_LOG is set,
+one JSON line per scored request.
+"""
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from disease_models import score
+from metrics import inc, observe
+
+# Bucket upper bounds for |candidate - active| probability differences
+DELTA_BUCKETS = (0.001, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0)
+
+
+def split_bucket(session_id, disease):
+    """Stable point in [0, 1) for a session, so it sees the same arm on every request."""
+    digest = hashlib.sha256(f'{disease}:{session_id}'.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') / 2.0 ** 64
+
+
+class ShadowEvaluator:
+    """Scores active-model inputs with each disease's shadow candidate on a background thread."""
+
+    def __init__(self, registry, max_queue=1000, log_path=None):
+        self.registry = registry
+        self.max_queue = max_queue
+        self.log_path = log_path
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._worker = None
+        self._worker_pid = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._totals = defaultdict(lambda: {'rows': 0, 'disagreements': 0, 'abs_delta_sum': 0.0,
+                                            'active_seconds': 0.0, 'candidate_seconds': 0.0, 'requests': 0})
+
+    @classmethod
+    def from_env(cls, registry):
+        """Build an evaluator with a SHADOW_QUEUE_SIZE bound, logging to SHADOW_LOG if set."""
+        return cls(registry, max_queue=int(os.environ.get('SHADOW_QUEUE_SIZE', 1000)),
+                   log_path=os.environ.get('SHADOW_LOG') or None)
+
+    def _ensure_worker(self):
+        """Start the worker on first use, and again in a forked child (threads don't survive fork)."""
+        if self._worker_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._worker_pid != os.getpid():
+                if self._worker_pid is not None:
+                    self._queue = queue.Queue(maxsize=self.max_queue)
+                self._worker = threading.Thread(target=self._run, args=(self._queue,), name='shadow-evaluator',
+                                                daemon=True)
+                self._worker.start()
+                self._worker_pid = os.getpid()
+
+    def submit(self, disease, X, predictions, probabilities, version, seconds=None):
+        """Queue inputs the active model (`version`) has already scored; a no-op without a shadow candidate.
+
+        `seconds` is the active model's scoring time, logged next to the candidate's.
+        """
+        mode = self.registry.candidate_mode(disease)
+        if mode != 'shadow':
+            return False
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((disease, np.asarray(X), np.asarray(predictions), np.asarray(probabilities),
+                                    version, seconds, time.time()))
+        except queue.Full:
+            self.dropped += 1
+            inc('shadow_dropped_total', disease=disease)
+            return False
+        return True
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far has been scored (for tests and scripts)."""
+        self._ensure_worker()
+        done = threading.Event()
+        self._queue.put(('flush', done))
+        return done.wait(timeout)
+
+    def _run(self, pending):
+        while True:
+            item = pending.get()
+            if item[0] == 'flush':
+                item[1].set()
+                continue
+            try:
+                self._evaluate(*item)
+            except Exception as e:
+                inc('shadow_errors_total', disease=item[0], error=type(e).__name__)
+
+    def _evaluate(self, disease, X, predictions, probabilities, version, seconds, submitted_at):
+        candidate = self.registry.candidate(disease)
+        if candidate is None or candidate[2] != 'shadow':
+            return  # cleared or switched to split while queued
+        model, candidate_version = candidate[:2]
+
+        start = time.perf_counter()
+        shadow_predictions, shadow_probabilities = score(model, X, disease)
+        candidate_seconds = time.perf_counter() - start
+
+        deltas = np.abs(np.asarray(shadow_probabilities, dtype=np.float64) - probabilities)
+        disagreements = int(np.count_nonzero(np.asarray(shadow_predictions) != predictions))
+        labels = {'disease': disease, 'candidate': candidate_version}
+        inc('shadow_rows_total', X.shape[0], **labels)
+        inc('shadow_disagreements_total', disagreements, **labels)
+        observe('shadow_latency_seconds', candidate_seconds, arm='candidate', **labels)
+        if seconds is not None:
+            observe('shadow_latency_seconds', seconds, arm='active', **labels)
+        for delta in deltas:
+            observe('shadow_probability_delta', float(delta), buckets=DELTA_BUCKETS, **labels)
+
+        with self._stats_lock:
+            totals = self._totals[disease, version, candidate_version]
+            totals['requests'] += 1
+            totals['rows'] += X.shape[0]
+            totals['disagreements'] += disagreements
+            totals['abs_delta_sum'] += float(deltas.sum())
+            totals['active_seconds'] += seconds or 0.0
+            totals['candidate_seconds'] += candidate_seconds
+
+        if self.log_path:
+            record = {'ts': submitted_at, 'disease': disease, 'active_version': version,
+                      'candidate_version': candidate_version, 'rows': int(X.shape[0]),
+                      'disagreements': disagreements, 'max_abs_delta': float(deltas.max(initial=0.0)),
+                      'mean_abs_delta': float(deltas.mean()) if deltas.size else 0.0,
+                      'active_ms': None if seconds is None else round(seconds * 1000, 3),
+                      'candidate_ms': round(candidate_seconds * 1000, 3)}
+            with open(self.log_path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+
+    def stats(self):
+        """Agreement and latency per (disease, active version, candidate version) compared so far."""
+        with self._stats_lock:
+            items = [(key, dict(totals)) for key, totals in self._totals.items()]
+        summary = []
+        for (disease, version, candidate_version), totals in items:
+            rows, requests = totals['rows'], totals['requests']
+            summary.append({
+                'disease': disease, 'active_version': version, 'candidate_version': candidate_version,
+                'rows': rows,
+                'disagreement_rate': totals['disagreements'] / rows if rows else 0.0,
+                'mean_abs_delta': totals['abs_delta_sum'] / rows if rows else 0.0,
+                'active_ms': totals['active_seconds'] * 1000 / requests if requests else 0.0,
+                'candidate_ms': totals['candidate_seconds'] * 1000 / requests if requests else 0.0,
+            })
+        return {'queued': self._queue.qsize(), 'dropped': self.dropped, 'comparisons': summary}
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from disease_models import DECISION_THRESHOLDS, load_model, rows_to_matrix, score, serving_model
+from feature_schema import SCHEMAS, sample
+
+
+def test_kidney_labels_follow_platt_probability_not_svc_predict():
+    model = load_model('kidney')
+    X = sample('kidney', 2000, seed=0)
+    probabilities = model.predict_proba(X)[:, list(model.classes_).index(1)]
+
+    for scorer in (model, serving_model(model, 'kidney')):
+        predictions, scored = score(scorer, X, 'kidney')
+        np.testing.assert_allclose(scored, probabilities, atol=1e-9)
+        np.testing.assert_array_equal(predictions, (probabilities > DECISION_THRESHOLDS['kidney']).astype(int))
+
+    # Intended: the Platt-scaled probability decides, so these rows are positive although SVC.predict() says 0
+    differs = predictions != model.predict(X)
+    assert differs.any()
+    assert (predictions[differs] == 1).all()
+
+
+def test_json_null_is_missing_value():
+    liver = {feature.name: feature.default for feature in SCHEMAS['liver']}
+    liver['total_bilirubin'] = None
+    X = rows_to_matrix([liver], 'liver')
+    assert np.isnan(X[0, [f.name for f in SCHEMAS['liver']].index('total_bilirubin')])
+
+    diabetes = {feature.name: feature.default for feature in SCHEMAS['diabetes']}
+    diabetes['glucose'] = None
+    with pytest.raises(ValueError, match="Row 0: missing value for glucose"):
+        rows_to_matrix([diabetes], 'diabetes')
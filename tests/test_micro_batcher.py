@@ -0,0 +1,38 @@
+import os
+import queue
+
+import numpy as np
+import pytest
+
+from disease_models import load_model, score
+from feature_schema import sample
+from micro_batcher import MicroBatcher
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs os.fork")
+def test_forked_child_gets_its_own_worker():
+    model, X = load_model('diabetes'), sample('diabetes', 3)
+    batcher = MicroBatcher('diabetes')
+    batcher.score(model, X)  # worker started in the parent, as with gunicorn --preload
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            predictions, _ = batcher.submit(model, X).result(timeout=10)
+            os._exit(0 if np.array_equal(predictions, score(model, X, 'diabetes')[0]) else 1)
+        except BaseException:
+            os._exit(2)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+
+
+def test_stuck_worker_falls_back_to_direct_scoring():
+    model, X = load_model('diabetes'), sample('diabetes', 3)
+    batcher = MicroBatcher('diabetes', timeout=0.1)
+    batcher._ensure_worker()
+    batcher._queue = queue.Queue()  # nothing drains this one
+
+    predictions, probabilities = batcher.score(model, X)
+    expected = score(model, X, 'diabetes')
+    np.testing.assert_array_equal(predictions, expected[0])
+    np.testing.assert_allclose(probabilities, expected[1])
@@ -0,0 +1,41 @@
+import threading
+
+import model_registry
+from model_manifest import init_manifest, publish, set_candidate
+from model_registry import ModelRegistry
+
+PATHS = {'diabetes': 'models/diabetes_model.pkl'}
+
+
+def test_blocked_candidate_load_does_not_block_active_load(tmp_path, monkeypatch):
+    manifest = str(tmp_path / 'manifest.json')
+    init_manifest(manifest, PATHS)
+    publish('diabetes', PATHS['diabetes'], version='2', path=manifest, versions_dir=str(tmp_path / 'versions'),
+            activate=False)
+    set_candidate('diabetes', '2', mode='shadow', path=manifest)
+
+    candidate_started, release_candidate = threading.Event(), threading.Event()
+    load_model = model_registry.load_model
+
+    def slow_candidate_load(disease, path=None):
+        if path and path.startswith(str(tmp_path)):
+            candidate_started.set()
+            release_candidate.wait(30)
+        return load_model(disease, path)
+
+    monkeypatch.setattr(model_registry, 'load_model', slow_candidate_load)
+    registry = ModelRegistry(paths=PATHS, use_compiled=False, manifest_path=manifest, reload_interval=0,
+                             pooled=(), cascaded=())
+    loader = threading.Thread(target=registry.candidate, args=('diabetes',), daemon=True)
+    loader.start()
+    try:
+        assert candidate_started.wait(30)
+        active = threading.Thread(target=registry.get_versioned, args=('diabetes',), daemon=True)
+        active.start()
+        active.join(30)
+        assert not active.is_alive(), "active load waited for the candidate load"
+        assert registry._entries['diabetes'][1] == '1'
+    finally:
+        release_candidate.set()
+        loader.join(30)
+    assert registry.candidate('diabetes')[1] == '2'
@@ -0,0 +1,268 @@
+"""Export tree ensembles to flat, memory-mapped node tables and evaluate them with NumPy.
+
+The diabetes RandomForest, the heart GradientBoosting model and the
+RandomForest inside the Parkinson's pipeline are flattened into a handful of
+.npy arrays under models/compiled/<disease>/. Loading them with
+np.load(mmap_mode='r') means every Streamlit/API worker on a host shares one
+page-cache copy instead of holding its own unpickled sklearn objects.
+
+Usage:
+    python tree_export.py                  # export all supported models and check parity
+    python tree_export.py diabetes --rows 50000
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+COMPILED_DIR = 'models/compiled'
+COMPILED_DISEASES = ('diabetes', 'heart', 'parkinsons')
+FORMAT_VERSION = 1
+EVAL_BLOCK_ROWS = 1024
+
+_ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'roots')
+
+
+# --- Export ---
+def _split_pipeline(model):
+    """Return (scaler mean, scaler scale, final estimator), unwrapping a StandardScaler pipeline."""
+    if hasattr(model, 'steps'):
+        scaler, estimator = model.steps[0][1], model.steps[-1][1]
+        return np.asarray(scaler.mean_, dtype=np.float64), np.asarray(scaler.scale_, dtype=np.float64), estimator
+    return None, None, model
+
+
+def flatten_ensemble(model):
+    """Flatten a fitted RandomForest/GradientBoosting classifier (optionally in a scaler pipeline).
+
+    All trees are concatenated into one node table with global child indices.
+    Leaves point to themselves, so evaluation can step every tree a fixed
+    max_depth times without branching on leaf status.
+    """
+    mean, scale, estimator = _split_pipeline(model)
+    kind = type(estimator).__name__
+    if kind == 'RandomForestClassifier':
+        trees = [est.tree_ for est in estimator.estimators_]
+    elif kind == 'GradientBoostingClassifier':
+        trees = [est.tree_ for est in estimator.estimators_[:, 0]]
+    else:
+        raise TypeError(f"Unsupported model type: {kind}")
+
+    feature, threshold, left, right, value, cover, roots = [], [], [], [], [], [], []
+    offset = 0
+    for tree in trees:
+        is_leaf = tree.children_left == -1
+        idx = np.arange(tree.node_count)
+        roots.append(offset)
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(np.where(is_leaf, np.inf, tree.threshold))
+        left.append(np.where(is_leaf, idx, tree.children_left) + offset)
+        right.append(np.where(is_leaf, idx, tree.children_right) + offset)
+        if kind == 'RandomForestClassifier':
+            # Positive-class fraction at each node
+            counts = tree.value[:, 0, :]
+            value.append(counts[:, 1] / counts.sum(axis=1))
+        else:
+            value.append(tree.value[:, 0, 0])
+        cover.append(tree.weighted_n_node_samples)
+        offset += tree.node_count
+
+    tables = {
+        'feature': np.concatenate(feature).astype(np.int32),
+        'threshold': np.concatenate(threshold).astype(np.float64),
+        'left': np.concatenate(left).astype(np.int32),
+        'right': np.concatenate(right).astype(np.int32),
+        'value': np.concatenate(value).astype(np.float64),
+        # Training weight reaching each node; only needed for feature attributions
+        'cover': np.concatenate(cover).astype(np.float64),
+        'roots': np.asarray(roots, dtype=np.int32),
+    }
+    meta = {
+        'format_version': FORMAT_VERSION,
+        'kind': kind,
+        'n_features': int(model.n_features_in_),
+        'n_trees': len(trees),
+        'max_depth': int(max(tree.max_depth for tree in trees)),
+        'classes': [int(c) for c in estimator.classes_],
+    }
+    if kind == 'GradientBoostingClassifier':
+        meta['learning_rate'] = float(estimator.learning_rate)
+        meta['init_raw'] = float(estimator._raw_predict_init(np.zeros((1, meta['n_features'])))[0, 0])
+    if mean is not None:
+        tables['scaler_mean'] = mean
+        tables['scaler_scale'] = scale
+    return tables, meta
+
+
+def export_model(model, disease, out_dir=COMPILED_DIR, source_sha256=None):
+    """Write a model's node tables as .npy files plus meta.json, replacing any previous export.
+
+    `source_sha256` identifies the pickle the tables came from; the registry
+    only serves them while that version is the active one.
+    """
+    tables, meta = flatten_ensemble(model)
+    meta['source_sha256'] = source_sha256
+    target = os.path.join(out_dir, disease)
+    os.makedirs(target, exist_ok=True)
+    for name, array in tables.items():
+        np.save(os.path.join(target, f'{name}.npy'), array)
+    with open(os.path.join(target, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+    return target
+
+
+# --- Evaluation ---
+class CompiledEnsemble:
+    """NumPy evaluator over exported node tables, usable wherever a model's predict_proba is."""
+
+    def __init__(self, tables, meta):
+        self.meta = meta
+        self.classes_ = np.asarray(meta['classes'])
+        self.n_features_in_ = meta['n_features']
+        for name in _ARRAYS:
+            setattr(self, name, tables[name])
+        self.scaler_mean = tables.get('scaler_mean')
+        self.scaler_scale = tables.get('scaler_scale')
+        self.cover = tables.get('cover')
+        # [right, left] per node, so the next node is children[2 * node + went_left]
+        self._children = np.stack([self.right, self.left], axis=1).ravel().astype(np.int64)
+
+    def _prepare(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        if self.scaler_mean is not None:
+            X = (X - self.scaler_mean) / self.scaler_scale
+        # sklearn compares float32 features against float64 thresholds
+        return X.astype(np.float32)
+
+    def leaves(self, X):
+        """Leaf index reached in every tree, shape (n_rows, n_trees)."""
+        X = self._prepare(X)
+        n_rows, n_features = X.shape
+        out = np.empty((n_rows, self.roots.shape[0]), dtype=np.int64)
+        # Small row blocks keep the (rows x trees) index arrays in cache
+        for start in range(0, n_rows, EVAL_BLOCK_ROWS):
+            block = X[start:start + EVAL_BLOCK_ROWS]
+            flat = block.ravel()
+            row_offsets = (np.arange(block.shape[0], dtype=np.int64) * n_features)[:, None]
+            nodes = np.broadcast_to(self.roots, (block.shape[0], self.roots.shape[0])).astype(np.int64)
+            for _ in range(self.meta['max_depth']):
+                went_left = flat[row_offsets + self.feature[nodes]] <= self.threshold[nodes]
+                nodes = self._children[2 * nodes + went_left]
+            out[start:start + EVAL_BLOCK_ROWS] = nodes
+        return out
+
+    def tree_values(self, X):
+        """Per-tree leaf values: positive-class fractions (RF) or raw stage outputs (GB)."""
+        return self.value[self.leaves(X)]
+
+    def positive_proba(self, X):
+        values = self.tree_values(X)
+        if self.meta['kind'] == 'GradientBoostingClassifier':
+            raw = self.meta['init_raw'] + self.meta['learning_rate'] * values.sum(axis=1)
+            return 1.0 / (1.0 + np.exp(-raw))
+        return values.mean(axis=1)
+
+    def predict_proba(self, X):
+        p = self.positive_proba(X)
+        return np.column_stack([1.0 - p, p])
+
+    def predict(self, X):
+        return self.classes_[(self.positive_proba(X) > 0.5).astype(int)]
+
+
+def compiled_path(disease, base_dir=COMPILED_DIR):
+    return os.path.join(base_dir, disease)
+
+
+def has_compiled(disease, base_dir=COMPILED_DIR):
+    return os.path.exists(os.path.join(compiled_path(disease, base_dir), 'meta.json'))
+
+
+def compiled_source(disease, base_dir=COMPILED_DIR):
+    """SHA-256 of the model file an export was made from (None for exports that predate it)."""
+    with open(os.path.join(compiled_path(disease, base_dir), 'meta.json')) as f:
+        return json.load(f).get('source_sha256')
+
+
+def load_compiled(disease, base_dir=COMPILED_DIR, mmap=True):
+    """Load exported node tables, memory-mapped read-only by default."""
+    target = compiled_path(disease, base_dir)
+    with open(os.path.join(target, 'meta.json')) as f:
+        meta = json.load(f)
+    if meta.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"{target} was exported with format {meta.get('format_version')}, "
+                         f"expected {FORMAT_VERSION}; re-run tree_export.py")
+
+    tables = {}
+    for name in _ARRAYS + ('cover', 'scaler_mean', 'scaler_scale'):
+        path = os.path.join(target, f'{name}.npy')
+        if os.path.exists(path):
+            tables[name] = np.load(path, mmap_mode='r' if mmap else None)
+    return CompiledEnsemble(tables, meta)
+
+
+# --- Parity check ---
+def parity_inputs(model, n_rows, seed=0):
+    """Random rows spread across the split thresholds the model actually uses."""
+    tables, meta = flatten_ensemble(model)
+    rng = np.random.default_rng(seed)
+    X = np.empty((n_rows, meta['n_features']))
+    is_split = np.isfinite(tables['threshold'])
+    for j in range(meta['n_features']):
+        cuts = tables['threshold'][is_split & (tables['feature'] == j)]
+        if 'scaler_mean' in tables:
+            cuts = cuts * tables['scaler_scale'][j] + tables['scaler_mean'][j]
+        lo, hi = (cuts.min(), cuts.max()) if cuts.size else (0.0, 1.0)
+        margin = (hi - lo) * 0.1 + 1e-6
+        X[:, j] = rng.uniform(lo - margin, hi + margin, n_rows)
+    return X
+
+
+def check_parity(model, compiled, X, atol=1e-9):
+    """Compare compiled probabilities with the original model's predict_proba; return the max abs error."""
+    expected = model.predict_proba(X)[:, 1]
+    actual = compiled.positive_proba(X)
+    max_err = float(np.max(np.abs(expected - actual)))
+    if max_err > atol:
+        raise AssertionError(f"Compiled model deviates from predict_proba by up to {max_err:.3g}")
+    return max_err
+
+
+def main(argv=None):
+    from disease_models import load_model
+    from model_manifest import active_entry, file_sha256, load_manifest, verify
+
+    parser = argparse.ArgumentParser(description="Export tree models to memory-mapped node tables.")
+    parser.add_argument('diseases', nargs='*', help=f"Any of {', '.join(COMPILED_DISEASES)} (default: all)")
+    parser.add_argument('--out-dir', default=COMPILED_DIR)
+    parser.add_argument('--rows', type=int, default=10000, help="Rows used for the parity check")
+    args = parser.parse_args(argv)
+    unsupported = set(args.diseases) - set(COMPILED_DISEASES)
+    if unsupported:
+        parser.error(f"no tree ensemble to export for: {', '.join(sorted(unsupported))}")
+
+    status = 0
+    manifest = load_manifest()
+    for disease in args.diseases or COMPILED_DISEASES:
+        # Export whichever version is active, tagged with its checksum
+        _, spec = active_entry(manifest, disease)
+        verify(spec)
+        model = load_model(disease, spec['path'])
+        target = export_model(model, disease, args.out_dir, spec.get('sha256') or file_sha256(spec['path']))
+        compiled = load_compiled(disease, args.out_dir)
+        try:
+            max_err = check_parity(model, compiled, parity_inputs(model, args.rows))
+            print(f"{disease}: exported to {target}, {compiled.meta['n_trees']} trees, "
+                  f"{compiled.value.shape[0]} nodes, max |Δp| = {max_err:.2e}")
+        except AssertionError as e:
+            print(f"{disease}: PARITY FAILED - {e}", file=sys.stderr)
+            status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
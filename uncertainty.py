@@ -0,0 +1,97 @@
+"""Model-internal spread from the per-tree outputs of a single ensemble pass.
+
+Scoring the tree ensembles from their node tables (tree_export) yields every
+tree's output on the way to the probability, so the spread of those outputs
+comes at no extra inference cost:
+
+- RandomForest (diabetes, the Parkinson's pipeline): the probability is the
+  mean of the per-tree votes; the spread is mean ± Z * std / sqrt(n_trees),
+  the standard error of that mean.
+- GradientBoosting (heart): the probability is the last of the staged
+  predictions; the spread spans the staged probabilities over the final
+  STAGE_WINDOW of stages, i.e. how much the last stages still move it.
+
+Neither is a confidence interval for the patient's risk: they say how much
+the model's own parts agree, and the boosting spread in particular is often
+only a fraction of a percent wide. Label them as model-internal spread.
+
+Scoring this way skips the prediction cache and micro-batcher, so it is off
+by default; enable per disease with INTERVAL_MODELS, e.g.
+INTERVAL_MODELS=diabetes,heart. Models served from a worker pool or behind
+the surrogate cascade don't run the trees in this process and get no spread.
+"""
+import os
+
+import numpy as np
+
+from tree_export import COMPILED_DISEASES, CompiledEnsemble, flatten_ensemble
+
+INTERVAL_DISEASES = COMPILED_DISEASES
+# Standard errors of the mean vote on each side of it
+Z = 1.96
+# Share of the final boosting stages whose staged probabilities bound the interval
+STAGE_WINDOW = 0.2
+
+
+def intervals_enabled(disease):
+    """Whether INTERVAL_MODELS turns on per-tree spread for a disease."""
+    enabled = {name.strip() for name in os.environ.get('INTERVAL_MODELS', '').split(',') if name.strip()}
+    return disease in enabled and disease in INTERVAL_DISEASES
+
+
+class IntervalScorer:
+    """score()-style scoring that returns each row's model-internal spread from the same tree pass."""
+
+    def __init__(self, ensemble):
+        self.ensemble = ensemble
+        self.classes_ = ensemble.classes_
+        self.n_trees = ensemble.roots.shape[0]
+        self.boosted = ensemble.meta['kind'] == 'GradientBoostingClassifier'
+        self.window = max(int(round(self.n_trees * STAGE_WINDOW)), 1)
+
+    def proba_interval(self, X):
+        """(probabilities, lower, upper) for each row of X."""
+        values = self.ensemble.tree_values(X)
+        if self.boosted:
+            raw = self.ensemble.meta['init_raw'] + self.ensemble.meta['learning_rate'] * np.cumsum(values, axis=1)
+            staged = 1.0 / (1.0 + np.exp(-raw[:, -self.window:]))
+            return staged[:, -1], staged.min(axis=1), staged.max(axis=1)
+        probabilities = values.mean(axis=1)
+        half_width = Z * values.std(axis=1, ddof=1) / np.sqrt(self.n_trees)
+        return probabilities, np.clip(probabilities - half_width, 0.0, 1.0), np.clip(probabilities + half_width, 0.0, 1.0)
+
+    def score(self, X, threshold):
+        """(predictions, probabilities, lower, upper); labels follow disease_models.score()."""
+        probabilities, lower, upper = self.proba_interval(X)
+        predictions = np.where(probabilities > threshold, self.classes_[1], self.classes_[0])
+        return predictions, probabilities, lower, upper
+
+
+def interval_scorer_for(model):
+    """IntervalScorer for an in-process tree ensemble (sklearn, pipeline or compiled tables), else None."""
+    if hasattr(model, 'local_model'):
+        return None  # pooled or cascaded: the trees don't run here
+    if isinstance(model, CompiledEnsemble):
+        return IntervalScorer(model)
+    try:
+        tables, meta = flatten_ensemble(model)
+    except (TypeError, AttributeError):
+        return None  # no trees (kidney SVC) or not a flattenable ensemble (liver XGBoost)
+    return IntervalScorer(CompiledEnsemble(tables, meta))
+
+
+def score_with_interval(scorer, X, disease, threshold=None):
+    """disease_models.score() plus spread bounds: (predictions, probabilities, lower, upper)."""
+    from disease_models import DECISION_THRESHOLDS
+
+    return scorer.score(X, DECISION_THRESHOLDS[disease] if threshold is None else threshold)
+
+
+def score_batch_with_interval(scorer, X, disease, chunk_size):
+    """disease_models.score_batch() plus spread bounds, in chunks of `chunk_size` rows."""
+    n_rows = X.shape[0]
+    out = (np.empty(n_rows, dtype=np.int64), np.empty(n_rows), np.empty(n_rows), np.empty(n_rows))
+    for start in range(0, n_rows, chunk_size):
+        for column, values in zip(out, score_with_interval(scorer, X[start:start + chunk_size], disease)):
+            column[start:start + chunk_size] = values
+    return out
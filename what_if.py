@@ -0,0 +1,44 @@
+"""What-if sensitivity sweeps: vary one or two features and score the whole grid in one call."""
+import numpy as np
+
+from disease_models import score
+from feature_schema import FEATURE_INDEX, SCHEMAS
+
+DEFAULT_POINTS = 50
+MAX_POINTS = 100
+
+
+def axis_values(feature, points=DEFAULT_POINTS):
+    """Values to sweep for one feature: every code of a choice, else `points` steps across its range."""
+    if feature.is_categorical:
+        return np.array([code for _, code in feature.choices], dtype=np.float64)
+    values = np.linspace(feature.min_value, feature.max_value, points)
+    if feature.dtype == 'int':
+        values = np.unique(np.round(values))
+    return values
+
+
+def sweep_grid(base_row, disease, features, points=DEFAULT_POINTS):
+    """Copy `base_row` once per grid point with the swept features overwritten.
+
+    Returns (axes, X): one value array per swept feature, and a matrix of
+    prod(len(axis)) rows in model feature order, first feature varying slowest.
+    """
+    base_row = np.asarray(base_row, dtype=np.float64).reshape(-1)
+    axes = [axis_values(SCHEMAS[disease][FEATURE_INDEX[disease][name]], points) for name in features]
+    X = np.repeat(base_row[None, :], int(np.prod([axis.size for axis in axes])), axis=0)
+    for name, column in zip(features, np.meshgrid(*axes, indexing='ij')):
+        X[:, FEATURE_INDEX[disease][name]] = column.ravel()
+    return axes, X
+
+
+def sweep(model, base_row, disease, features, points=DEFAULT_POINTS, scorer=score):
+    """Risk across a one- or two-feature grid from a single batched scorer call.
+
+    Returns (axes, probabilities) with probabilities shaped like the grid.
+    """
+    if not 1 <= len(features) <= 2:
+        raise ValueError("Sweep one or two features")
+    axes, X = sweep_grid(base_row, disease, features, points)
+    _, probabilities = scorer(model, X, disease)
+    return axes, np.asarray(probabilities).reshape([axis.size for axis in axes])
@@ -0,0 +1,55 @@
+"""Direct XGBoost Booster scoring for the liver model.
+
+XGBClassifier.predict_proba goes through the sklearn compatibility layer on
+every call: input validation, a config context, and a DMatrix (or in-place
+proxy) built from float64 data, before splitting the margin into two
+columns. XGBoostInplaceModel keeps the fitted Booster, sets its thread count
+once, and calls Booster.inplace_predict on contiguous float32 rows, the
+format XGBoost evaluates natively, so neither a DMatrix nor an input copy
+inside XGBoost is needed. The results are identical to predict_proba.
+
+ModelRegistry serves XGBoost models through it unless XGBOOST_INPLACE=0
+(see disease_models.serving_model).
+"""
+import json
+import os
+
+import numpy as np
+
+
+class XGBoostInplaceModel:
+    """predict_proba-compatible wrapper that scores a binary:logistic XGBClassifier via inplace_predict."""
+
+    def __init__(self, model, nthread=None):
+        self.model = model
+        self.booster = model.get_booster()
+        # Read from the booster: get_params() fails on pickles from older xgboost releases
+        objective = json.loads(self.booster.save_config())['learner']['objective']['name']
+        if objective != 'binary:logistic':
+            raise TypeError(f"In-place scoring expects a binary:logistic model, got {objective}")
+        self.classes_ = np.asarray(model.classes_)
+        self.n_features_in_ = int(model.n_features_in_)
+        self.missing = model.missing
+        best_iteration = getattr(model, 'best_iteration', None)
+        self.iteration_range = (0, best_iteration + 1) if best_iteration is not None else (0, 0)
+        # The sklearn wrapper re-applies n_jobs on every call; set it once on the booster instead
+        if nthread is None:
+            nthread = model.n_jobs if model.n_jobs is not None else int(os.environ.get('XGBOOST_NTHREAD', 0))
+        self.booster.set_param({'nthread': nthread})
+
+    def positive_proba(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        return self.booster.inplace_predict(X, iteration_range=self.iteration_range, predict_type='value',
+                                            missing=self.missing, validate_features=False)
+
+    def predict_proba(self, X):
+        p = self.positive_proba(X).astype(np.float64)
+        return np.column_stack([1.0 - p, p])
+
+    def predict(self, X):
+        return self.classes_[(self.positive_proba(X) > 0.5).astype(int)]
+
+    def get_booster(self):
+        return self.booster